@@ -25,6 +25,12 @@ if config.config_file_name:
 
 target_metadata = SQLModel.metadata
 
+
+def include_name(name, type_, parent_names):
+    # The full-text search index is created by a migration rather than the models (see
+    # owl/database/search.py) and is not to be dropped by autogenerate
+    return not (type_ == "table" and name is not None and name.startswith("conversation_fts"))
+
 # other values from the config, defined by the needs of env.py,
 # can be acquired:
 # my_important_option = config.get_main_option("my_important_option")
@@ -47,6 +53,7 @@ def run_migrations_offline() -> None:
     context.configure(
         url=url,
         target_metadata=target_metadata,
+        include_name=include_name,
         literal_binds=True,
         dialect_opts={"paramstyle": "named"},
     )
@@ -70,7 +77,7 @@ def run_migrations_online() -> None:
 
     with connectable.connect() as connection:
         context.configure(
-            connection=connection, target_metadata=target_metadata
+            connection=connection, target_metadata=target_metadata, include_name=include_name
         )
 
         with context.begin_transaction():
@@ -0,0 +1,73 @@
+"""Add lookup indexes
+
+Revision ID: 7a4f0c3e91d6
+Revises: 5c1e8d2a7b34
+Create Date: 2024-03-06 09:41:27.552031
+
+"""
+from typing import Sequence, Union
+import uuid
+
+from alembic import op
+import sqlalchemy as sa
+import sqlmodel
+
+
+# revision identifiers, used by Alembic.
+revision: str = '7a4f0c3e91d6'
+down_revision: Union[str, None] = '5c1e8d2a7b34'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+# (index name, table, columns, unique). Unique indexes double as the unique constraints on the UUID
+# columns, which SQLite cannot add to an existing table with ALTER TABLE.
+indexes = [
+    ('ix_capture_capture_uuid', 'capture', ['capture_uuid'], True),
+    ('ix_capturesegment_conversation_uuid', 'capturesegment', ['conversation_uuid'], True),
+    ('ix_capturesegment_source_capture_id', 'capturesegment', ['source_capture_id'], False),
+    ('ix_conversation_conversation_uuid', 'conversation', ['conversation_uuid'], True),
+    ('ix_conversation_capture_segment_file_id', 'conversation', ['capture_segment_file_id'], False),
+    ('ix_conversation_created_at', 'conversation', ['created_at'], False),
+    ('ix_conversation_state_start_time', 'conversation', ['state', 'start_time'], False),
+    ('ix_location_created_at', 'location', ['created_at'], False),
+    ('ix_location_capture_uuid_created_at', 'location', ['capture_uuid', 'created_at'], False),
+    ('ix_suggestedlink_conversation_id', 'suggestedlink', ['conversation_id'], False),
+    ('ix_transcription_conversation_id', 'transcription', ['conversation_id'], False),
+    ('ix_utterance_transcription_id', 'utterance', ['transcription_id'], False),
+    ('ix_word_utterance_id', 'word', ['utterance_id'], False),
+]
+
+
+def upgrade() -> None:
+    remove_duplicate_uuids()
+    for name, table, columns, unique in indexes:
+        op.create_index(name, table, columns, unique=unique)
+
+
+def remove_duplicate_uuids() -> None:
+    # Concurrent uploads of a capture's first chunk could create several captures with the same
+    # UUID. They are merged into the first one, which takes over their segments and images.
+    bind = op.get_bind()
+    duplicate_captures = bind.execute(sa.text("SELECT capture_uuid, MIN(id) FROM capture GROUP BY capture_uuid HAVING COUNT(*) > 1")).all()
+    for capture_uuid, kept_id in duplicate_captures:
+        parameters = { "capture_uuid": capture_uuid, "kept_id": kept_id }
+        for table in [ "capturesegment", "image" ]:
+            bind.execute(sa.text(f"UPDATE {table} SET source_capture_id = :kept_id WHERE source_capture_id IN (SELECT id FROM capture WHERE capture_uuid = :capture_uuid AND id != :kept_id)"), parameters)
+        bind.execute(sa.text("DELETE FROM capture WHERE capture_uuid = :capture_uuid AND id != :kept_id"), parameters)
+
+    # Conversation UUIDs are generated for each segment, so any duplicates are distinct
+    # conversations, which are given new UUIDs (the segment's and its conversation's together)
+    duplicate_segments = bind.execute(sa.text("SELECT id FROM capturesegment WHERE id NOT IN (SELECT MIN(id) FROM capturesegment GROUP BY conversation_uuid)")).all()
+    for segment_id, in duplicate_segments:
+        parameters = { "conversation_uuid": uuid.uuid1().hex, "segment_id": segment_id }
+        bind.execute(sa.text("UPDATE capturesegment SET conversation_uuid = :conversation_uuid WHERE id = :segment_id"), parameters)
+        bind.execute(sa.text("UPDATE conversation SET conversation_uuid = :conversation_uuid WHERE capture_segment_file_id = :segment_id"), parameters)
+    duplicate_conversations = bind.execute(sa.text("SELECT id FROM conversation WHERE id NOT IN (SELECT MIN(id) FROM conversation GROUP BY conversation_uuid)")).all()
+    for conversation_id, in duplicate_conversations:
+        bind.execute(sa.text("UPDATE conversation SET conversation_uuid = :conversation_uuid WHERE id = :conversation_id"), { "conversation_uuid": uuid.uuid1().hex, "conversation_id": conversation_id })
+
+
+def downgrade() -> None:
+    for name, table, columns, unique in reversed(indexes):
+        op.drop_index(name, table_name=table)
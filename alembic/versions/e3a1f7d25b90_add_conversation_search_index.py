@@ -0,0 +1,40 @@
+"""Add conversation search index
+
+Revision ID: e3a1f7d25b90
+Revises: b2d94e6f1c08
+Create Date: 2024-03-08 11:05:48.671224
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+import sqlmodel
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e3a1f7d25b90'
+down_revision: Union[str, None] = 'b2d94e6f1c08'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+# Full-text search (owl/database/search.py) is only supported with SQLite (FTS5)
+def upgrade() -> None:
+    if op.get_bind().dialect.name != 'sqlite':
+        return
+    op.execute("CREATE VIRTUAL TABLE conversation_fts USING fts5(summary, short_summary, transcript, tokenize = 'porter unicode61')")
+    op.execute("""
+        INSERT INTO conversation_fts (rowid, summary, short_summary, transcript)
+        SELECT conversation.id, coalesce(conversation.summary, ''), coalesce(conversation.short_summary, ''), coalesce(group_concat(utterance.text, ' '), '')
+        FROM conversation
+        JOIN transcription ON transcription.conversation_id = conversation.id AND NOT transcription.realtime
+        LEFT JOIN utterance ON utterance.transcription_id = transcription.id
+        GROUP BY conversation.id
+    """)
+
+
+def downgrade() -> None:
+    if op.get_bind().dialect.name != 'sqlite':
+        return
+    op.execute("DROP TABLE conversation_fts")
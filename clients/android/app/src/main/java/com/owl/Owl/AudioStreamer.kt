@@ -5,6 +5,7 @@ import android.content.Context
 import android.media.*
 import io.socket.client.IO
 import io.socket.client.Socket
+import io.socket.engineio.client.transports.WebSocket
 import java.net.URI
 import kotlin.concurrent.thread
 import kotlin.experimental.or
@@ -32,6 +33,7 @@ class AudioStreamer(private val context: Context, private val captureUUID: Strin
         try {
             val options = IO.Options.builder()
                 .setExtraHeaders(mapOf("Authorization" to listOf("Bearer ${AppConstants.clientToken}")))
+                .setTransports(arrayOf(WebSocket.NAME))
                 .build()
             socket = IO.socket(URI.create(serverUrl), options)
             socket?.connect()
@@ -19,6 +19,7 @@ class SocketManager: ObservableObject {
         socketManager = SocketIO.SocketManager(socketURL: URL(string: AppConstants.apiBaseURL)!, config: [
             .log(false),
             .compress,
+            .forceWebsockets(true),
             .reconnects(true),
             .reconnectAttempts(-1),
             .reconnectWait(1),
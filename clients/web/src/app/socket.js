@@ -7,9 +7,11 @@ export const initSocket = (token) => {
     if (!socket) {
         const dev = process.env.NODE_ENV !== 'production';
         const backendBaseUrl = dev ? 'http://127.0.0.1:8000' : '/';
+        // The server accepts only websocket connections, on which browsers cannot set headers
         let options = {
-            extraHeaders: {
-                Authorization: `Bearer ${token}`
+            transports: ['websocket'],
+            auth: {
+                token: token
             }
         }
         if (!dev) {
@@ -0,0 +1,4 @@
+from .abstract_broker import AbstractBroker
+from .in_process_broker import InProcessBroker
+from .redis_broker import RedisBroker
+from .broker_factory import BrokerFactory
@@ -0,0 +1,88 @@
+#
+# abstract_broker.py
+#
+# State shared by the server's worker processes. The broker dispatches background tasks to workers,
+# keeps track of which worker owns each capture session (affinity), elects a primary worker to run
+# the singleton services (local transcription servers, UDP capture, startup recovery), and provides
+# the socket.io client manager through which messages reach clients connected to any worker.
+#
+# Capture sessions hold in-memory state (streaming transcription, endpointing, conversation
+# detection, buffered utterances), so everything concerning a capture must happen on the worker
+# that owns it. Tasks put with an affinity key run on the key's owner, and requests for a session
+# owned by another worker are forwarded to it as tasks.
+#
+
+from __future__ import annotations
+from abc import ABC, abstractmethod
+from typing import TYPE_CHECKING
+
+import socketio
+
+if TYPE_CHECKING:
+    from ..server.task import Task
+
+
+class AbstractBroker(ABC):
+    @property
+    @abstractmethod
+    def worker_id(self) -> str:
+        pass
+
+    async def start(self):
+        pass
+
+    async def stop(self):
+        pass
+
+    @abstractmethod
+    async def put_task(self, task: Task, affinity_key: str | None = None):
+        """
+        Queues a task. With an affinity key, the task runs on the worker that owns the key (which
+        becomes this worker if the key has no live owner). Otherwise, it runs on any worker.
+        """
+        pass
+
+    @abstractmethod
+    async def get_task(self) -> Task:
+        """
+        Waits for the next task to run on this worker.
+        """
+        pass
+
+    @abstractmethod
+    async def claim(self, key: str, take_over: bool = False) -> str:
+        """
+        Claims a key (e.g., a capture UUID) for this worker unless it is owned by another live
+        worker, and returns the ID of the owner. With take_over, the key is claimed regardless.
+        """
+        pass
+
+    @abstractmethod
+    async def get_owner(self, key: str) -> str | None:
+        pass
+
+    @abstractmethod
+    async def release(self, key: str):
+        """
+        Releases a key, if owned by this worker.
+        """
+        pass
+
+    @abstractmethod
+    def is_primary(self) -> bool:
+        pass
+
+    @abstractmethod
+    async def is_only_worker(self) -> bool:
+        """
+        Whether no other worker is alive, in which case no capture or conversation processing can
+        be in progress elsewhere.
+        """
+        pass
+
+    def get_socketio_client_manager(self) -> socketio.AsyncManager | None:
+        """
+        Returns the socket.io client manager that relays messages between workers, or None if not
+        needed.
+        """
+        return None
@@ -0,0 +1,19 @@
+from .abstract_broker import AbstractBroker
+from ..core.config import BrokerConfiguration
+import logging
+
+logger = logging.getLogger(__name__)
+
+class BrokerFactory:
+    @staticmethod
+    def get_broker(config: BrokerConfiguration | None) -> AbstractBroker:
+        provider = config.provider if config else "in_process"
+        logger.info(f"Creating {provider} broker")
+        if provider == "in_process":
+            from .in_process_broker import InProcessBroker
+            return InProcessBroker()
+        elif provider == "redis":
+            from .redis_broker import RedisBroker
+            return RedisBroker(config)
+        else:
+            raise ValueError(f"Unknown broker provider: {provider}")
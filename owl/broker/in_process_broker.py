@@ -0,0 +1,49 @@
+#
+# in_process_broker.py
+#
+# Broker for a server running as a single process. Tasks are held in a local queue and this worker
+# owns everything.
+#
+
+from __future__ import annotations
+import asyncio
+from typing import TYPE_CHECKING, Set
+
+from .abstract_broker import AbstractBroker
+
+if TYPE_CHECKING:
+    from ..server.task import Task
+
+
+class InProcessBroker(AbstractBroker):
+    def __init__(self):
+        self._task_queue: asyncio.Queue[Task] = asyncio.Queue()
+        self._claimed_keys: Set[str] = set()
+
+    @property
+    def worker_id(self) -> str:
+        return "local"
+
+    async def put_task(self, task: Task, affinity_key: str | None = None):
+        if affinity_key is not None:
+            self._claimed_keys.add(affinity_key)
+        self._task_queue.put_nowait(task)
+
+    async def get_task(self) -> Task:
+        return await self._task_queue.get()
+
+    async def claim(self, key: str, take_over: bool = False) -> str:
+        self._claimed_keys.add(key)
+        return self.worker_id
+
+    async def get_owner(self, key: str) -> str | None:
+        return self.worker_id if key in self._claimed_keys else None
+
+    async def release(self, key: str):
+        self._claimed_keys.discard(key)
+
+    def is_primary(self) -> bool:
+        return True
+
+    async def is_only_worker(self) -> bool:
+        return True
@@ -0,0 +1,164 @@
+#
+# redis_broker.py
+#
+# Broker shared by worker processes through Redis (or any server implementing the same commands).
+#
+# Keys (all under the configured prefix):
+#
+#   tasks               List of pickled tasks that any worker may run.
+#   tasks:<worker_id>   List of pickled tasks for a particular worker.
+#   worker:<worker_id>  Heartbeat of a live worker, which expires if it stops refreshing it.
+#   owner:<key>         Worker owning an affinity key (e.g., a capture UUID).
+#   primary             Primary worker.
+#
+# Each worker refreshes its heartbeat, and the keys it owns, periodically. The keys of a worker that
+# has stopped (or died and let them expire) are taken over by the next worker to claim them. Tasks
+# already queued for a dead worker are lost.
+#
+
+from __future__ import annotations
+import asyncio
+import logging
+import pickle
+from typing import TYPE_CHECKING, Set
+import uuid
+
+import socketio
+
+from .abstract_broker import AbstractBroker
+from ..core.config import BrokerConfiguration
+
+if TYPE_CHECKING:
+    from ..server.task import Task
+
+logger = logging.getLogger(__name__)
+
+
+class RedisBroker(AbstractBroker):
+    def __init__(self, config: BrokerConfiguration, client = None):
+        """
+        Parameters
+        ----------
+        config : BrokerConfiguration
+            Broker configuration.
+
+        client
+            Async Redis client (redis.asyncio.Redis or compatible). If None, one is created for
+            config.url.
+        """
+        if client is None:
+            import redis.asyncio as redis
+            client = redis.from_url(config.url)
+        self._config = config
+        self._redis = client
+        self._worker_id = uuid.uuid4().hex[:12]
+        self._is_primary = False
+        self._owned_keys: Set[str] = set()
+        self._heartbeat_task: asyncio.Task | None = None
+
+    @property
+    def worker_id(self) -> str:
+        return self._worker_id
+
+    async def start(self):
+        await self._heartbeat()
+        self._heartbeat_task = asyncio.create_task(self._run_heartbeat())
+        logger.info(f"Worker {self._worker_id} started (primary={self._is_primary})")
+
+    async def stop(self):
+        if self._heartbeat_task:
+            self._heartbeat_task.cancel()
+            self._heartbeat_task = None
+        await self._redis.delete(self._key("worker", self._worker_id))
+        if self._is_primary:
+            await self._release_key(self._key("primary"))
+            self._is_primary = False
+
+    async def put_task(self, task: Task, affinity_key: str | None = None):
+        if affinity_key is None:
+            queue_key = self._key("tasks")
+        else:
+            queue_key = self._key("tasks", await self.claim(affinity_key))
+        await self._redis.rpush(queue_key, pickle.dumps(task))
+
+    async def get_task(self) -> Task:
+        while True:
+            # Blocks for at most a second so that cancellation is not held up
+            item = await self._redis.blpop([ self._key("tasks", self._worker_id), self._key("tasks") ], timeout=1)
+            if item is not None:
+                return pickle.loads(item[1])
+
+    async def claim(self, key: str, take_over: bool = False) -> str:
+        owner_key = self._key("owner", key)
+        ttl = self._config.worker_ttl_seconds
+        if await self._redis.set(owner_key, self._worker_id, nx=True, ex=ttl):
+            self._owned_keys.add(owner_key)
+            return self._worker_id
+        owner = self._decode(await self._redis.get(owner_key))
+        if owner == self._worker_id:
+            return owner
+        if owner is None or take_over or not await self._is_alive(owner):
+            logger.info(f"Worker {self._worker_id} taking over {key} from {owner}")
+            await self._redis.set(owner_key, self._worker_id, ex=ttl)
+            self._owned_keys.add(owner_key)
+            return self._worker_id
+        return owner
+
+    async def get_owner(self, key: str) -> str | None:
+        owner = self._decode(await self._redis.get(self._key("owner", key)))
+        if owner is not None and owner != self._worker_id and not await self._is_alive(owner):
+            return None
+        return owner
+
+    async def release(self, key: str):
+        await self._release_key(self._key("owner", key))
+
+    async def _release_key(self, redis_key: str):
+        self._owned_keys.discard(redis_key)
+        if self._decode(await self._redis.get(redis_key)) == self._worker_id:
+            await self._redis.delete(redis_key)
+
+    def is_primary(self) -> bool:
+        return self._is_primary
+
+    async def is_only_worker(self) -> bool:
+        worker_keys = [ self._decode(key) for key in await self._redis.keys(self._key("worker", "*")) ]
+        return worker_keys == [ self._key("worker", self._worker_id) ] or not worker_keys
+
+    def get_socketio_client_manager(self) -> socketio.AsyncManager | None:
+        return socketio.AsyncRedisManager(self._config.url, channel=self._key("socketio"))
+
+    async def _run_heartbeat(self):
+        while True:
+            await asyncio.sleep(self._config.worker_ttl_seconds / 3)
+            try:
+                await self._heartbeat()
+            except Exception as e:
+                logger.error(f"Broker heartbeat failed: {e}")
+
+    async def _heartbeat(self):
+        ttl = self._config.worker_ttl_seconds
+        await self._redis.set(self._key("worker", self._worker_id), "1", ex=ttl)
+        primary_key = self._key("primary")
+        if await self._redis.set(primary_key, self._worker_id, nx=True, ex=ttl):
+            self._is_primary = True
+        elif self._decode(await self._redis.get(primary_key)) == self._worker_id:
+            await self._redis.expire(primary_key, ttl)
+            self._is_primary = True
+        else:
+            self._is_primary = False
+        for owner_key in list(self._owned_keys):
+            if self._decode(await self._redis.get(owner_key)) == self._worker_id:
+                await self._redis.expire(owner_key, ttl)
+            else:
+                self._owned_keys.discard(owner_key)   # taken over by another worker
+
+    async def _is_alive(self, worker_id: str) -> bool:
+        return bool(await self._redis.exists(self._key("worker", worker_id)))
+
+    def _key(self, *parts: str) -> str:
+        return ":".join([ self._config.key_prefix, *parts ])
+
+    @staticmethod
+    def _decode(value) -> str | None:
+        return value.decode("utf-8") if isinstance(value, bytes) else value
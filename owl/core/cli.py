@@ -30,6 +30,7 @@ from .config import Configuration
 ####################################################################################################
 
 def load_config_yaml(ctx, param, value) -> Configuration:
+    ctx.meta["config_filepath"] = value.name  # for commands that start other processes
     return Configuration.load_config_yaml(value.name)
 
 def add_options(options):
@@ -202,6 +203,49 @@ def create_migration(config: Configuration, message: str):
 
     console.log(f"[bold green]Migration script generated with message: '{message}'")
 
+@cli.command()
+@click.option("--days", default=365, help="Days of synthetic data to seed.")
+@click.option("--conversations-per-day", default=20, help="Conversations per day.")
+@click.option("--utterances-per-conversation", default=10, help="Utterances per conversation.")
+@click.option("--words-per-utterance", default=0, help="Words per utterance.")
+@click.option("--locations-per-day", default=144, help="Location updates per day.")
+@click.option("--iterations", default=50, help="Times each query is run.")
+def benchmark_database(days: int, conversations_per_day: int, utterances_per_conversation: int, words_per_utterance: int, locations_per_day: int, iterations: int):
+    """Benchmark hot-path queries and full-text search on a synthetic database."""
+    import random
+    import tempfile
+    from ..database.database import Database
+    from ..database.benchmark import seed_database, get_benchmark_queries, get_search_benchmark_queries, time_queries, drop_schema_indexes
+    from ..database.search import rebuild_search_index
+    from .config import DatabaseConfiguration
+    console = Console()
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        database = Database(DatabaseConfiguration(url=f"sqlite:///{os.path.join(temp_dir, 'benchmark.sqlite3')}"))
+        database.init_db()
+
+        console.log("[bold green]Seeding database...")
+        start_time = time.time()
+        with database.session_factory() as db:
+            seed = seed_database(db=db, days=days, conversations_per_day=conversations_per_day, utterances_per_conversation=utterances_per_conversation, words_per_utterance=words_per_utterance, locations_per_day=locations_per_day)
+        console.log(f"[bold green]Seeded {seed.captures} captures, {seed.conversations} conversations, {seed.utterances} utterances, {seed.words} words, and {seed.locations} locations in {time.time() - start_time:.2f} seconds")
+
+        with database.session_factory() as db:
+            rebuild_search_index(db)
+        search_results = time_queries(database=database, queries=get_search_benchmark_queries(rng=random.Random(1)), iterations=iterations)
+        for name, result in search_results.items():
+            console.print(f"{name}: median {result['median']:.3f} ms, p95 {result['p95']:.3f} ms")
+
+        results_by_variant = {}
+        results_by_variant["indexed"] = time_queries(database=database, queries=get_benchmark_queries(seed=seed, rng=random.Random(1)), iterations=iterations)
+        drop_schema_indexes(database=database)
+        results_by_variant["unindexed"] = time_queries(database=database, queries=get_benchmark_queries(seed=seed, rng=random.Random(1)), iterations=iterations)
+
+        for name in results_by_variant["indexed"].keys():
+            indexed = results_by_variant["indexed"][name]
+            unindexed = results_by_variant["unindexed"][name]
+            console.print(f"{name}: median {unindexed['median']:.3f} -> {indexed['median']:.3f} ms, p95 {unindexed['p95']:.3f} -> {indexed['p95']:.3f} ms (unindexed -> indexed)")
+
 ####################################################################################################
 # Server
 ####################################################################################################
@@ -211,11 +255,21 @@ def create_migration(config: Configuration, message: str):
 @click.option('--host', default='127.0.0.1', help='The interface to bind to.')
 @click.option('--port', default=8000, help='The port to bind to.')
 @click.option('--web', is_flag=True, help='Build and start the web frontend.')
-def serve(config: Configuration, host, port, web):
+@click.option('--workers', default=1, help='Number of server worker processes (requires a shared broker if more than one).')
+def serve(config: Configuration, host, port, web, workers):
     """Start the server."""
     from .. import server  
     console = Console()
 
+    if workers > 1 and (config.broker is None or config.broker.provider == "in_process"):
+        console.log("[bold red]Multiple workers require a shared broker (broker.provider: redis).")
+        return
+
+    if workers > 1 and config.embedding is not None:
+        # Each worker would write to the on-disk vector index independently, corrupting it
+        console.log("[bold red]Semantic search (embedding) is not supported with multiple workers.")
+        return
+
     if web:
         console.log("[bold green]Building and starting the web frontend...")
         next_project_dir = "./clients/web"
@@ -230,8 +284,16 @@ def serve(config: Configuration, host, port, web):
             return
 
     console.log(f"[bold green]Starting Python server at http://{host}:{port}...")
-    app = server.create_server_app(config=config)
-    uvicorn.run(app, host=host, port=port, log_level="info", ws_ping_interval=None, ws_ping_timeout=None)
+    if workers > 1:
+        # Migrate the database once, then each worker process creates its own app from the
+        # configuration file
+        from ..database.database import Database
+        Database(config.database).init_db()
+        os.environ["OWL_CONFIG_FILEPATH"] = click.get_current_context().meta["config_filepath"]
+        uvicorn.run("owl.server.main:create_server_app_from_environment", factory=True, workers=workers, host=host, port=port, log_level="info", ws_ping_interval=None, ws_ping_timeout=None)
+    else:
+        app = server.create_server_app(config=config)
+        uvicorn.run(app, host=host, port=port, log_level="info", ws_ping_interval=None, ws_ping_timeout=None)
 
 if __name__ == '__main__':
     cli()
\ No newline at end of file
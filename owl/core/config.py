@@ -1,13 +1,25 @@
 from pydantic import BaseModel
 import yaml
 import os
-from typing import Optional
+from typing import Dict, List, Optional
 
 
 class LLMConfiguration(BaseModel):
     model: str
     api_base_url: str | None
     api_key: str | None
+    structured_output: bool = False     # summaries and search query in a single JSON response (falls back to separate requests if malformed)
+    cache_filepath: str | None = None   # persistent cache of responses to identical requests (disabled if None)
+    cache_ttl_seconds: float | None = None
+    cache_max_entries: int | None = 10000
+    stream_summaries: bool = True       # stream summaries to clients as they are generated (not possible with structured_output)
+    summarization_window_tokens: int | None = None  # longer transcripts are summarized in windows of this size and then combined (disabled if None)
+    summarization_max_parallel_windows: int = 2
+    max_concurrent_requests: int = 4    # per model, shared by all requests made by the server
+    max_concurrent_requests_by_model: Dict[str, int] = {}
+    request_timeout_seconds: float | None = None
+    max_retries: int = 2                # retries of timed out or transiently failed requests
+    retry_backoff_seconds: float = 2    # doubled after each retry
 
 class CapturesConfiguration(BaseModel):
     capture_dir: str
@@ -33,6 +45,14 @@ class AsyncWhisperConfiguration(BaseModel):
     verification_threshold: float
     verification_model_source: str
     verification_model_savedir: str
+    long_form_min_duration_seconds: float | None = None  # audio at least this long is split on silences and transcribed in parallel pieces (disabled if None)
+    long_form_piece_seconds: float = 300
+    long_form_workers: int = 2
+    diarization_min_duration_seconds: float = 0     # diarization is skipped for shorter audio unless requested explicitly
+    diarization_min_speech_segments: int = 0        # diarization is skipped when VAD finds fewer speech segments unless requested explicitly
+    preload_models: List[str] = []                  # models other than the primary transcription model to load in the background at startup
+    model_memory_budget_mb: float | None = None     # least recently used models are evicted when exceeded
+    model_idle_timeout_seconds: float | None = None # models unused for this long are evicted
 
 class StreamingWhisperConfiguration(BaseModel):
     host: str
@@ -51,6 +71,10 @@ class AsyncTranscriptionConfiguration(BaseModel):
 
 class DatabaseConfiguration(BaseModel):
     url: str
+    utterance_batch_size: int = 25          # realtime utterances are inserted in batches of up to this many
+    utterance_batch_seconds: float = 1.0    # maximum time a realtime utterance waits to be inserted
+    thread_pool_size: int = 4               # threads on which database access from async code runs
+    pack_words: bool = False                # store word timings packed per utterance rather than as a row per word
 
 class VADConfiguration(BaseModel):
     vad_model_savedir: str
@@ -62,12 +86,41 @@ class ConversationEndpointingConfiguration(BaseModel):
 
 class NotificationConfiguration(BaseModel):
     apn_team_id: str | None
+    delta_max_field_bytes: int = 4096       # larger changed fields are left out of conversation_delta, for clients to fetch on demand
+    emit_interval_seconds: float = 0.05     # messages to clients are sent in batches this often, with rapid conversation updates coalesced
 
 class UDPConfiguration(BaseModel):
     enabled: bool
     host: str | None
     port: int | None
 
+class RollingSummaryConfiguration(BaseModel):
+    batch_utterances: int = 20      # realtime utterances are folded into the running summary in batches of this size
+    batch_seconds: float = 120      # or, if fewer, this often
+    max_summary_words: int = 400    # bounds the running summary, and therefore the context of each update
+
+class EmbeddingConfiguration(BaseModel):
+    provider: str = "local"         # "local" (Hugging Face model run on the CPU) or "litellm"
+    model: str = "sentence-transformers/all-MiniLM-L6-v2"
+    api_base_url: str | None = None # litellm provider only
+    api_key: str | None = None      # litellm provider only
+    index_dir: str = "embeddings"   # directory of the on-disk vector index
+    window_utterances: int = 8      # transcripts are embedded in windows of this many utterances
+    window_stride: int = 4          # utterances between the starts of consecutive windows
+    batch_size: int = 32
+
+class CaptureSessionConfiguration(BaseModel):
+    idle_timeout_seconds: float = 600           # streaming sessions that receive no audio for this long are finished
+    chunked_idle_timeout_seconds: float = 3600  # chunked upload sessions that receive no chunks for this long are finished
+    max_sessions: int = 256                     # least recently active sessions are finished beyond this
+    sweep_interval_seconds: float = 30
+
+class BrokerConfiguration(BaseModel):
+    provider: str = "in_process"    # "in_process" (single worker) or "redis" (state shared by several worker processes)
+    url: str = "redis://localhost:6379/0"
+    key_prefix: str = "owl"
+    worker_ttl_seconds: int = 15    # workers (and their capture sessions) are considered gone when their heartbeat is this old
+
 class BingConfiguration(BaseModel):
     subscription_key: str
 
@@ -104,4 +157,8 @@ class Configuration(BaseModel):
     conversation_endpointing: ConversationEndpointingConfiguration
     notification: NotificationConfiguration
     udp: UDPConfiguration
-    bing: BingConfiguration | None = None
\ No newline at end of file
+    bing: BingConfiguration | None = None
+    rolling_summary: RollingSummaryConfiguration | None = None
+    embedding: EmbeddingConfiguration | None = None
+    broker: BrokerConfiguration | None = None
+    capture_sessions: CaptureSessionConfiguration = CaptureSessionConfiguration()
@@ -1,2 +1,4 @@
 from .async_multiprocessing_queue import AsyncMultiprocessingQueue
-from .hexdump import hexdump
\ No newline at end of file
+from .hexdump import hexdump
+from .task_graph import TaskGraph
+from .memory_usage import get_process_memory_bytes, get_object_memory_bytes
@@ -0,0 +1,67 @@
+#
+# memory_usage.py
+#
+# Approximate measurements of memory use, for diagnostics.
+#
+
+import os
+import sys
+from types import BuiltinFunctionType, FunctionType, MethodType, ModuleType
+from typing import Any, Iterable
+
+
+def get_process_memory_bytes(pid: int | None = None) -> int | None:
+    """
+    Returns the resident set size of a process (this one by default), or None if it cannot be
+    determined (only Linux is supported).
+    """
+    try:
+        with open(f"/proc/{pid or os.getpid()}/statm", "r") as fp:
+            resident_pages = int(fp.read().split()[1])
+        return resident_pages * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        return None
+
+def get_object_memory_bytes(obj: Any, exclude: Iterable[Any] = [], max_objects: int = 100000) -> int:
+    """
+    Returns the approximate memory retained by an object: its own size plus that of the objects
+    reachable from it through attributes and containers, each counted once. The instance state of
+    SQLAlchemy ORM objects, which leads to their session, mapper, and registry (shared by all ORM
+    objects), is not traversed.
+
+    Parameters
+    ----------
+    obj : Any
+        Object to measure.
+
+    exclude : Iterable[Any]
+        Objects (e.g., shared services) not to count or traverse.
+
+    max_objects : int
+        Traversal stops after this many objects, bounding the cost of measuring large structures.
+    """
+    seen = set([ id(excluded) for excluded in exclude ])
+    stack = [ obj ]
+    total_bytes = 0
+    num_objects = 0
+    while stack and num_objects < max_objects:
+        obj = stack.pop()
+        if id(obj) in seen or isinstance(obj, (type, ModuleType, FunctionType, MethodType, BuiltinFunctionType)):
+            continue
+        seen.add(id(obj))
+        num_objects += 1
+        total_bytes += sys.getsizeof(obj, 0)
+        if isinstance(obj, dict):
+            stack.extend(obj.keys())
+            stack.extend(obj.values())
+        elif isinstance(obj, (list, tuple, set, frozenset)):
+            stack.extend(obj)
+        if hasattr(obj, "__dict__"):
+            attributes = vars(obj)
+            if "_sa_instance_state" in attributes:
+                seen.add(id(attributes["_sa_instance_state"]))
+            stack.append(attributes)
+        for slot in getattr(type(obj), "__slots__", ()):
+            if hasattr(obj, slot):
+                stack.append(getattr(obj, slot))
+    return total_bytes
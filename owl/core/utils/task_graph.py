@@ -0,0 +1,94 @@
+#
+# task_graph.py
+#
+# Runs a set of named async stages concurrently, subject to dependencies between them. Each stage
+# starts as soon as all of the stages it depends on have finished and receives their results. The
+# wall-clock time of each stage is recorded so that it is easy to see where latency comes from.
+#
+# Stages run as tasks on the current event loop. Blocking work should be offloaded by the stage
+# itself (e.g., with asyncio.to_thread()).
+#
+
+import asyncio
+from dataclasses import dataclass
+import time
+from typing import Any, Awaitable, Callable, Dict, List
+
+
+@dataclass
+class _Stage:
+    name: str
+    fn: Callable[..., Awaitable[Any]]
+    depends_on: List[str]
+
+class TaskGraph:
+    """
+    Dependency graph of async stages.
+
+    Example
+    -------
+        graph = TaskGraph()
+        graph.add("summary", lambda: summarize(transcript))
+        graph.add("query", lambda summary: make_query(summary), depends_on=[ "summary" ])
+        results = await graph.run()
+        print(results["query"], graph.timings)
+    """
+
+    def __init__(self):
+        self._stages: Dict[str, _Stage] = {}
+        self.timings: Dict[str, float] = {}
+
+    def add(self, name: str, fn: Callable[..., Awaitable[Any]], depends_on: List[str] = []):
+        """
+        Adds a stage.
+
+        Parameters
+        ----------
+        name : str
+            Unique name of the stage. Its result is stored under this name.
+
+        fn : Callable[..., Awaitable[Any]]
+            Async function that performs the stage. It is called with the results of the stages it
+            depends on as keyword arguments named after those stages.
+
+        depends_on : List[str]
+            Stages that must complete before this one starts. They must be added first, which also
+            rules out cycles.
+        """
+        assert name not in self._stages, f"Stage already exists: {name}"
+        for dependency in depends_on:
+            assert dependency in self._stages, f"Stage {name} depends on unknown stage: {dependency}"
+        self._stages[name] = _Stage(name=name, fn=fn, depends_on=list(depends_on))
+
+    async def run(self) -> Dict[str, Any]:
+        """
+        Runs all stages, as concurrently as their dependencies allow. If any stage fails, all
+        stages that are still running are cancelled and the exception is raised.
+
+        Returns
+        -------
+        Dict[str, Any]
+            Result of each stage by name.
+        """
+        self.timings = {}
+        tasks: Dict[str, asyncio.Task] = {}
+
+        async def run_stage(stage: _Stage):
+            kwargs = { dependency: await tasks[dependency] for dependency in stage.depends_on }
+            start_time = time.perf_counter()
+            result = await stage.fn(**kwargs)
+            self.timings[stage.name] = time.perf_counter() - start_time
+            return result
+
+        for stage in self._stages.values():
+            tasks[stage.name] = asyncio.create_task(run_stage(stage), name=stage.name)
+
+        try:
+            await asyncio.gather(*tasks.values())
+        except BaseException:
+            for task in tasks.values():
+                task.cancel()
+            await asyncio.gather(*tasks.values(), return_exceptions=True)
+            raise
+
+        return { name: task.result() for name, task in tasks.items() }
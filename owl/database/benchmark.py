@@ -0,0 +1,208 @@
+#
+# benchmark.py
+#
+# Database query benchmark. Seeds a database with synthetic data (by default, a year of
+# conversations) and measures the latency of the queries on the server's hot paths, both with the
+# schema's indexes and with them dropped, to show what the indexes are worth. Full-text search is
+# compared against a LIKE scan.
+#
+
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
+import random
+import statistics
+import time
+from typing import Callable, Dict, List
+import uuid
+
+from sqlalchemy import insert, or_, select, text
+from sqlmodel import SQLModel, Session
+
+from .crud import get_capture_file_ref, get_capture_file_segment_file_ref, get_conversation_by_conversation_uuid, get_capturing_conversation_by_capture_uuid, get_all_conversations, find_most_common_location
+from .database import Database
+from .search import search_conversations
+from ..models.schemas import Capture, CaptureSegment, Conversation, ConversationState, Transcription, Utterance, Word, Location
+
+
+# Vocabulary of synthetic transcripts and summaries. A few rare words make for selective queries.
+_COMMON_WORDS = "the a and to of in that it is was for on you with we they have be this at but not what so about just like know think going yeah right okay really time people would could".split()
+_TOPIC_WORDS = "meeting project budget deadline dinner weekend flight hotel doctor appointment kids school birthday gift recipe garden car repair movie concert game training marathon invoice contract design prototype launch release".split()
+_RARE_WORDS = "zeppelin quokka marzipan tessellation obsidian kumquat".split()
+
+def _synthetic_text(rng: random.Random, num_words: int) -> str:
+    words = []
+    for _ in range(num_words):
+        p = rng.random()
+        words.append(rng.choice(_RARE_WORDS) if p < 0.002 else rng.choice(_TOPIC_WORDS) if p < 0.2 else rng.choice(_COMMON_WORDS))
+    return " ".join(words)
+
+@dataclass
+class SeedSummary:
+    captures: int
+    conversations: int
+    utterances: int
+    words: int
+    locations: int
+    capture_uuids: List[str]
+    conversation_uuids: List[str]
+    start_time: datetime
+    end_time: datetime
+
+def seed_database(
+    db: Session,
+    days: int = 365,
+    conversations_per_day: int = 20,
+    utterances_per_conversation: int = 10,
+    words_per_utterance: int = 0,
+    locations_per_day: int = 144,
+    seed: int = 0
+) -> SeedSummary:
+    """
+    Inserts synthetic captures (one per day), conversations with realtime transcripts, and location
+    updates, using bulk inserts. Words are only generated if words_per_utterance is given.
+    """
+    rng = random.Random(seed)
+    end_time = datetime.now(timezone.utc).replace(hour=0, minute=0, second=0, microsecond=0)
+    start_time = end_time - timedelta(days=days)
+
+    captures = []
+    segments = []
+    conversations = []
+    transcriptions = []
+    utterances = []
+    words = []
+    locations = []
+    for day in range(days):
+        day_start = start_time + timedelta(days=day)
+        capture_id = len(captures) + 1
+        capture_uuid = uuid.UUID(int=rng.getrandbits(128)).hex
+        captures.append({ "id": capture_id, "capture_uuid": capture_uuid, "filepath": f"captures/{capture_uuid}.aac", "start_time": day_start, "device_type": "benchmark", "duration": 86400.0, "created_at": day_start, "updated_at": day_start })
+
+        for i in range(conversations_per_day):
+            conversation_start = day_start + timedelta(seconds=(i + rng.random()) * 86400 / conversations_per_day)
+            conversation_end = conversation_start + timedelta(seconds=rng.uniform(60, 600))
+            conversation_id = len(conversations) + 1
+            conversation_uuid = uuid.UUID(int=rng.getrandbits(128)).hex
+            segments.append({ "id": conversation_id, "filepath": f"captures/{capture_uuid}/{conversation_uuid}.aac", "start_time": conversation_start, "conversation_uuid": conversation_uuid, "source_capture_id": capture_id, "duration": (conversation_end - conversation_start).total_seconds(), "created_at": conversation_start, "updated_at": conversation_end })
+            is_last = day == days - 1 and i == conversations_per_day - 1
+            conversations.append({
+                "id": conversation_id,
+                "start_time": conversation_start,
+                "end_time": None if is_last else conversation_end,
+                "conversation_uuid": conversation_uuid,
+                "device_type": "benchmark",
+                "summary": None if is_last else _synthetic_text(rng, 60),
+                "short_summary": None if is_last else _synthetic_text(rng, 8),
+                "summarization_model": None,
+                "state": (ConversationState.CAPTURING if is_last else ConversationState.COMPLETED).name,
+                "capture_segment_file_id": conversation_id,
+                "created_at": conversation_start,
+                "updated_at": conversation_end
+            })
+            transcriptions.append({ "id": conversation_id, "realtime": is_last, "model": "benchmark", "transcription_time": 0.0, "conversation_id": conversation_id, "created_at": conversation_start, "updated_at": conversation_end })
+            for j in range(utterances_per_conversation):
+                spoken_at = conversation_start + timedelta(seconds=j * 5)
+                utterance_id = len(utterances) + 1
+                utterances.append({ "id": utterance_id, "start": j * 5.0, "end": j * 5.0 + 4.0, "spoken_at": spoken_at, "realtime": True, "text": _synthetic_text(rng, rng.randint(5, 20)), "speaker": f"SPEAKER_{j % 2}", "transcription_id": conversation_id, "created_at": spoken_at, "updated_at": spoken_at })
+                for k in range(words_per_utterance):
+                    words.append({ "word": f"word{k}", "start": j * 5.0 + k * 0.4, "end": j * 5.0 + k * 0.4 + 0.3, "score": 0.9, "speaker": f"SPEAKER_{j % 2}", "utterance_id": utterance_id, "created_at": spoken_at, "updated_at": spoken_at })
+
+        for i in range(locations_per_day):
+            located_at = day_start + timedelta(seconds=i * 86400 / locations_per_day)
+            locations.append({ "latitude": 37.0 + rng.random(), "longitude": -122.0 + rng.random(), "address": f"{rng.randrange(20)} Benchmark St", "capture_uuid": capture_uuid, "created_at": located_at, "updated_at": located_at })
+
+    for table, rows in [ (Capture, captures), (CaptureSegment, segments), (Conversation, conversations), (Transcription, transcriptions), (Utterance, utterances), (Word, words), (Location, locations) ]:
+        if rows:
+            db.execute(insert(table), rows)
+    db.commit()
+
+    return SeedSummary(
+        captures=len(captures),
+        conversations=len(conversations),
+        utterances=len(utterances),
+        words=len(words),
+        locations=len(locations),
+        capture_uuids=[ capture["capture_uuid"] for capture in captures ],
+        conversation_uuids=[ conversation["conversation_uuid"] for conversation in conversations ],
+        start_time=start_time,
+        end_time=end_time
+    )
+
+def get_benchmark_queries(seed: SeedSummary, rng: random.Random) -> Dict[str, Callable[[Session], object]]:
+    """
+    Queries to time, keyed by name. Each picks its arguments at random from the seeded data.
+    """
+    def location_window():
+        window_start = seed.start_time + timedelta(seconds=rng.uniform(0, (seed.end_time - seed.start_time).total_seconds() - 600))
+        return window_start, window_start + timedelta(minutes=10)
+
+    return {
+        "capture by capture_uuid": lambda db: get_capture_file_ref(db, rng.choice(seed.capture_uuids)),
+        "segment by conversation_uuid": lambda db: get_capture_file_segment_file_ref(db, rng.choice(seed.conversation_uuids)),
+        "conversation by conversation_uuid": lambda db: get_conversation_by_conversation_uuid(db, rng.choice(seed.conversation_uuids)),
+        "capturing conversation by capture_uuid": lambda db: get_capturing_conversation_by_capture_uuid(db, rng.choice(seed.capture_uuids)),
+        "latest conversations page": lambda db: get_all_conversations(db, offset=0, limit=10),
+        "most common location": lambda db: find_most_common_location(db, *location_window(), rng.choice(seed.capture_uuids)),
+    }
+
+def get_search_benchmark_queries(rng: random.Random) -> Dict[str, Callable[[Session], object]]:
+    """
+    Full-text search (requires the search index to be built, see rebuild_search_index()) and the
+    equivalent LIKE scan, for the same terms.
+    """
+    def like_scan(db: Session, term: str):
+        pattern = f"%{term}%"
+        matching_transcriptions = select(Utterance.transcription_id).where(Utterance.text.like(pattern))
+        statement = (
+            select(Conversation.id)
+            .outerjoin(Transcription, Transcription.conversation_id == Conversation.id)
+            .where(or_(Conversation.summary.like(pattern), Conversation.short_summary.like(pattern), Transcription.id.in_(matching_transcriptions)))
+            .distinct()
+            .limit(20)
+        )
+        return db.execute(statement).all()
+
+    terms = _TOPIC_WORDS + _RARE_WORDS
+    return {
+        "full-text search": lambda db: search_conversations(db, rng.choice(terms), limit=20),
+        "LIKE scan": lambda db: like_scan(db, rng.choice(terms)),
+    }
+
+def time_queries(database: Database, queries: Dict[str, Callable[[Session], object]], iterations: int = 50) -> Dict[str, Dict[str, float]]:
+    """
+    Runs each query repeatedly, each time in a new session, and returns latency statistics in
+    milliseconds (median, p95, and max) for each.
+    """
+    results = {}
+    for name, query in queries.items():
+        latencies = []
+        for _ in range(iterations):
+            with database.session_factory() as db:
+                start_time = time.perf_counter()
+                query(db)
+                latencies.append((time.perf_counter() - start_time) * 1e3)
+        latencies.sort()
+        results[name] = {
+            "median": statistics.median(latencies),
+            "p95": latencies[min(len(latencies) - 1, int(0.95 * len(latencies)))],
+            "max": latencies[-1]
+        }
+    return results
+
+def drop_schema_indexes(database: Database) -> List[str]:
+    """
+    Drops the indexes declared by the schema (this includes the unique indexes on the UUID
+    columns), leaving only primary keys. Only for benchmark databases!
+
+    Returns
+    -------
+    List[str]
+        Names of the dropped indexes.
+    """
+    dropped = []
+    with database.engine.begin() as connection:
+        for table in SQLModel.metadata.sorted_tables:
+            for index in table.indexes:
+                connection.execute(text(f"DROP INDEX IF EXISTS {index.name}"))
+                dropped.append(index.name)
+    return dropped
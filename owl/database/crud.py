@@ -1,8 +1,10 @@
 from sqlmodel import SQLModel, Session, select
 from ..models.schemas import Transcription, Conversation, Utterance, Location, CaptureSegment, Capture, ConversationState, Image
-from typing import List, Optional
-from sqlalchemy.orm import joinedload, selectinload
-from sqlalchemy import desc, func, or_
+from ..models.conversation_json_cache import conversation_json_cache
+from .search import remove_conversation
+from typing import List, Optional, Tuple
+from sqlalchemy.orm import joinedload, selectinload, noload
+from sqlalchemy import and_, desc, func, or_, update
 from datetime import datetime
 import logging
 
@@ -48,6 +50,19 @@ def get_capture_file_segment_file_ref(db: Session, conversation_uuid: str) -> Op
     result = db.execute(statement).first()
     return result[0] if result else None
 
+def update_capture_duration(db: Session, capture_uuid: str, duration: float):
+    db.execute(update(Capture).where(Capture.capture_uuid == capture_uuid).values(duration=duration))
+    db.commit()
+
+def add_capture_duration(db: Session, capture_uuid: str, seconds: float):
+    # Increment in the database so that concurrent appends to the same capture are not lost
+    db.execute(update(Capture).where(Capture.capture_uuid == capture_uuid).values(duration=func.coalesce(Capture.duration, 0) + seconds))
+    db.commit()
+
+def update_capture_segment_duration(db: Session, conversation_uuid: str, duration: float):
+    db.execute(update(CaptureSegment).where(CaptureSegment.conversation_uuid == conversation_uuid).values(duration=duration))
+    db.commit()
+
 def get_transcription(db: Session, transcription_id: int) -> Transcription:
     statement = select(Transcription).where(Transcription.id == transcription_id)
     return db.exec(statement).first()
@@ -55,8 +70,7 @@ def get_transcription(db: Session, transcription_id: int) -> Transcription:
 def get_conversation(db: Session, conversation_id: int) -> Conversation:
     result = db.query(Conversation).options(
         selectinload(Conversation.transcriptions)
-        .selectinload(Transcription.utterances)
-        .selectinload(Utterance.words),
+        .selectinload(Transcription.utterances),
         selectinload(Conversation.capture_segment_file)
         .joinedload(CaptureSegment.source_capture),
         selectinload(Conversation.primary_location),
@@ -121,6 +135,10 @@ def update_conversation_state(db: Session, conversation_id: int, new_state: Conv
     else:
         raise Exception(f"Conversation with ID {conversation_id} not found.")
     
+def update_conversation_summary(db: Session, conversation_uuid: str, summary: str):
+    db.execute(update(Conversation).where(Conversation.conversation_uuid == conversation_uuid).values(summary=summary))
+    db.commit()
+
 def update_transcription(db: Session, transcription_id: int, updated_transcription: Transcription) -> Transcription:
     db_transcription = db.get(Transcription, transcription_id)
     if db_transcription:
@@ -146,14 +164,63 @@ def delete_conversation(db: Session, conversation_id: int) -> bool:
     if not conversation:
         return False
 
+    remove_conversation(db, conversation_id)
     db.delete(conversation)
     db.commit()
+    conversation_json_cache.invalidate(conversation_id)
     return True
 
 def get_all_conversations(db: Session, offset: int = 0, limit: int = 10) -> List[Conversation]:
+    # Collections are loaded with one query per relationship for the whole page (selectinload)
+    # rather than joined, which would return a row for every utterance of every conversation.
+    # Words are not part of ConversationRead and are left to load lazily.
     return db.query(Conversation).options(
-        joinedload(Conversation.transcriptions).joinedload(Transcription.utterances).joinedload(Utterance.words)
-    ).order_by(desc(Conversation.created_at)).offset(offset).limit(limit).all()
+        selectinload(Conversation.transcriptions).selectinload(Transcription.utterances),
+        selectinload(Conversation.suggested_links),
+        selectinload(Conversation.primary_location),
+        selectinload(Conversation.capture_segment_file).joinedload(CaptureSegment.source_capture)
+    ).order_by(desc(Conversation.created_at), desc(Conversation.id)).offset(offset).limit(limit).all()
+
+def _conversation_summary_options(include_utterances: bool):
+    # Loader options for ConversationSummaryRead
+    options = [
+        selectinload(Conversation.primary_location),
+        selectinload(Conversation.capture_segment_file).joinedload(CaptureSegment.source_capture)
+    ]
+    if include_utterances:
+        options.append(selectinload(Conversation.transcriptions).selectinload(Transcription.utterances).noload(Utterance.words))
+    else:
+        options.append(noload(Conversation.transcriptions))
+    return options
+
+def get_conversations_page(db: Session, limit: int = 50, before: Optional[Tuple[datetime, int]] = None, include_utterances: bool = False) -> List[Conversation]:
+    """
+    Returns conversations newest first, using keyset pagination: the page starts after the
+    conversation identified by `before`, a (created_at, id) pair, so that the cost of a page does not
+    grow with its depth. Relationships are loaded with one additional query each rather than joins,
+    and words are never loaded. Transcriptions are not loaded at all unless include_utterances.
+    """
+    query = db.query(Conversation).options(*_conversation_summary_options(include_utterances=include_utterances))
+    if before is not None:
+        created_at, conversation_id = before
+        query = query.filter(or_(Conversation.created_at < created_at, and_(Conversation.created_at == created_at, Conversation.id < conversation_id)))
+    return query.order_by(desc(Conversation.created_at), desc(Conversation.id)).limit(limit).all()
+
+def get_conversations_by_ids(db: Session, conversation_ids: List[int], include_utterances: bool = False) -> List[Conversation]:
+    """
+    Returns the conversations with the given IDs, loaded for ConversationSummaryRead, in no
+    particular order.
+    """
+    if not conversation_ids:
+        return []
+    return db.query(Conversation).options(*_conversation_summary_options(include_utterances=include_utterances)).filter(Conversation.id.in_(conversation_ids)).all()
+
+def get_conversation_transcriptions(db: Session, conversation_id: int, include_words: bool = True) -> List[Transcription]:
+    # Packed words are part of the utterance rows, so the words query only returns rows for
+    # utterances whose words are not packed
+    utterances = selectinload(Transcription.utterances)
+    utterances = utterances.selectinload(Utterance.words) if include_words else utterances.noload(Utterance.words)
+    return db.query(Transcription).options(utterances).filter(Transcription.conversation_id == conversation_id).order_by(Transcription.id).all()
 
 def create_location(db: Session, location_data: Location) -> Location:
     new_location = Location(latitude=location_data.latitude, longitude=location_data.longitude, address=location_data.address, capture_uuid=location_data.capture_uuid)
@@ -1,3 +1,16 @@
+#
+# database.py
+#
+# Database engine and sessions. Synchronous sessions (get_db()) are used by FastAPI's synchronous
+# route handlers, which already run on a thread pool, and by command line tools. Async code must
+# not use them directly, as every query would block the event loop; it should use run() instead,
+# which executes a function on a dedicated pool of database threads.
+#
+
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable
+
 from sqlmodel import SQLModel, create_engine
 from sqlalchemy.orm import sessionmaker, scoped_session
 from ..core.config import DatabaseConfiguration
@@ -16,6 +29,7 @@ class Database:
         )
         self.session_factory = sessionmaker(autocommit=False, autoflush=False, bind=self.engine)
         self.SessionLocal = scoped_session(self.session_factory)
+        self._executor = ThreadPoolExecutor(max_workers=config.thread_pool_size, thread_name_prefix="database")
 
     def init_db(self):
         alembic_cfg = Config("./alembic.ini")
@@ -28,4 +42,27 @@ class Database:
             yield db
         finally:
             db.close()
-            self.SessionLocal.remove() 
\ No newline at end of file
+            self.SessionLocal.remove() 
+
+    async def run(self, fn: Callable[..., Any], *args, **kwargs) -> Any:
+        """
+        Runs a function that accesses the database on a database thread, without blocking the
+        event loop.
+
+        Parameters
+        ----------
+        fn : Callable[..., Any]
+            Function called as fn(db, *args, **kwargs), where db is a session opened for the call
+            and closed afterwards. Objects are not expired on commit, so that loaded attributes of
+            returned objects remain readable, but lazy-loaded relationships that were not loaded by
+            the function are not available.
+
+        Returns
+        -------
+        Any
+            Return value of the function.
+        """
+        def run_with_session():
+            with self.session_factory(expire_on_commit=False) as db:
+                return fn(db, *args, **kwargs)
+        return await asyncio.get_running_loop().run_in_executor(self._executor, run_with_session)
@@ -0,0 +1,105 @@
+#
+# search.py
+#
+# Full-text search over conversations, using an SQLite FTS5 index (conversation_fts, created by a
+# migration) with one document per conversation: its summary, short summary, and the text of its
+# final (non-realtime) transcript. Documents are indexed when a conversation finishes processing and
+# removed when it is deleted.
+#
+# Other databases have no index and search is unsupported.
+#
+
+from dataclasses import dataclass
+import re
+from typing import List
+
+from sqlalchemy import text
+from sqlmodel import Session
+
+from ..models.schemas import Conversation
+
+
+# Highlighted terms in snippets are delimited by these
+HIGHLIGHT_START = "<b>"
+HIGHLIGHT_END = "</b>"
+
+@dataclass
+class SearchHit:
+    conversation_id: int
+    rank: float     # lower is better (BM25)
+    snippet: str
+
+def is_search_supported(db: Session) -> bool:
+    return db.get_bind().dialect.name == "sqlite"
+
+def index_conversation(db: Session, conversation: Conversation, transcript: str):
+    """
+    Adds or replaces a conversation's document. Does not commit, so that the document can be
+    updated in the same transaction as the conversation.
+    """
+    if not is_search_supported(db):
+        return
+    db.execute(text("DELETE FROM conversation_fts WHERE rowid = :id"), { "id": conversation.id })
+    db.execute(
+        text("INSERT INTO conversation_fts (rowid, summary, short_summary, transcript) VALUES (:id, :summary, :short_summary, :transcript)"),
+        { "id": conversation.id, "summary": conversation.summary or "", "short_summary": conversation.short_summary or "", "transcript": transcript }
+    )
+
+def remove_conversation(db: Session, conversation_id: int):
+    """
+    Removes a conversation's document. Does not commit.
+    """
+    if not is_search_supported(db):
+        return
+    db.execute(text("DELETE FROM conversation_fts WHERE rowid = :id"), { "id": conversation_id })
+
+def rebuild_search_index(db: Session):
+    """
+    Re-indexes all conversations with a final transcript.
+    """
+    if not is_search_supported(db):
+        return
+    db.execute(text("DELETE FROM conversation_fts"))
+    db.execute(text("""
+        INSERT INTO conversation_fts (rowid, summary, short_summary, transcript)
+        SELECT conversation.id, coalesce(conversation.summary, ''), coalesce(conversation.short_summary, ''), coalesce(group_concat(utterance.text, ' '), '')
+        FROM conversation
+        JOIN transcription ON transcription.conversation_id = conversation.id AND NOT transcription.realtime
+        LEFT JOIN utterance ON utterance.transcription_id = transcription.id
+        GROUP BY conversation.id
+    """))
+    db.commit()
+
+def to_match_expression(query: str) -> str:
+    """
+    Converts free text into an FTS5 query matching documents that contain all of its terms, with
+    the final term treated as a prefix (for search-as-you-type). FTS5 query syntax in the input is
+    not interpreted.
+    """
+    terms = re.findall(r"\w+", query)
+    if not terms:
+        return ""
+    quoted = [ f"\"{term}\"" for term in terms ]
+    quoted[-1] += "*"
+    return " ".join(quoted)
+
+def search_conversations(db: Session, query: str, limit: int = 20, offset: int = 0) -> List[SearchHit]:
+    """
+    Returns conversations matching the query, best first, each with a snippet of the best matching
+    column in which matched terms are delimited by HIGHLIGHT_START and HIGHLIGHT_END.
+    """
+    match_expression = to_match_expression(query)
+    if not match_expression:
+        return []
+    # Matches in summaries outweigh matches in the (much longer) transcript
+    rows = db.execute(
+        text("""
+            SELECT rowid, bm25(conversation_fts, 4.0, 8.0, 1.0) AS rank, snippet(conversation_fts, -1, :start, :end, '…', 16) AS snippet
+            FROM conversation_fts
+            WHERE conversation_fts MATCH :match
+            ORDER BY rank
+            LIMIT :limit OFFSET :offset
+        """),
+        { "match": match_expression, "start": HIGHLIGHT_START, "end": HIGHLIGHT_END, "limit": limit, "offset": offset }
+    ).all()
+    return [ SearchHit(conversation_id=row.rowid, rank=row.rank, snippet=row.snippet) for row in rows ]
@@ -0,0 +1,163 @@
+#
+# utterance_buffer.py
+#
+# Write-behind buffer for realtime utterances. Rather than committing each utterance as it arrives
+# (a transaction, and with SQLite an fsync, per utterance, on the event loop), utterances from all
+# capture sessions are accumulated and inserted in a single transaction on a worker thread once
+# enough have accumulated or the oldest has waited long enough. Objects are not expired on commit
+# (see Database.run()), so callers may continue to read them.
+#
+# Buffered utterances have not been assigned database IDs yet. Anything that reads utterances back
+# from the database should flush() first, and anything that needs an utterance's ID (e.g., to notify
+# clients) should pass a callback to add(), which is called once it has been written.
+#
+# Batches that fail to be written are put back and retried a few times. After that (or immediately,
+# when the caller cannot wait, e.g., before processing a conversation or on shutdown), utterances
+# are written one at a time, so that a single bad row does not hold up all others, and those that
+# still fail are dropped. flush() reports whether everything was written.
+#
+
+import asyncio
+import logging
+import time
+from typing import Awaitable, Callable, List, Set, Tuple
+
+from sqlmodel import Session
+
+from .database import Database
+from ..models.schemas import Utterance
+from ..models.packed_words import pack_utterance_words
+
+logger = logging.getLogger(__name__)
+
+class UtteranceWriteBuffer:
+    def __init__(self, database: Database, max_batch_size: int = 25, max_delay_seconds: float = 1.0, pack_words: bool = False, max_batch_attempts: int = 3):
+        """
+        Parameters
+        ----------
+        database : Database
+            Database to write to.
+
+        max_batch_size : int
+            Buffered utterances are written as soon as there are this many.
+
+        max_delay_seconds : float
+            Maximum time an utterance is buffered before being written.
+
+        pack_words : bool
+            Whether to store word timings packed rather than as Word rows.
+
+        max_batch_attempts : int
+            Number of times a batch is attempted in a single transaction before its utterances are
+            written one at a time.
+        """
+        self._database = database
+        self._max_batch_size = max(1, max_batch_size)
+        self._max_delay_seconds = max_delay_seconds
+        self._pack_words = pack_words
+        self._max_batch_attempts = max(1, max_batch_attempts)
+        self._num_failed_attempts = 0
+        self._pending: List[Tuple[Utterance, Callable[[Utterance], Awaitable[None]] | None]] = []
+        self._flush_lock = asyncio.Lock()
+        self._timer_task: asyncio.Task | None = None
+
+    def add(self, utterance: Utterance, on_written: Callable[[Utterance], Awaitable[None]] | None = None):
+        """
+        Buffers an utterance for insertion. Does not block.
+
+        Parameters
+        ----------
+        utterance : Utterance
+            Utterance to insert.
+
+        on_written : Callable[[Utterance], Awaitable[None]] | None
+            Called with the utterance once it has been written (and assigned an ID).
+        """
+        if self._pack_words:
+            pack_utterance_words(utterance)
+        self._pending.append((utterance, on_written))
+        if len(self._pending) >= self._max_batch_size:
+            asyncio.create_task(self.flush())
+        else:
+            self._schedule_flush()
+
+    async def flush(self, write_individually_on_failure: bool = False) -> bool:
+        """
+        Writes all buffered utterances in a single transaction.
+
+        Parameters
+        ----------
+        write_individually_on_failure : bool
+            If the transaction fails, write the utterances one at a time right away (dropping those
+            that fail) rather than retrying the batch later.
+
+        Returns
+        -------
+        bool
+            Whether all buffered utterances were written. If not, they are either retried later or
+            were dropped.
+        """
+        async with self._flush_lock:
+            if not self._pending:
+                return True
+            batch = self._pending
+            self._pending = []
+            start_time = time.perf_counter()
+            try:
+                await self._database.run(self._write, [ utterance for utterance, _ in batch ])
+                logger.debug(f"Wrote {len(batch)} utterances in {time.perf_counter() - start_time:.3f} seconds")
+                self._num_failed_attempts = 0
+            except Exception as e:
+                self._num_failed_attempts += 1
+                if not write_individually_on_failure and self._num_failed_attempts < self._max_batch_attempts:
+                    # Put the batch back ahead of newer utterances and retry it later
+                    logger.error(f"Failed to write {len(batch)} utterances, will retry: {e}")
+                    self._pending = batch + self._pending
+                    self._schedule_flush()
+                    return False
+                logger.error(f"Failed to write {len(batch)} utterances, writing them one at a time: {e}")
+                self._num_failed_attempts = 0
+                failed = await self._database.run(self._write_individually, [ utterance for utterance, _ in batch ])
+                batch = [ (utterance, on_written) for index, (utterance, on_written) in enumerate(batch) if index not in failed ]
+                all_written = not failed
+            else:
+                all_written = True
+        await self._notify_written(batch)
+        return all_written
+
+    async def _notify_written(self, batch: List[Tuple[Utterance, Callable[[Utterance], Awaitable[None]] | None]]):
+        for utterance, on_written in batch:
+            if on_written is not None:
+                try:
+                    await on_written(utterance)
+                except Exception as e:
+                    logger.error(f"Error in utterance written callback: {e}")
+
+    def _schedule_flush(self):
+        if self._timer_task is None or self._timer_task.done():
+            self._timer_task = asyncio.create_task(self._flush_after_delay())
+
+    async def _flush_after_delay(self):
+        await asyncio.sleep(self._max_delay_seconds)
+        self._timer_task = None     # a failed flush schedules another
+        await self.flush()
+
+    @staticmethod
+    def _write(db: Session, batch: List[Utterance]):
+        db.add_all(batch)
+        db.commit()
+
+    @staticmethod
+    def _write_individually(db: Session, batch: List[Utterance]) -> Set[int]:
+        # Returns the indices of the utterances that could not be written
+        failed = set()
+        for index, utterance in enumerate(batch):
+            try:
+                db.add(utterance)
+                db.commit()
+                db.expunge(utterance)   # or a later rollback would expire it
+            except Exception as e:
+                db.rollback()
+                failed.add(index)
+                logger.error(f"Dropping utterance that could not be written (transcription_id={utterance.transcription_id}): {e}")
+        return failed
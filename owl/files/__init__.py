@@ -1,3 +1,4 @@
 from .capture_directory import CaptureDirectory
 from .wav_file import append_to_wav_file
-from .aac_frame_sequencer import AACFrameSequencer
\ No newline at end of file
+from .aac_frame_sequencer import AACFrameSequencer
+from .audio_file import get_audio_duration, AudioDurationCounter, DecodedAudioCache
\ No newline at end of file
@@ -0,0 +1,284 @@
+#
+# audio_file.py
+#
+# Audio file metadata and decoding helpers. Durations are computed from file headers (WAV) or by
+# walking the frame headers of the compressed stream (ADTS AAC, MP3) without decoding any audio.
+# Decoding is only used as a fallback for other formats. The same frame walking is used to track
+# the duration of streams incrementally as they are written.
+#
+# Also provides a small cache of decoded audio, keyed by file path and invalidated when the file
+# changes, so that jobs that need the same decoded audio more than once only decode it once.
+#
+# Useful resources:
+#   - http://soundfile.sapp.org/doc/WaveFormat/
+#   - https://wiki.multimedia.cx/index.php/ADTS
+#   - http://www.mp3-tech.org/programmer/frame_header.html
+#
+
+from collections import OrderedDict
+import logging
+import os
+import threading
+from typing import Any, Callable, Tuple
+
+from pydub import AudioSegment
+
+
+logger = logging.getLogger(__name__)
+
+_adts_sampling_rates = [ 96000, 88200, 64000, 48000, 44100, 32000, 24000, 22050, 16000, 12000, 11025, 8000, 7350 ]
+
+_mp3_sampling_rates = {
+    3: [ 44100, 48000, 32000 ], # MPEG-1
+    2: [ 22050, 24000, 16000 ], # MPEG-2
+    0: [ 11025, 12000, 8000 ]   # MPEG-2.5
+}
+
+_mp3_bitrates_kbps = {
+    (3, 3): [ 0, 32, 64, 96, 128, 160, 192, 224, 256, 288, 320, 352, 384, 416, 448 ],  # MPEG-1, layer I
+    (3, 2): [ 0, 32, 48, 56, 64, 80, 96, 112, 128, 160, 192, 224, 256, 320, 384 ],     # MPEG-1, layer II
+    (3, 1): [ 0, 32, 40, 48, 56, 64, 80, 96, 112, 128, 160, 192, 224, 256, 320 ],      # MPEG-1, layer III
+    (2, 3): [ 0, 32, 48, 56, 64, 80, 96, 112, 128, 144, 160, 176, 192, 224, 256 ],     # MPEG-2/2.5, layer I
+    (2, 2): [ 0, 8, 16, 24, 32, 40, 48, 56, 64, 80, 96, 112, 128, 144, 160 ],          # MPEG-2/2.5, layer II
+    (2, 1): [ 0, 8, 16, 24, 32, 40, 48, 56, 64, 80, 96, 112, 128, 144, 160 ]           # MPEG-2/2.5, layer III
+}
+
+def get_audio_duration(filepath: str) -> float:
+    """
+    Computes the duration of an audio file without decoding it, if possible.
+
+    Parameters
+    ----------
+    filepath : str
+        Audio file. WAV, ADTS AAC, and MP3 durations are computed from headers. Other formats are
+        decoded.
+
+    Returns
+    -------
+    float
+        Duration in seconds.
+    """
+    format = os.path.splitext(filepath)[1].lstrip(".").lower()
+    if format == "wav":
+        with open(filepath, "rb") as fp:
+            header = fp.read(4096)
+            file_size = fp.seek(0, 2)
+        duration = _get_wav_duration(header=header, file_size=file_size)
+        if duration is not None:
+            return duration
+    elif format == "aac":
+        with open(filepath, "rb") as fp:
+            return get_adts_duration(fp.read())[0]
+    elif format == "mp3":
+        with open(filepath, "rb") as fp:
+            return get_mp3_duration(fp.read())[0]
+    logger.info(f"Decoding {filepath} to determine its duration")
+    return len(AudioSegment.from_file(filepath)) / 1000.0
+
+def _get_wav_duration(header: bytes, file_size: int) -> float | None:
+    # Walk the RIFF chunks to find the format and data chunks. The data chunk size is clamped to
+    # what is actually in the file in case the header was not updated.
+    if len(header) < 12 or header[0:4] != b"RIFF" or header[8:12] != b"WAVE":
+        return None
+    byte_rate = None
+    offset = 12
+    while offset + 8 <= len(header):
+        chunk_id = header[offset:offset + 4]
+        chunk_size = int.from_bytes(header[offset + 4:offset + 8], byteorder="little")
+        if chunk_id == b"fmt " and offset + 16 <= len(header):
+            byte_rate = int.from_bytes(header[offset + 16:offset + 20], byteorder="little")
+        elif chunk_id == b"data":
+            if not byte_rate:
+                return None
+            data_size = min(chunk_size, file_size - (offset + 8))
+            return max(0, data_size) / byte_rate
+        offset += 8 + chunk_size + (chunk_size & 1)
+    return None
+
+def get_adts_duration(data: bytes) -> Tuple[float, int]:
+    """
+    Computes the duration of ADTS AAC frames by walking frame headers.
+
+    Parameters
+    ----------
+    data : bytes
+        ADTS stream.
+
+    Returns
+    -------
+    Tuple[float, int]
+        Duration of all complete frames, in seconds, and number of bytes consumed. Bytes beyond
+        this are an incomplete frame (if any) that would be completed by subsequent data.
+    """
+    duration = 0.0
+    i = 0
+    length = len(data)
+    while i + 7 <= length:
+        if data[i] != 0xff or (data[i + 1] & 0xf6) != 0xf0:
+            i += 1  # not a sync word (or non-zero layer), resynchronize
+            continue
+        sampling_frequency_index = (data[i + 2] >> 2) & 0xf
+        frame_length = ((data[i + 3] & 0x03) << 11) | (data[i + 4] << 3) | ((data[i + 5] >> 5) & 0x07)
+        if sampling_frequency_index >= len(_adts_sampling_rates) or frame_length < 7:
+            i += 1
+            continue
+        if i + frame_length > length:
+            break
+        num_raw_data_blocks = (data[i + 6] & 0x03) + 1
+        duration += num_raw_data_blocks * 1024 / _adts_sampling_rates[sampling_frequency_index]
+        i += frame_length
+    return duration, i
+
+def get_mp3_duration(data: bytes) -> Tuple[float, int]:
+    """
+    Computes the duration of MPEG audio frames by walking frame headers. Leading ID3v2 tags are
+    skipped.
+
+    Parameters
+    ----------
+    data : bytes
+        MP3 stream.
+
+    Returns
+    -------
+    Tuple[float, int]
+        Duration of all complete frames, in seconds, and number of bytes consumed. Bytes beyond
+        this are an incomplete frame (if any) that would be completed by subsequent data.
+    """
+    duration = 0.0
+    i = 0
+    length = len(data)
+    if length >= 10 and data[0:3] == b"ID3":
+        tag_size = (data[6] << 21) | (data[7] << 14) | (data[8] << 7) | data[9]
+        i = 10 + tag_size + (10 if data[5] & 0x10 else 0)
+    while i + 4 <= length:
+        if data[i] != 0xff or (data[i + 1] & 0xe0) != 0xe0:
+            i += 1
+            continue
+        version = (data[i + 1] >> 3) & 0x3
+        layer = (data[i + 1] >> 1) & 0x3
+        bitrate_index = data[i + 2] >> 4
+        sampling_rate_index = (data[i + 2] >> 2) & 0x3
+        padding = (data[i + 2] >> 1) & 0x1
+        if version == 1 or layer == 0 or bitrate_index in (0, 15) or sampling_rate_index == 3:
+            i += 1  # reserved or free format values, resynchronize
+            continue
+        bitrate = _mp3_bitrates_kbps[(3 if version == 3 else 2, layer)][bitrate_index] * 1000
+        sampling_rate = _mp3_sampling_rates[version][sampling_rate_index]
+        if layer == 3:
+            samples_per_frame = 384
+            frame_length = (12 * bitrate // sampling_rate + padding) * 4
+        else:
+            samples_per_frame = 576 if layer == 1 and version != 3 else 1152
+            frame_length = (samples_per_frame // 8) * bitrate // sampling_rate + padding
+        if i + frame_length > length:
+            break
+        duration += samples_per_frame / sampling_rate
+        i += frame_length
+    return duration, min(i, length)
+
+class DecodedAudioCache:
+    """
+    Least recently used cache of decoded audio (or anything derived from an audio file). Entries are
+    keyed by file path and invalidated when the file's modification time or size changes.
+    """
+
+    def __init__(self, max_entries: int = 4):
+        self._max_entries = max_entries
+        self._entries: OrderedDict[str, Tuple[Tuple[float, int], Any]] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, filepath: str, decode: Callable[[str], Any]) -> Any:
+        """
+        Returns the decoded contents of a file, decoding it only if it is not already cached.
+
+        Parameters
+        ----------
+        filepath : str
+            File to decode.
+
+        decode : Callable[[str], Any]
+            Function that decodes the file, given its path.
+        """
+        stat = os.stat(filepath)
+        version = (stat.st_mtime, stat.st_size)
+        with self._lock:
+            entry = self._entries.get(filepath)
+            if entry is not None and entry[0] == version:
+                self._entries.move_to_end(filepath)
+                return entry[1]
+        decoded = decode(filepath)
+        with self._lock:
+            self._entries[filepath] = (version, decoded)
+            self._entries.move_to_end(filepath)
+            while len(self._entries) > self._max_entries:
+                self._entries.popitem(last=False)
+        return decoded
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+class AudioDurationCounter:
+    """
+    Incrementally tracks the duration of an audio stream as it is written, one chunk at a time, so
+    that the duration of a growing file never has to be recomputed from the file itself. Chunks may
+    split samples or compressed frames arbitrarily; incomplete data is carried over to the next
+    chunk.
+    """
+
+    def __init__(self, format: str, initial_duration: float = 0, sample_rate: int = 16000, sample_bits: int = 16, num_channels: int = 1):
+        """
+        Parameters
+        ----------
+        format : str
+            Stream format: "wav" (raw PCM samples, excluding any header), "aac" (ADTS), or "mp3".
+
+        initial_duration : float
+            Duration in seconds of audio already written prior to the first chunk.
+
+        sample_rate : int
+            Sample rate in Hz. Only used for PCM.
+
+        sample_bits : int
+            Sample bit width. Only used for PCM.
+
+        num_channels : int
+            Number of channels. Only used for PCM.
+        """
+        assert format in [ "wav", "aac", "mp3" ]
+        self._format = format
+        self._duration = initial_duration
+        self._bytes_per_second = sample_rate * (sample_bits // 8) * num_channels
+        self._frame_size = (sample_bits // 8) * num_channels
+        self._carry = bytes()
+
+    @property
+    def duration(self) -> float:
+        return self._duration
+
+    def add(self, data: bytes) -> float:
+        """
+        Accounts for a chunk of audio data appended to the stream.
+
+        Parameters
+        ----------
+        data : bytes
+            Audio data.
+
+        Returns
+        -------
+        float
+            Duration in seconds that was added.
+        """
+        data = self._carry + data
+        if self._format == "wav":
+            consumed = len(data) - (len(data) % self._frame_size)
+            added = consumed / self._bytes_per_second
+        elif self._format == "aac":
+            added, consumed = get_adts_duration(data)
+        else:
+            added, consumed = get_mp3_duration(data)
+        self._carry = data[consumed:]
+        self._duration += added
+        return added
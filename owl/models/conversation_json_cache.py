@@ -0,0 +1,54 @@
+#
+# conversation_json_cache.py
+#
+# Cache of serialized conversations (ConversationRead as compact JSON), keyed by conversation ID and
+# updated_at, so that broadcasting or returning a conversation repeatedly does not walk its object
+# graph (transcriptions, utterances, etc.) each time. Any update of a conversation changes its
+# updated_at and therefore its key.
+#
+# Only conversations that are no longer being captured or processed are cached. While they are,
+# their utterances and transcriptions change without the conversation itself being updated.
+#
+
+from collections import OrderedDict
+from datetime import datetime
+import threading
+from typing import Tuple
+
+from .schemas import Conversation, ConversationRead, ConversationState
+
+
+class ConversationJSONCache:
+    def __init__(self, max_entries: int = 1000):
+        self._max_entries = max_entries
+        self._json_by_key: OrderedDict[Tuple[int, datetime], str] = OrderedDict()
+        self._lock = threading.Lock()  # used from database threads
+
+    def get_json(self, conversation: Conversation) -> str:
+        """
+        Returns the conversation serialized as ConversationRead JSON.
+        """
+        cacheable = conversation.id is not None and conversation.state in (ConversationState.COMPLETED, ConversationState.FAILED_PROCESSING)
+        if not cacheable:
+            return ConversationRead.from_orm(conversation).model_dump_json()
+
+        key = (conversation.id, conversation.updated_at)
+        with self._lock:
+            conversation_json = self._json_by_key.get(key)
+            if conversation_json is not None:
+                self._json_by_key.move_to_end(key)
+                return conversation_json
+
+        conversation_json = ConversationRead.from_orm(conversation).model_dump_json()
+        with self._lock:
+            self._json_by_key[key] = conversation_json
+            while len(self._json_by_key) > self._max_entries:
+                self._json_by_key.popitem(last=False)
+        return conversation_json
+
+    def invalidate(self, conversation_id: int):
+        with self._lock:
+            for key in [ key for key in self._json_by_key.keys() if key[0] == conversation_id ]:
+                del self._json_by_key[key]
+
+conversation_json_cache = ConversationJSONCache()
@@ -0,0 +1,134 @@
+#
+# packed_words.py
+#
+# Compact storage of word timings. Rather than a Word row per word, an utterance's words can be
+# packed into a single blob of columnar arrays, which is only expanded into WordRead objects when a
+# client asks for word timings.
+#
+# Layout (little endian):
+#
+#   uint8       version (1)
+#   uint32      number of words, N
+#   uint16      number of speakers, S
+#   S times:    uint16 length followed by UTF-8 speaker label
+#   uint32[N+1] offsets of each word in the text that follows (bytes)
+#   bytes       UTF-8 text of all words, concatenated
+#   float32[N]  start times (NaN if None)
+#   float32[N]  end times (NaN if None)
+#   float32[N]  scores (NaN if None)
+#   int16[N]    speaker index (-1 if None)
+#
+
+from array import array
+import math
+import struct
+import sys
+from typing import List, Sequence
+
+from .schemas import Word, WordRead, Utterance
+
+
+_VERSION = 1
+
+def _to_little_endian(values: array) -> bytes:
+    if sys.byteorder != "little":
+        values = array(values.typecode, values)
+        values.byteswap()
+    return values.tobytes()
+
+def _from_little_endian(typecode: str, data: bytes) -> array:
+    values = array(typecode)
+    values.frombytes(data)
+    if sys.byteorder != "little":
+        values.byteswap()
+    return values
+
+def _optional_float(value: float) -> float | None:
+    # Shortest decimal that round-trips through float32 (e.g., 0.1 rather than 0.10000000149...)
+    return None if math.isnan(value) else float(f"{value:.7g}")
+
+def pack_words(words: Sequence[Word]) -> bytes:
+    speakers = []
+    speaker_indices = {}
+    offsets = array("I", [ 0 ])
+    text = bytearray()
+    starts = array("f")
+    ends = array("f")
+    scores = array("f")
+    speaker_ids = array("h")
+    for word in words:
+        text += word.word.encode("utf-8")
+        offsets.append(len(text))
+        starts.append(math.nan if word.start is None else word.start)
+        ends.append(math.nan if word.end is None else word.end)
+        scores.append(math.nan if word.score is None else word.score)
+        if word.speaker is None:
+            speaker_ids.append(-1)
+        else:
+            if word.speaker not in speaker_indices:
+                speaker_indices[word.speaker] = len(speakers)
+                speakers.append(word.speaker)
+            speaker_ids.append(speaker_indices[word.speaker])
+
+    blob = bytearray(struct.pack("<BIH", _VERSION, len(words), len(speakers)))
+    for speaker in speakers:
+        label = speaker.encode("utf-8")
+        blob += struct.pack("<H", len(label)) + label
+    blob += _to_little_endian(offsets)
+    blob += text
+    for values in [ starts, ends, scores, speaker_ids ]:
+        blob += _to_little_endian(values)
+    return bytes(blob)
+
+def unpack_words(blob: bytes, utterance_id: int | None = None) -> List[WordRead]:
+    version, num_words, num_speakers = struct.unpack_from("<BIH", blob, 0)
+    if version != _VERSION:
+        raise ValueError(f"Unsupported packed words version: {version}")
+    position = struct.calcsize("<BIH")
+
+    speakers = []
+    for _ in range(num_speakers):
+        (length,) = struct.unpack_from("<H", blob, position)
+        position += 2
+        speakers.append(blob[position:position + length].decode("utf-8"))
+        position += length
+
+    offsets = _from_little_endian("I", blob[position:position + 4 * (num_words + 1)])
+    position += 4 * (num_words + 1)
+    text = blob[position:position + offsets[-1]]
+    position += offsets[-1]
+    starts = _from_little_endian("f", blob[position:position + 4 * num_words])
+    position += 4 * num_words
+    ends = _from_little_endian("f", blob[position:position + 4 * num_words])
+    position += 4 * num_words
+    scores = _from_little_endian("f", blob[position:position + 4 * num_words])
+    position += 4 * num_words
+    speaker_ids = _from_little_endian("h", blob[position:position + 2 * num_words])
+
+    return [
+        WordRead(
+            id=None,
+            word=text[offsets[i]:offsets[i + 1]].decode("utf-8"),
+            start=_optional_float(starts[i]),
+            end=_optional_float(ends[i]),
+            score=_optional_float(scores[i]),
+            speaker=speakers[speaker_ids[i]] if speaker_ids[i] >= 0 else None,
+            utterance_id=utterance_id
+        ) for i in range(num_words)
+    ]
+
+def pack_utterance_words(utterance: Utterance):
+    """
+    Replaces an unsaved utterance's Word objects with their packed representation.
+    """
+    if utterance.words:
+        utterance.packed_words = pack_words(utterance.words)
+        utterance.words = []
+
+def get_word_reads(utterance: Utterance) -> List[WordRead]:
+    """
+    Returns an utterance's words, whether packed or stored as rows.
+    """
+    if utterance.packed_words is not None:
+        return unpack_words(utterance.packed_words, utterance_id=utterance.id)
+    return [ WordRead.from_orm(word) for word in utterance.words ]
@@ -1,5 +1,5 @@
-from typing import List, Optional
-from sqlmodel import SQLModel, Field, Relationship
+from typing import Dict, List, Optional
+from sqlmodel import SQLModel, Field, Relationship, Column, JSON, Index, LargeBinary
 from datetime import datetime, timezone
 from pydantic import BaseModel
 from enum import Enum
@@ -9,7 +9,7 @@ from .datetime_serialization import datetime_string
 
 class CreatedAtMixin(SQLModel):
     created_at: datetime = Field(default_factory=lambda: datetime.now(timezone.utc), nullable=False)
-    updated_at: datetime = Field(default_factory=lambda: datetime.now(timezone.utc), nullable=False)
+    updated_at: datetime = Field(default_factory=lambda: datetime.now(timezone.utc), nullable=False, sa_column_kwargs={ "onupdate": lambda: datetime.now(timezone.utc) })
 
 
 class Word(CreatedAtMixin, table=True):
@@ -19,7 +19,7 @@ class Word(CreatedAtMixin, table=True):
     end: Optional[float] = None
     score: Optional[float] = None
     speaker: Optional[str] = None
-    utterance_id: Optional[int] = Field(default=None, foreign_key="utterance.id")
+    utterance_id: Optional[int] = Field(default=None, foreign_key="utterance.id", index=True)
 
     utterance: "Utterance" = Relationship(back_populates="words")
 
@@ -31,7 +31,8 @@ class Utterance(CreatedAtMixin, table=True):
     realtime: bool = Field(default=False)
     text: Optional[str] = None
     speaker: Optional[str] = None
-    transcription_id: Optional[int] = Field(default=None, foreign_key="transcription.id")
+    transcription_id: Optional[int] = Field(default=None, foreign_key="transcription.id", index=True)
+    packed_words: Optional[bytes] = Field(default=None, sa_column=Column(LargeBinary))   # words in compact form (see packed_words.py), in place of Word rows
 
     transcription: "Transcription" = Relationship(back_populates="utterances")
 
@@ -42,11 +43,16 @@ class Transcription(CreatedAtMixin, table=True):
     realtime: bool = Field(default=False)
     model: str
     transcription_time: float
-    conversation_id: Optional[int] = Field(default=None, foreign_key="conversation.id")
+    conversation_id: Optional[int] = Field(default=None, foreign_key="conversation.id", index=True)
     conversation: "Conversation" = Relationship(back_populates="transcriptions")
     utterances: List[Utterance] = Relationship(back_populates="transcription", sa_relationship_kwargs={"cascade": "all, delete-orphan"})
 
 class Location(CreatedAtMixin, table=True):
+    __table_args__ = (
+        Index("ix_location_created_at", "created_at"),
+        Index("ix_location_capture_uuid_created_at", "capture_uuid", "created_at"),
+    )
+
     id: Optional[int] = Field(default=None, primary_key=True)
     latitude: float = Field(nullable=False)
     longitude: float = Field(nullable=False)
@@ -62,17 +68,23 @@ class ConversationState(Enum):
     FAILED_PROCESSING = "FAILED_PROCESSING"
 
 class Conversation(CreatedAtMixin, table=True):
+    __table_args__ = (
+        Index("ix_conversation_created_at", "created_at"),
+        Index("ix_conversation_state_start_time", "state", "start_time"),
+    )
+
     id: Optional[int] = Field(default=None, primary_key=True)
     start_time: datetime = Field(...)
     end_time: Optional[datetime]
-    conversation_uuid: str
+    conversation_uuid: str = Field(unique=True, index=True)
     device_type: str
     summary: Optional[str]
     short_summary: Optional[str]
     summarization_model: Optional[str]
     state: ConversationState = Field(default=ConversationState.CAPTURING)
+    processing_timings: Optional[Dict[str, float]] = Field(default=None, sa_column=Column(JSON))    # seconds taken by each processing stage
 
-    capture_segment_file_id: Optional[int] = Field(default=None, foreign_key="capturesegment.id")
+    capture_segment_file_id: Optional[int] = Field(default=None, foreign_key="capturesegment.id", index=True)
     capture_segment_file: Optional["CaptureSegment"] = Relationship(back_populates="conversation")
     transcriptions: List[Transcription] = Relationship(back_populates="conversation")
     primary_location_id: Optional[int] = Field(default=None, foreign_key="location.id")
@@ -82,13 +94,13 @@ class Conversation(CreatedAtMixin, table=True):
 
 class SuggestedLink(CreatedAtMixin, table=True):
     id: Optional[int] = Field(default=None, primary_key=True)
-    conversation_id: Optional[int] = Field(default=None, foreign_key="conversation.id")
+    conversation_id: Optional[int] = Field(default=None, foreign_key="conversation.id", index=True)
     url: str 
     conversation: Optional['Conversation'] = Relationship(back_populates="suggested_links")
 
 class Capture(CreatedAtMixin, table=True):
     id: Optional[int] = Field(default=None, primary_key=True)
-    capture_uuid: str
+    capture_uuid: str = Field(unique=True, index=True)
     filepath: str = Field(...)
     start_time: datetime
     device_type: str
@@ -101,8 +113,8 @@ class CaptureSegment(CreatedAtMixin, table=True):
     id: Optional[int] = Field(default=None, primary_key=True)
     filepath: str = Field(...)
     start_time: datetime
-    conversation_uuid: str
-    source_capture_id: int = Field(default=None, foreign_key="capture.id")
+    conversation_uuid: str = Field(unique=True, index=True)
+    source_capture_id: int = Field(default=None, foreign_key="capture.id", index=True)
     source_capture: Capture = Relationship(back_populates="capture_segment_files")
     duration: Optional[float]
 
@@ -171,6 +183,19 @@ class CaptureSegmentRead(BaseModel):
             datetime: datetime_string
         }
 
+class UtteranceDetailRead(UtteranceRead):
+    words: List[WordRead] = []
+
+class TranscriptionDetailRead(BaseModel):
+    id: Optional[int] = None
+    realtime: Optional[bool] = None
+    model: Optional[str] = None
+    transcription_time: Optional[float] = None
+    conversation_id: Optional[int] = None
+    utterances: List[UtteranceDetailRead] = []
+    class Config:
+        from_attributes = True
+
 class TranscriptionRead(BaseModel):
     id: Optional[int] = None
     realtime: Optional[bool] = None
@@ -198,6 +223,7 @@ class ConversationRead(BaseModel):
     summarization_model: Optional[str]
     summary: Optional[str]
     short_summary: Optional[str]
+    processing_timings: Optional[Dict[str, float]] = None
     transcriptions: List[TranscriptionRead] = []
     suggested_links: List[SuggestedLink] = []
     primary_location: Optional[LocationRead] = None
@@ -211,3 +237,62 @@ class ConversationRead(BaseModel):
 
 class ConversationsResponse(BaseModel):
     conversations: List[ConversationRead]
+
+class ConversationSummaryRead(BaseModel):
+    """
+    Conversation list item. Transcripts are omitted unless requested, and never include words.
+    """
+    id: Optional[int]
+    state: ConversationState
+    start_time: datetime
+    created_at: datetime
+    conversation_uuid: str
+    device_type: str
+    summary: Optional[str]
+    short_summary: Optional[str]
+    transcriptions: Optional[List[TranscriptionRead]] = None
+    primary_location: Optional[LocationRead] = None
+    capture_segment_file: Optional[CaptureSegmentRead]
+
+    class Config:
+        from_attributes = True
+        json_encoders = {
+            datetime: datetime_string
+        }
+
+class ConversationPageResponse(BaseModel):
+    conversations: List[ConversationSummaryRead]
+    next_cursor: Optional[str] = None   # pass as cursor to get the next page, None if there is none
+
+class ConversationSearchResult(BaseModel):
+    conversation: ConversationSummaryRead
+    snippet: str    # best matching passage, with matched terms in <b></b>
+    rank: float     # lower is better
+
+class ConversationSearchResponse(BaseModel):
+    results: List[ConversationSearchResult]
+
+class ConversationSemanticSearchResult(BaseModel):
+    conversation: ConversationSummaryRead
+    score: float            # cosine similarity, higher is better
+    first_utterance: int    # index of the first utterance of the best matching transcript window, -1 if the summary matched best
+    num_utterances: int
+
+class ConversationSemanticSearchResponse(BaseModel):
+    results: List[ConversationSemanticSearchResult]
+
+class CaptureSessionRead(BaseModel):
+    capture_uuid: str
+    kind: str                   # "streaming" or "chunked"
+    device_type: Optional[str]
+    age_seconds: float
+    idle_seconds: float
+    memory_bytes: Optional[int] # approximate (resident memory of the detection subprocess for chunked sessions)
+
+    class Config:
+        from_attributes = True
+
+class CaptureSessionsResponse(BaseModel):
+    worker_id: str
+    process_memory_bytes: Optional[int]
+    sessions: List[CaptureSessionRead]
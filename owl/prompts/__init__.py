@@ -1,3 +1,6 @@
 from .summarization import summarization_system_message
 from .summarization import short_summarization_system_message
+from .summarization import structured_summarization_system_message
+from .summarization import partial_summarization_system_message
+from .summarization import rolling_summarization_system_message
 from .suggestion import suggest_links_system_message
\ No newline at end of file
@@ -1,14 +1,14 @@
 from __future__ import annotations  # required for AppState annotation in AppState.get()
 from dataclasses import dataclass, field
-from typing import Dict
 from fastapi import FastAPI, HTTPException, Request, Depends, Header
 from typing import Optional
 from ..core.config import Configuration
-from ..services import CaptureService, ConversationService, LLMService, NotificationService, BingSearchService
-from .streaming_capture_handler import StreamingCaptureHandler
+from ..services import CaptureService, ConversationService, LLMService, NotificationService, BingSearchService, SemanticSearchService
+from .capture_session_manager import CaptureSessionManager
 from ..database.database import Database
-from ..services import ConversationDetectionService
-from queue import Queue
+from ..database.utterance_buffer import UtteranceWriteBuffer
+from ..broker import AbstractBroker, InProcessBroker
+from .task import Task
 
 @dataclass
 class AppState:
@@ -24,11 +24,21 @@ class AppState:
     llm_service: LLMService
     notification_service: NotificationService
     bing_search_service: BingSearchService
-    
-    capture_handlers: Dict[str, StreamingCaptureHandler] = field(default_factory=lambda: {})
-    conversation_detection_service_by_id: Dict[str, ConversationDetectionService] = field(default_factory=lambda: {})
+    utterance_buffer: UtteranceWriteBuffer
+    capture_sessions: CaptureSessionManager     # streaming capture handlers and chunked upload conversation detection
+    semantic_search_service: SemanticSearchService | None = None
+    broker: AbstractBroker = field(default_factory=InProcessBroker)   # background tasks and state shared with other workers
 
-    task_queue = Queue()
+    async def forward_to_capture_owner(self, capture_uuid: str, task: Task) -> bool:
+        """
+        Dispatches a task concerning a capture session that is held by another worker to that
+        worker. Returns False if no other live worker holds the session.
+        """
+        owner = await self.broker.get_owner(capture_uuid)
+        if owner is None or owner == self.broker.worker_id:
+            return False
+        await self.broker.put_task(task, affinity_key=capture_uuid)
+        return True
 
     @staticmethod
     def get(from_obj: FastAPI | Request) -> AppState:
@@ -64,9 +74,12 @@ class AppState:
         return app_state
 
     @staticmethod
-    async def authenticate_socket(environ: dict):
+    async def authenticate_socket(environ: dict, auth: dict | None = None):
+        # Browsers cannot set headers on websocket connections and pass the token as auth data
         headers = {k.decode('utf-8').lower(): v.decode('utf-8') for k, v in environ.get('asgi.scope', {}).get('headers', [])}
         authorization = headers.get('authorization')
+        if authorization is None and isinstance(auth, dict) and auth.get('token'):
+            authorization = f"Bearer {auth['token']}"
         app_state: AppState = AppState.get(environ['asgi.scope']['app'])
         await AppState._parse_and_verify_token(authorization, app_state.config.user.client_token)
         return app_state
\ No newline at end of file
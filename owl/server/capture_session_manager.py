@@ -0,0 +1,236 @@
+#
+# capture_session_manager.py
+#
+# Holds the in-memory state of live capture sessions, which is either a streaming capture handler
+# or, for chunked uploads, a conversation detection service (with its subprocess). Sessions are
+# ordered by most recent activity and are finished when they have been idle too long or, least
+# recently active first, when there are too many. Finishing a session processes its remaining
+# conversation, releases its resources, and releases the capture to other workers.
+#
+# Chunked sessions are finished by a task (the same one /capture/process_capture would queue),
+# which removes the session once done.
+#
+
+from __future__ import annotations
+import asyncio
+from collections import OrderedDict
+from dataclasses import dataclass
+import logging
+import time
+from typing import TYPE_CHECKING, Any, Iterable, List
+
+from ..broker import AbstractBroker
+from ..core.config import CaptureSessionConfiguration
+from ..core.utils import get_object_memory_bytes
+from ..files import AudioDurationCounter
+from ..services import ConversationDetectionService
+from ..services.stt.streaming.streaming_transcription_service_factory import StreamingTranscriptionServiceFactory
+from .task import Task
+
+if TYPE_CHECKING:
+    from .streaming_capture_handler import StreamingCaptureHandler
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class CaptureSession:
+    capture_uuid: str
+    device_type: str | None
+    handler: StreamingCaptureHandler | None = None
+    detection_service: ConversationDetectionService | None = None
+    duration_counter: AudioDurationCounter | None = None   # duration of a chunked session's uploads
+    finish_task: Task | None = None     # finishes a chunked session
+    created_at: float = 0               # time.time()
+    last_active_at: float = 0           # time.monotonic()
+    finishing: bool = False
+
+    @property
+    def kind(self) -> str:
+        return "streaming" if self.handler is not None else "chunked"
+
+@dataclass
+class CaptureSessionStats:
+    capture_uuid: str
+    kind: str
+    device_type: str | None
+    age_seconds: float
+    idle_seconds: float
+    memory_bytes: int | None
+
+class CaptureSessionManager:
+    def __init__(self, config: CaptureSessionConfiguration, broker: AbstractBroker):
+        """
+        Parameters
+        ----------
+        config : CaptureSessionConfiguration
+            Timeouts and limits.
+
+        broker : AbstractBroker
+            Broker through which captures are released and finish tasks are queued.
+        """
+        self._config = config
+        self._broker = broker
+        self._sessions: OrderedDict[str, CaptureSession] = OrderedDict()
+        self._sweep_task: asyncio.Task | None = None
+
+    def start(self):
+        self._sweep_task = asyncio.create_task(self._run_sweeps())
+
+    async def stop(self):
+        """
+        Releases the resources of all sessions without finishing them (i.e., on shutdown).
+        """
+        if self._sweep_task:
+            self._sweep_task.cancel()
+            self._sweep_task = None
+        for session in list(self._sessions.values()):
+            await self._remove(session)
+
+    def __len__(self) -> int:
+        return len(self._sessions)
+
+    def get_handler(self, capture_uuid: str) -> StreamingCaptureHandler | None:
+        """
+        Returns the streaming capture handler of a session, if any, and records activity.
+        """
+        session = self._touch(capture_uuid)
+        return session.handler if session else None
+
+    async def add_handler(self, capture_uuid: str, handler: StreamingCaptureHandler):
+        await self._add(CaptureSession(capture_uuid=capture_uuid, device_type=handler.device_name, handler=handler))
+
+    async def finish_handler(self, capture_uuid: str):
+        """
+        Finishes a streaming capture session (processing its current conversation) and removes it.
+        """
+        session = self._sessions.get(capture_uuid)
+        if session is None or session.handler is None or session.finishing:
+            return
+        session.finishing = True
+        await self._finish_handler(session)
+
+    def get_detection_service(self, capture_uuid: str) -> ConversationDetectionService | None:
+        """
+        Returns the conversation detection service of a chunked session, if any, and records
+        activity.
+        """
+        session = self._touch(capture_uuid)
+        return session.detection_service if session else None
+
+    async def add_detection_service(self, capture_uuid: str, device_type: str | None, detection_service: ConversationDetectionService, duration_counter: AudioDurationCounter, finish_task: Task):
+        await self._add(CaptureSession(capture_uuid=capture_uuid, device_type=device_type, detection_service=detection_service, duration_counter=duration_counter, finish_task=finish_task))
+
+    def get_duration_counter(self, capture_uuid: str) -> AudioDurationCounter | None:
+        session = self._sessions.get(capture_uuid)
+        return session.duration_counter if session else None
+
+    async def remove_detection_service(self, capture_uuid: str):
+        session = self._sessions.get(capture_uuid)
+        if session is not None and session.detection_service is not None:
+            await self._remove(session)
+
+    async def get_stats(self, shared_objects: Iterable[Any] = []) -> List[CaptureSessionStats]:
+        """
+        Returns statistics of each session, most recently active first. Memory is measured on a
+        separate thread, as walking the objects of many sessions takes a while.
+
+        Parameters
+        ----------
+        shared_objects : Iterable[Any]
+            Objects referenced by sessions but shared with the rest of the server (e.g., the app
+            state), which are not counted in per-session memory.
+        """
+        shared_objects = [ *shared_objects, *StreamingTranscriptionServiceFactory.get_shared_services(), asyncio.get_running_loop() ]
+        sessions = list(reversed(self._sessions.values()))
+        now = time.time()
+        now_monotonic = time.monotonic()
+        memory_bytes = await asyncio.to_thread(self._get_memory_bytes, sessions, shared_objects)
+        return [
+            CaptureSessionStats(
+                capture_uuid=session.capture_uuid,
+                kind=session.kind,
+                device_type=session.device_type,
+                age_seconds=now - session.created_at,
+                idle_seconds=now_monotonic - session.last_active_at,
+                memory_bytes=session_memory_bytes
+            )
+            for session, session_memory_bytes in zip(sessions, memory_bytes)
+        ]
+
+    @staticmethod
+    def _get_memory_bytes(sessions: List[CaptureSession], shared_objects: List[Any]) -> List[int | None]:
+        memory_bytes = []
+        for session in sessions:
+            if session.detection_service is not None:
+                memory_bytes.append(session.detection_service.get_memory_bytes())
+            else:
+                memory_bytes.append(get_object_memory_bytes(session.handler, exclude=shared_objects))
+        return memory_bytes
+
+    def _touch(self, capture_uuid: str) -> CaptureSession | None:
+        session = self._sessions.get(capture_uuid)
+        if session is not None:
+            session.last_active_at = time.monotonic()
+            self._sessions.move_to_end(capture_uuid)
+        return session
+
+    async def _add(self, session: CaptureSession):
+        session.created_at = time.time()
+        session.last_active_at = time.monotonic()
+        previous = self._sessions.pop(session.capture_uuid, None)
+        if previous is not None:
+            await self._close(previous)
+        self._sessions[session.capture_uuid] = session
+
+        # Evict the least recently active sessions beyond the limit
+        num_excess = len(self._sessions) - self._config.max_sessions
+        for evicted in [ candidate for candidate in self._sessions.values() if not candidate.finishing ][:max(0, num_excess)]:
+            logger.warning(f"Too many capture sessions, finishing least recently active: {evicted.capture_uuid}")
+            await self._finish(evicted)
+
+    async def _remove(self, session: CaptureSession):
+        if self._sessions.get(session.capture_uuid) is not session:
+            return  # already removed or replaced
+        del self._sessions[session.capture_uuid]
+        await self._close(session)
+        await self._broker.release(session.capture_uuid)
+        logger.info(f"Removed {session.kind} capture session: {session.capture_uuid}")
+
+    async def _close(self, session: CaptureSession):
+        try:
+            if session.handler is not None:
+                await session.handler.close()
+            if session.detection_service is not None:
+                await session.detection_service.close()
+        except Exception as e:
+            logger.error(f"Error releasing capture session {session.capture_uuid}: {e}")
+
+    async def _finish(self, session: CaptureSession):
+        session.finishing = True
+        if session.handler is not None:
+            asyncio.create_task(self._finish_handler(session))
+        else:
+            # The task removes the session when it has processed the remaining audio
+            await self._broker.put_task(session.finish_task, affinity_key=session.capture_uuid)
+
+    async def _finish_handler(self, session: CaptureSession):
+        try:
+            await session.handler.finish_capture_session()
+        except Exception as e:
+            logger.error(f"Error finishing capture session {session.capture_uuid}: {e}")
+        finally:
+            await self._remove(session)
+
+    async def _run_sweeps(self):
+        while True:
+            await asyncio.sleep(self._config.sweep_interval_seconds)
+            try:
+                now = time.monotonic()
+                for session in list(self._sessions.values()):
+                    timeout_seconds = self._config.idle_timeout_seconds if session.handler is not None else self._config.chunked_idle_timeout_seconds
+                    if not session.finishing and now - session.last_active_at >= timeout_seconds:
+                        logger.info(f"Finishing idle {session.kind} capture session: {session.capture_uuid}")
+                        await self._finish(session)
+            except Exception as e:
+                logger.error(f"Error sweeping capture sessions: {e}")
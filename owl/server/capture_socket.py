@@ -1,63 +1,183 @@
 #
 # capture_socket.py
 #
-# Socket handlers for streaming audio capture.
+# Socket handlers for streaming audio capture, and emission of server messages to clients.
+#
+# Clients receive messages according to the rooms they are in. On connecting, they are placed in
+# the "all" room, which receives every message. They can instead subscribe to particular captures,
+# conversations, and devices (see on_subscribe()). Clients that opt into deltas receive
+# conversation changes only as conversation_delta events, and others only as entire conversations.
+# Each room therefore has a deltas variant (e.g., "all:deltas"), which delta clients are in instead.
+# Messages are queued and emitted in batches by a background task, and rapid successive full
+# updates of the same conversation are coalesced into the latest one.
+#
+# Only the websocket transport is accepted, so that each connection stays on the worker process that
+# accepted it (HTTP long-polling requests may reach any worker).
 #
 # Using namespace objects to implement socketio event handlers: 
 # https://python-socketio.readthedocs.io/en/latest/server.html#class-based-namespaces
 #
 import asyncio
+from dataclasses import dataclass
 import os
 import logging
+from typing import Any, List, Set
 from fastapi import FastAPI
 import socketio
 
-from .streaming_capture_handler import StreamingCaptureHandler
+from .streaming_capture_handler import StreamingCaptureHandler, CaptureSessionTask
 
 logger = logging.getLogger(__name__)
 
+# Events carrying the entire state of a conversation, of which only the latest needs to be sent
+_coalesced_events = set([ "update_conversation" ])
+
+@dataclass
+class _QueuedMessage:
+    event: str
+    message: Any
+    rooms: List[str]
+    coalesce_key: str | None
+
 class CaptureSocketApp(socketio.AsyncNamespace):
+    ALL_ROOM = "all"
+    DELTAS_ROOM_SUFFIX = ":deltas"
+
     def __init__(self, app_state):
         super().__init__(namespace="*")
         self._app_state = app_state
-        self._sio = socketio.AsyncServer(async_mode='asgi', cors_allowed_origins='*')
+        self._sio = socketio.AsyncServer(async_mode='asgi', cors_allowed_origins='*', client_manager=app_state.broker.get_socketio_client_manager(), transports=[ "websocket" ])
         self._app = socketio.ASGIApp(self._sio)
         self._sio.register_namespace(self)
         self._processing_task = None
+        self._emit_interval_seconds = app_state.config.notification.emit_interval_seconds
+        self._queued_messages: List[_QueuedMessage] = []
+        self._emit_task: asyncio.Task | None = None
+        self._delta_sids: Set[str] = set()
 
     def mount_to(self, app: FastAPI, at_path: str):
         app.mount(path=at_path, app=self._app)
 
-    async def on_connect(self, path, sid, environ):
+    async def on_connect(self, path, sid, environ, auth=None):
         logger.info(f'Connected: {sid}')
         try:
-            await self._app_state.authenticate_socket(environ)
+            await self._app_state.authenticate_socket(environ, auth)
         except ValueError as e:
             logger.error(f"Authentication failed for {sid}: {e}")
             await self._sio.disconnect(sid)
             return False 
+        await self._sio.enter_room(sid, CaptureSocketApp.ALL_ROOM, namespace=path)
 
     async def on_disconnect(self, path, sid, *args):
         logger.info(f'Disconnected: {sid}')
+        self._delta_sids.discard(sid)
 
     async def on_audio_data(self, path, sid, binary_data, device_name, capture_uuid, file_extension="aac", *args):
-        if capture_uuid not in self._app_state.capture_handlers:
-            self._app_state.capture_handlers[capture_uuid] = StreamingCaptureHandler(
-                self._app_state, device_name, capture_uuid, file_extension
-            )
-
-        capture_handler = self._app_state.capture_handlers[capture_uuid]
+        capture_handler = self._app_state.capture_sessions.get_handler(capture_uuid)
+        if capture_handler is None:
+            # Audio is handled wherever it arrives, so this worker takes over the session
+            await self._app_state.broker.claim(capture_uuid, take_over=True)
+            capture_handler = StreamingCaptureHandler(self._app_state, device_name, capture_uuid, file_extension)
+            await self._app_state.capture_sessions.add_handler(capture_uuid, capture_handler)
 
         await capture_handler.handle_audio_data(binary_data)
 
     async def on_finish_audio(self, path, sid, capture_uuid, *args):
         logger.info(f"Client signalled end of audio stream for {capture_uuid}")
-        if capture_uuid not in self._app_state.capture_handlers:
+        if self._app_state.capture_sessions.get_handler(capture_uuid) is None:
+            if await self._app_state.forward_to_capture_owner(capture_uuid, CaptureSessionTask(capture_uuid=capture_uuid, action="finish")):
+                return
             logger.error(f"Capture session not found: {capture_uuid}")
             return
-        capture_handler = self._app_state.capture_handlers[capture_uuid]
-        capture_handler.finish_capture_session()
+        await self._app_state.capture_sessions.finish_handler(capture_uuid)
     
-    async def emit_message(self, event, message):
-        print(f"emit_message message: {event} {message}")
-        await self._sio.emit(event, message)
+    async def on_subscribe(self, path, sid, subscription, *args):
+        """
+        Subscribes a client to messages about particular captures, conversations, and devices:
+
+            { "captures": [ capture_uuid, ... ], "conversations": [ conversation_uuid, ... ],
+              "devices": [ device_type, ... ], "all": false, "deltas": false }
+
+        Unless "all" is true, the client stops receiving all other messages. If "deltas" is true,
+        conversation changes are sent to the client only as conversation_delta events (see
+        ConversationDeltaTracker) rather than as entire conversations (new_conversation,
+        update_conversation), and if false, the reverse (the default).
+        """
+        if "deltas" in subscription:
+            await self._set_deltas(path, sid, bool(subscription["deltas"]))
+        for room in self._get_subscription_rooms(subscription):
+            await self._sio.enter_room(sid, self._get_client_room(sid, room), namespace=path)
+        if subscription.get("all", False):
+            await self._sio.enter_room(sid, self._get_client_room(sid, CaptureSocketApp.ALL_ROOM), namespace=path)
+        else:
+            await self._sio.leave_room(sid, self._get_client_room(sid, CaptureSocketApp.ALL_ROOM), namespace=path)
+
+    async def on_unsubscribe(self, path, sid, subscription, *args):
+        for room in self._get_subscription_rooms(subscription):
+            await self._sio.leave_room(sid, self._get_client_room(sid, room), namespace=path)
+        if subscription.get("all", False):
+            await self._sio.leave_room(sid, self._get_client_room(sid, CaptureSocketApp.ALL_ROOM), namespace=path)
+
+    async def _set_deltas(self, path, sid, deltas: bool):
+        # Moves the client to the other variant of each of its rooms
+        if deltas == (sid in self._delta_sids):
+            return
+        suffix = CaptureSocketApp.DELTAS_ROOM_SUFFIX
+        for room in self._sio.rooms(sid, namespace=path):
+            if room == sid:
+                continue
+            await self._sio.leave_room(sid, room, namespace=path)
+            await self._sio.enter_room(sid, room + suffix if deltas else room.removesuffix(suffix), namespace=path)
+        if deltas:
+            self._delta_sids.add(sid)
+        else:
+            self._delta_sids.discard(sid)
+
+    def _get_client_room(self, sid, room: str) -> str:
+        return room + CaptureSocketApp.DELTAS_ROOM_SUFFIX if sid in self._delta_sids else room
+
+    async def emit_message(self, event, message, capture_uuid: str | None = None, conversation_uuid: str | None = None, device_type: str | None = None, deltas: bool | None = None):
+        """
+        Queues a message for clients in the "all" room and those subscribed to the given capture,
+        conversation, or device. Does not wait for it to be sent. Must be called on the server's
+        event loop.
+
+        If deltas is True, only clients that opted into conversation deltas receive the message, and
+        if False, only those that did not. Otherwise, all do.
+        """
+        rooms = [ CaptureSocketApp.ALL_ROOM ] + self._get_rooms(captures=[ capture_uuid ], conversations=[ conversation_uuid ], devices=[ device_type ])
+        delta_rooms = [ room + CaptureSocketApp.DELTAS_ROOM_SUFFIX for room in rooms ]
+        if deltas is None:
+            rooms = rooms + delta_rooms
+        elif deltas:
+            rooms = delta_rooms
+        coalesce_key = f"{event}:{conversation_uuid}" if event in _coalesced_events and conversation_uuid else None
+        self._queued_messages.append(_QueuedMessage(event=event, message=message, rooms=rooms, coalesce_key=coalesce_key))
+        if self._emit_task is None or self._emit_task.done():
+            self._emit_task = asyncio.create_task(self._emit_queued_messages())
+
+    async def _emit_queued_messages(self):
+        while self._queued_messages:
+            # Let messages accumulate, then send the batch with only the last message of each
+            # coalesced key (in its position)
+            await asyncio.sleep(self._emit_interval_seconds)
+            batch = self._queued_messages
+            self._queued_messages = []
+            last_index_by_key = { queued.coalesce_key: i for i, queued in enumerate(batch) if queued.coalesce_key }
+            for i, queued in enumerate(batch):
+                if queued.coalesce_key and last_index_by_key[queued.coalesce_key] != i:
+                    continue
+                try:
+                    await self._sio.emit(queued.event, queued.message, room=queued.rooms)
+                except Exception as e:
+                    logger.error(f"Failed to emit {queued.event}: {e}")
+
+    @staticmethod
+    def _get_rooms(captures: List[str | None] = [], conversations: List[str | None] = [], devices: List[str | None] = []) -> List[str]:
+        return [ f"capture:{capture_uuid}" for capture_uuid in captures if capture_uuid ] + \
+               [ f"conversation:{conversation_uuid}" for conversation_uuid in conversations if conversation_uuid ] + \
+               [ f"device:{device_type}" for device_type in devices if device_type ]
+
+    @staticmethod
+    def _get_subscription_rooms(subscription: dict) -> List[str]:
+        return CaptureSocketApp._get_rooms(captures=subscription.get("captures", []), conversations=subscription.get("conversations", []), devices=subscription.get("devices", []))
@@ -9,6 +9,11 @@
 # We want to attach state to our app that can be explicitly passed in to the app factory function.
 # Therefore, we attach it to app.state._app_state and use AppState.get(from_obj=app) to retrieve it.
 #
+# The server may run as several worker processes sharing state through a broker (see
+# owl/broker/abstract_broker.py). Singleton services are run only by the primary worker.
+#
+
+import os
 
 from fastapi import FastAPI
 
@@ -16,10 +21,14 @@ from ..core.config import Configuration
 from .app_state import AppState
 from .routes.capture import router as capture_router
 from .routes.conversations import router as conversations_router
+from .routes.admin import router as admin_router
 from .capture_socket import CaptureSocketApp
+from .capture_session_manager import CaptureSessionManager
 from .udp_capture_socket import UDPCaptureSocketApp
-from ..services import LLMService, CaptureService, ConversationService, NotificationService, BingSearchService
+from ..services import LLMService, CaptureService, ConversationService, NotificationService, BingSearchService, SemanticSearchService
 from ..database.database import Database
+from ..database.utterance_buffer import UtteranceWriteBuffer
+from ..broker import BrokerFactory
 from ..services.stt.asynchronous.async_transcription_service_factory import AsyncTranscriptionServiceFactory
 from .task import Task
 import logging
@@ -62,28 +71,37 @@ def setup_logging():
 
 async def process_queue(app_state: AppState):
     logger.info("Starting server task processing queue...")
+    immediate_tasks = set()
     while True:
-        if not app_state.task_queue.empty():
-            task: Task = app_state.task_queue.get()
-            try:
-                await task.run(app_state=app_state)
-            except Exception as e:
-                logging.error(f"Error processing task: {e}")
-            app_state.task_queue.task_done()
+        task: Task = await app_state.broker.get_task()
+        if getattr(task, "run_immediately", False):
+            immediate_task = asyncio.create_task(run_task(task, app_state))
+            immediate_tasks.add(immediate_task)
+            immediate_task.add_done_callback(immediate_tasks.discard)
         else:
-            await asyncio.sleep(1)
+            await run_task(task, app_state)
+
+async def run_task(task: Task, app_state: AppState):
+    try:
+        await task.run(app_state=app_state)
+    except Exception as e:
+        logging.error(f"Error processing task: {e}")
 
-def create_server_app(config: Configuration) -> FastAPI:
+def create_server_app(config: Configuration, init_db: bool = True) -> FastAPI:
     setup_logging()
     # Database
     database = Database(config.database)
+    utterance_buffer = UtteranceWriteBuffer(database=database, max_batch_size=config.database.utterance_batch_size, max_delay_seconds=config.database.utterance_batch_seconds, pack_words=config.database.pack_words)
     # Services
     llm_service = LLMService(config=config.llm)
     transcription_service = AsyncTranscriptionServiceFactory.get_service(config)
-    notification_service = NotificationService(config.notification)
+    broker = BrokerFactory.get_broker(config.broker)
+    notification_service = NotificationService(config.notification, broker=broker)
     capture_service = CaptureService(config=config, database=database)
     bing_search_service = BingSearchService(config=config.bing) if config.bing else None
-    conversation_service = ConversationService(config, database, transcription_service, notification_service, bing_search_service)
+    semantic_search_service = SemanticSearchService(config=config.embedding) if config.embedding else None
+    conversation_service = ConversationService(config, database, transcription_service, notification_service, bing_search_service, semantic_search_service)
+    capture_sessions = CaptureSessionManager(config=config.capture_sessions, broker=broker)
 
     # Create server app
     app = FastAPI()
@@ -94,38 +112,57 @@ def create_server_app(config: Configuration) -> FastAPI:
         conversation_service=conversation_service,
         llm_service=llm_service,
         notification_service=notification_service,
-        bing_search_service=bing_search_service
+        bing_search_service=bing_search_service,
+        utterance_buffer=utterance_buffer,
+        capture_sessions=capture_sessions,
+        semantic_search_service=semantic_search_service,
+        broker=broker
     )
     socket_app = CaptureSocketApp(app_state = AppState.get(from_obj=app))
     socket_app.mount_to(app=app, at_path="/socket.io")
     notification_service.socket_app = socket_app
     app.include_router(capture_router)
     app.include_router(conversations_router)
+    app.include_router(admin_router)
 
     @app.on_event("startup")
     async def startup_event():
-        # Initialize the database
-        app.state._app_state.database.init_db()
+        # Initialize the database (worker processes leave this to the parent, see cli.serve)
+        if init_db:
+            app.state._app_state.database.init_db()
+        await broker.start()
+        capture_sessions.start()
         asyncio.create_task(process_queue(app.state._app_state))
-        if config.streaming_transcription.provider == "whisper":
-            start_streaming_whisper_server(config=config.streaming_whisper)
-
-        if config.async_transcription.provider == "whisper":
-            start_async_transcription_server(config=config.async_whisper)
-
-        # UPD capture for LTE-M and other low bandwidth devices
-        if config.udp.enabled:
-            loop = asyncio.get_running_loop()
-            await loop.create_datagram_endpoint(
-                lambda: UDPCaptureSocketApp(app.state._app_state), local_addr=(config.udp.host, config.udp.port)
-            )
-        # fail any conversations that were in progress if the server was not shut down gracefully. could also retry them
-        await conversation_service.fail_processing_and_capturing_conversations()
+        if broker.is_primary():
+            # Conversation deltas are numbered here unless another worker already does so
+            await broker.claim(NotificationService.DELTA_OWNER_KEY)
+
+            if config.streaming_transcription.provider == "whisper":
+                start_streaming_whisper_server(config=config.streaming_whisper)
+
+            if config.async_transcription.provider == "whisper":
+                start_async_transcription_server(config=config.async_whisper, vad_config=config.vad)
+
+            # UPD capture for LTE-M and other low bandwidth devices
+            if config.udp.enabled:
+                loop = asyncio.get_running_loop()
+                await loop.create_datagram_endpoint(
+                    lambda: UDPCaptureSocketApp(app.state._app_state), local_addr=(config.udp.host, config.udp.port)
+                )
+        # fail any conversations that were in progress if the server was not shut down gracefully. could also retry them.
+        # Other workers' conversations are left alone.
+        if await broker.is_only_worker():
+            await conversation_service.fail_processing_and_capturing_conversations()
 
     @app.on_event("shutdown")
     async def shutdown_event():
+        if not await app.state._app_state.utterance_buffer.flush(write_individually_on_failure=True):
+            logger.error("Some realtime utterances could not be written before shutting down and were lost")
+        await capture_sessions.stop()
         conversation_service = app.state._app_state.conversation_service
-        await conversation_service.fail_processing_and_capturing_conversations()
+        if await broker.is_only_worker():
+            await conversation_service.fail_processing_and_capturing_conversations()
+        await broker.stop()
 
     # Base routing
     @app.get("/")
@@ -133,3 +170,11 @@ def create_server_app(config: Configuration) -> FastAPI:
         return "Owl is running!"
 
     return app
+
+def create_server_app_from_environment() -> FastAPI:
+    """
+    App factory for uvicorn worker processes, which load the configuration file given by the
+    OWL_CONFIG_FILEPATH environment variable. The database must already have been migrated, as
+    workers starting at the same time would otherwise race to do so.
+    """
+    return create_server_app(config=Configuration.load_config_yaml(os.environ["OWL_CONFIG_FILEPATH"]), init_db=False)
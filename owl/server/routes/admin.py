@@ -0,0 +1,26 @@
+#
+# admin.py
+#
+# Server administration and diagnostics endpoints.
+#
+
+from fastapi import APIRouter, Depends
+
+from .. import AppState
+from ...core.utils import get_process_memory_bytes
+from ...models.schemas import CaptureSessionRead, CaptureSessionsResponse
+
+
+router = APIRouter()
+
+@router.get("/admin/capture_sessions", response_model=CaptureSessionsResponse)
+async def list_capture_sessions(app_state: AppState = Depends(AppState.authenticate_request)):
+    """
+    Lists the live capture sessions held by this worker, most recently active first.
+    """
+    stats = await app_state.capture_sessions.get_stats(shared_objects=[ app_state ])
+    return CaptureSessionsResponse(
+        worker_id=app_state.broker.worker_id,
+        process_memory_bytes=get_process_memory_bytes(),
+        sessions=[ CaptureSessionRead.from_orm(session) for session in stats ]
+    )
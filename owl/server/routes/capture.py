@@ -25,9 +25,10 @@ from datetime import datetime, timezone
 from .. import AppState
 from ..task import Task
 from ...database.crud import create_location, update_latest_conversation_location, get_capture_file_ref, get_latest_capturing_conversation_by_capture_uuid, create_image
-from ...files import append_to_wav_file
-from ...models.schemas import Location, Capture, ConversationRead, Image
-from ..streaming_capture_handler import StreamingCaptureHandler
+from ...files import append_to_wav_file, AudioDurationCounter
+from ...models.schemas import Location, Capture, Image
+from ...models.conversation_json_cache import conversation_json_cache
+from ..streaming_capture_handler import StreamingCaptureHandler, CaptureSessionTask
 from ...services import ConversationDetectionService
 from ...files.capture_directory import CaptureDirectory
 
@@ -78,12 +79,14 @@ async def upload_image(
 async def streaming_post(request: Request, capture_uuid: str, device_type: str, app_state: AppState = Depends(AppState.authenticate_request)):
     logger.info('Client connected')
     try:
-        if capture_uuid not in app_state.capture_handlers:
-            app_state.capture_handlers[capture_uuid] = StreamingCaptureHandler(app_state, device_type, capture_uuid, file_extension = "wav")
-
-        capture_handler = app_state.capture_handlers[capture_uuid]
+        capture_handler = app_state.capture_sessions.get_handler(capture_uuid)
+        if capture_handler is None:
+            await app_state.broker.claim(capture_uuid, take_over=True)
+            capture_handler = StreamingCaptureHandler(app_state, device_type, capture_uuid, file_extension = "wav")
+            await app_state.capture_sessions.add_handler(capture_uuid, capture_handler)
 
         async for chunk in request.stream():
+            app_state.capture_sessions.get_handler(capture_uuid)    # keeps the session active
             await capture_handler.handle_audio_data(chunk)
 
     except ClientDisconnect:
@@ -95,11 +98,12 @@ async def streaming_post(request: Request, capture_uuid: str, device_type: str,
 @router.post("/capture/streaming_post/{capture_uuid}/complete")
 async def complete_audio(request: Request, background_tasks: BackgroundTasks, capture_uuid: str, app_state: AppState = Depends(AppState.authenticate_request)):
     logger.info(f"Completing audio capture for {capture_uuid}")
-    if capture_uuid not in app_state.capture_handlers:
+    if app_state.capture_sessions.get_handler(capture_uuid) is None:
+        if await app_state.forward_to_capture_owner(capture_uuid, CaptureSessionTask(capture_uuid=capture_uuid, action="finish")):
+            return JSONResponse(content={"message": f"Audio processed"})
         logger.error(f"Capture session not found: {capture_uuid}")
         raise HTTPException(status_code=500, detail="Capture session not found")
-    capture_handler = app_state.capture_handlers[capture_uuid]
-    capture_handler.finish_capture_session()
+    await app_state.capture_sessions.finish_handler(capture_uuid)
 
     return JSONResponse(content={"message": f"Audio processed"})
 
@@ -113,29 +117,71 @@ supported_upload_file_extensions = set([ "pcm", "wav", "aac" ])
 class ProcessAudioChunkTask(Task):
     """
     Processes the newest chunk of audio in a capture. Detects conversations incrementally and
-    processes any that are found.
+    processes any that are found. Without audio data, finishes the capture.
+
+    The conversation detection state of a capture is held by the worker that owns it, so these
+    tasks are put with the capture UUID as their affinity key.
     """
 
     def __init__(
         self,
-        capture_file: Capture,
-        detection_service: ConversationDetectionService,
+        capture_uuid: str,
         format: str,
         audio_data: bytes | None = None
     ):
-        self._capture_file = capture_file
-        self._detection_service = detection_service
+        self._capture_uuid = capture_uuid
         self._audio_data = audio_data
         self._format = format
         assert format == "wav" or format == "aac"
 
     async def run(self, app_state: AppState):
+        capture_file: Capture = await app_state.capture_service.get_capture_file(capture_uuid=self._capture_uuid)
+        capture_finished = self._audio_data is None
+
+        # Ensure a conversation detection service has been created
+        detection_service: ConversationDetectionService = app_state.capture_sessions.get_detection_service(self._capture_uuid)
+        if detection_service is None:
+            if capture_finished:
+                # TODO: If the server dies in the middle of an upload or before /process_capture is
+                # called, this will not work well because the in-memory conversation detection
+                # state will be gone. However, users can protentially re-process the conversation
+                # manually.
+                logger.error(f"Internal error: No conversation detection service exists for capture_uuid={self._capture_uuid}")
+                return
+            detection_service = ConversationDetectionService(
+                config=app_state.config,
+                capture_filepath=capture_file.filepath,
+                capture_timestamp=capture_file.start_time
+            )
+            # If the session is finished for being idle (or evicted), the remaining audio is
+            # processed as if /capture/process_capture had been called
+            finish_task = ProcessAudioChunkTask(capture_uuid=self._capture_uuid, format=self._format)
+            await app_state.capture_sessions.add_detection_service(
+                self._capture_uuid,
+                device_type=capture_file.device_type,
+                detection_service=detection_service,
+                duration_counter=AudioDurationCounter(format=self._format),
+                finish_task=finish_task
+            )
+
+        # Update capture duration. The session's counter carries samples or AAC frames split across
+        # chunks over to the next one. Chunks of a capture are processed in order by its owner.
+        if not capture_finished:
+            chunk_duration = app_state.capture_sessions.get_duration_counter(self._capture_uuid).add(self._audio_data)
+            await app_state.capture_service.add_capture_duration(capture_uuid=self._capture_uuid, seconds=chunk_duration)
+
+        try:
+            await self._detect_and_process_conversations(app_state=app_state, capture_file=capture_file, detection_service=detection_service)
+        finally:
+            if capture_finished:
+                # Remove from in-memory app state (terminating the detection subprocess)
+                await app_state.capture_sessions.remove_detection_service(self._capture_uuid)
+
+    async def _detect_and_process_conversations(self, app_state: AppState, capture_file: Capture, detection_service: ConversationDetectionService):
         # Data we need
-        capture_file = self._capture_file
         audio_data = self._audio_data
         capture_finished = audio_data is None
         format = self._format
-        detection_service = self._detection_service
 
         # Run conversation detection stage (finds conversations thus far)
         detection_results = await detection_service.detect_conversations(audio_data=audio_data, format=format, capture_finished=capture_finished)
@@ -143,7 +189,7 @@ class ProcessAudioChunkTask(Task):
         # As soon as we detect a new, in-progress conversation, we need to create a conversation
         # object in the database and create a segment file object for it.
         active_convo = detection_results.in_progress
-        if active_convo is not None and app_state.conversation_service.get_conversation(conversation_uuid=active_convo.uuid) is None:
+        if active_convo is not None and await app_state.conversation_service.get_conversation(conversation_uuid=active_convo.uuid) is None:
             # Create the conversation (and transcript), and references to the capture and segment
             # files in db. This will also send a notification to app of a new conversation. Note
             # that the segment file is not yet created on disk (will happen once the conversation)
@@ -168,7 +214,7 @@ class ProcessAudioChunkTask(Task):
         completed_conversations = []
         conversation_filepaths = []
         for convo in detection_results.completed:
-            if app_state.conversation_service.get_conversation(conversation_uuid=convo.uuid) is None:
+            if await app_state.conversation_service.get_conversation(conversation_uuid=convo.uuid) is None:
                 # First time we've encountered this conversation. Need to create a new conversation
                 # and enter it into the database.
                 await app_state.conversation_service.create_conversation(
@@ -179,12 +225,20 @@ class ProcessAudioChunkTask(Task):
 
             # We now know the conversation segment exists, add it to the list of conversations to
             # process.
-            completed_conversations.append(app_state.conversation_service.get_conversation(conversation_uuid=convo.uuid))
+            completed_conversations.append(await app_state.conversation_service.get_conversation(conversation_uuid=convo.uuid))
             conversation_filepaths.append(completed_conversations[-1].capture_segment_file.filepath)
 
         # Perform the extraction!
         await detection_service.extract_conversations(conversations=detection_results.completed, conversation_filepaths=conversation_filepaths)
 
+        # Segment durations are known from the endpoints, so record them now rather than having to
+        # measure the segment files later
+        for convo in detection_results.completed:
+            await app_state.capture_service.update_segment_duration(
+                conversation_uuid=convo.uuid,
+                duration=(convo.endpoints.end - convo.endpoints.start).total_seconds()
+            )
+
         # Process each completed conversation
         try:
             for conversation in completed_conversations:
@@ -224,25 +278,15 @@ async def upload_chunk(
             write_wav_header = True
 
         # Look up capture session or create a new one
-        capture_file: Capture = app_state.capture_service.get_capture_file(capture_uuid=capture_uuid)
+        capture_file: Capture = await app_state.capture_service.get_capture_file(capture_uuid=capture_uuid)
         if capture_file is None:
-            capture_file = app_state.capture_service.create_capture_file(
+            capture_file = await app_state.capture_service.create_capture_file(
                 capture_uuid=capture_uuid,
                 format=file_extension,
                 start_time=start_time,
                 device_type=device_type
             )
 
-        # Ensure a conversation detection service has been created
-        detection_service: ConversationDetectionService = app_state.conversation_detection_service_by_id.get(capture_uuid)
-        if detection_service is None:
-            detection_service = ConversationDetectionService(
-                config=app_state.config,
-                capture_filepath=capture_file.filepath,
-                capture_timestamp=capture_file.start_time
-            )
-            app_state.conversation_detection_service_by_id[capture_uuid] = detection_service
-
         # Get uploaded data
         content = await file.read()
 
@@ -255,14 +299,13 @@ async def upload_chunk(
                 bytes_written = fp.write(content)
         logging.info(f"{capture_file.filepath}: {bytes_written} bytes appended")
 
-        # Conversation processing task
+        # Conversation processing task (which also updates the capture duration)
         task = ProcessAudioChunkTask(
-            capture_file=capture_file,
-            detection_service=detection_service,
+            capture_uuid=capture_uuid,
             audio_data=content,
             format=file_extension
         )
-        app_state.task_queue.put(task)
+        await app_state.broker.put_task(task, affinity_key=capture_uuid)
 
         # Success
         return JSONResponse(content={"message": f"Audio processed"})
@@ -277,32 +320,23 @@ async def upload_chunk(
 async def process_capture(request: Request, capture_uuid: Annotated[str, Form()], app_state: AppState = Depends(AppState.authenticate_request)):
     try:
         # Get capture file
-        capture_file: Capture = app_state.capture_service.get_capture_file(capture_uuid=capture_uuid)
+        capture_file: Capture = await app_state.capture_service.get_capture_file(capture_uuid=capture_uuid)
         if capture_file is None:
             logger.error(f"Capture file for capture_uuid={capture_uuid} not found! Cannot process capture.")
             raise HTTPException(status_code=500, detail=f"Capture file for capture_uuid={capture_uuid} not found! Cannot process capture.")
 
-        # TODO: If the server dies in the middle of an upload or before /process_capture is called,
-        # this will not work well because the in-memory conversation detection state will be gone.
-        # However, users can protentially re-process the conversation manually.
-
-        # Conversation detection service
-        detection_service: ConversationDetectionService = app_state.conversation_detection_service_by_id.get(capture_uuid)
-        if detection_service is None:
+        # The worker that owns the capture holds its conversation detection state. If there is
+        # none, it was lost (e.g., the server restarted during the upload).
+        if await app_state.broker.get_owner(capture_uuid) is None:
             logger.error(f"Internal error: No conversation detection service exists for capture_uuid={capture_uuid}")
-            raise HTTPException(status_Code=500, detail="Internal error: Lost conversation service")
+            raise HTTPException(status_code=500, detail="Internal error: Lost conversation service")
 
-        # Enqueue for processing
+        # Enqueue for processing on the owner, which then discards the detection state
         task = ProcessAudioChunkTask(
-            capture_file=capture_file,
-            detection_service=detection_service,
+            capture_uuid=capture_uuid,
             format=os.path.splitext(capture_file.filepath)[1].lstrip(".")
         )
-        app_state.task_queue.put(task)
-
-        # Remove from in-memory app state
-        if capture_uuid in app_state.conversation_detection_service_by_id:
-            del app_state.conversation_detection_service_by_id[capture_uuid]
+        await app_state.broker.put_task(task, affinity_key=capture_uuid)
 
         return JSONResponse(content={"message": "Conversation processed"})
     except Exception as e:
@@ -312,13 +346,21 @@ async def process_capture(request: Request, capture_uuid: Annotated[str, Form()]
 
 
 @router.post("/capture/location")
-async def receive_location(location: Location, db: Session = Depends(AppState.get_db), app_state: AppState = Depends(AppState.authenticate_request)):
+async def receive_location(location: Location, app_state: AppState = Depends(AppState.authenticate_request)):
     try:
         logger.info(f"Received location: {location}")
-        new_location = create_location(db, location)
-        if location.capture_uuid:
-            conversation = update_latest_conversation_location(db, location.capture_uuid, location)
-            await app_state.notification_service.emit_message("update_conversation",  ConversationRead.from_orm(conversation).model_dump_json())
+
+        def save_location(db: Session):
+            new_location = create_location(db, location)
+            conversation_json = None
+            if location.capture_uuid:
+                conversation = update_latest_conversation_location(db, location.capture_uuid, location)
+                conversation_json = conversation_json_cache.get_json(conversation)
+            return new_location, conversation_json
+
+        new_location, conversation_json = await app_state.database.run(save_location)
+        if conversation_json is not None:
+            await app_state.notification_service.send_conversation_notification("Conversation Location", "Conversation location updated.", "update_conversation", conversation_json=conversation_json)
 
         return {"message": "Location received", "location_id": new_location.id}
     except Exception as e:
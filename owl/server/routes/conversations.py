@@ -1,36 +1,131 @@
+import base64
+from datetime import datetime
 import logging
 
 from fastapi import APIRouter, Depends, Query, HTTPException, BackgroundTasks
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, Response
 from sqlmodel import Session
 
 from fastapi.encoders import jsonable_encoder
 from ...server.app_state import AppState
-from ...models.schemas import ConversationsResponse, ConversationRead, CaptureSegmentRead
-from ...database.crud import get_all_conversations, get_conversation, delete_conversation
+from ...server.streaming_capture_handler import CaptureSessionTask, ProcessConversationTask
+from ...models.schemas import Conversation, ConversationsResponse, ConversationRead, CaptureSegmentRead, ConversationSummaryRead, ConversationPageResponse, ConversationSearchResult, ConversationSearchResponse, ConversationSemanticSearchResult, ConversationSemanticSearchResponse, TranscriptionRead, TranscriptionDetailRead, UtteranceRead, UtteranceDetailRead
+from ...models.packed_words import get_word_reads
+from ...models.conversation_json_cache import conversation_json_cache
+from ...database.crud import get_all_conversations, get_conversation, delete_conversation, get_conversations_page, get_conversations_by_ids, get_conversation_transcriptions
+from ...database.search import is_search_supported, search_conversations
+from ...services import LLMPriority
 from ...devices import DeviceType
-from typing import List
-import asyncio
+from typing import List, Tuple
 
 logger = logging.getLogger(__name__)
 
 router = APIRouter()
 
-def process_conversation_background_task(conversation_uuid: str, app_state: AppState):
-    asyncio.run(app_state.conversation_service.process_conversation_from_audio(conversation_uuid=conversation_uuid))
+def _encode_cursor(created_at: datetime, conversation_id: int) -> str:
+    return base64.urlsafe_b64encode(f"{created_at.isoformat()}|{conversation_id}".encode("utf-8")).decode("ascii")
+
+def _decode_cursor(cursor: str) -> Tuple[datetime, int]:
+    try:
+        created_at, conversation_id = base64.urlsafe_b64decode(cursor.encode("ascii")).decode("utf-8").split("|")
+        return datetime.fromisoformat(created_at), int(conversation_id)
+    except Exception:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+# Must be declared before /conversations/{conversation_id}
+@router.get("/conversations/page", response_model=ConversationPageResponse)
+def read_conversations_page(
+    cursor: str | None = None,
+    limit: int = Query(default=50, ge=1, le=500),
+    include_utterances: bool = False,
+    db: Session = Depends(AppState.get_db),
+    app_state: AppState = Depends(AppState.authenticate_request)
+):
+    """
+    Lightweight, cursor-paginated conversation list, newest first. Full transcripts are available
+    from /conversations/{conversation_id}/transcript.
+    """
+    before = _decode_cursor(cursor) if cursor else None
+    conversations = get_conversations_page(db, limit=limit + 1, before=before, include_utterances=include_utterances)
+    has_more = len(conversations) > limit
+    conversations = conversations[:limit]
+
+    summaries = []
+    for conversation in conversations:
+        summary = ConversationSummaryRead.from_orm(conversation)
+        if not include_utterances:
+            summary.transcriptions = None
+        summaries.append(summary)
+    next_cursor = _encode_cursor(conversations[-1].created_at, conversations[-1].id) if has_more else None
+    return ConversationPageResponse(conversations=summaries, next_cursor=next_cursor)
+
+# Must be declared before /conversations/{conversation_id}
+@router.get("/conversations/search", response_model=ConversationSearchResponse)
+def search_conversations_endpoint(
+    q: str,
+    limit: int = Query(default=20, ge=1, le=100),
+    offset: int = Query(default=0, ge=0),
+    db: Session = Depends(AppState.get_db),
+    app_state: AppState = Depends(AppState.authenticate_request)
+):
+    """
+    Full-text search over summaries and transcripts of processed conversations, best matches first.
+    """
+    if not is_search_supported(db):
+        raise HTTPException(status_code=501, detail="Search is only supported with SQLite databases")
+    hits = search_conversations(db, query=q, limit=limit, offset=offset)
+    conversation_by_id = { conversation.id: conversation for conversation in get_conversations_by_ids(db, [ hit.conversation_id for hit in hits ]) }
+
+    results = []
+    for hit in hits:
+        conversation = conversation_by_id.get(hit.conversation_id)
+        if conversation is None:
+            continue
+        summary = ConversationSummaryRead.from_orm(conversation)
+        summary.transcriptions = None
+        results.append(ConversationSearchResult(conversation=summary, snippet=hit.snippet, rank=hit.rank))
+    return ConversationSearchResponse(results=results)
+
+# Must be declared before /conversations/{conversation_id}
+@router.get("/conversations/semantic_search", response_model=ConversationSemanticSearchResponse)
+async def semantic_search_conversations_endpoint(
+    q: str,
+    limit: int = Query(default=10, ge=1, le=100),
+    app_state: AppState = Depends(AppState.authenticate_request)
+):
+    """
+    Finds processed conversations whose summary or transcript is closest in meaning to the query.
+    """
+    if app_state.semantic_search_service is None:
+        raise HTTPException(status_code=501, detail="Semantic search is not enabled (see embedding configuration)")
+    hits = await app_state.semantic_search_service.search(query=q, limit=limit)
+
+    def load_summaries(db: Session):
+        conversations = get_conversations_by_ids(db, [ hit.conversation_id for hit in hits ])
+        return { conversation.id: ConversationSummaryRead.from_orm(conversation) for conversation in conversations }
+
+    summary_by_id = await app_state.database.run(load_summaries)
+    results = []
+    for hit in hits:
+        summary = summary_by_id.get(hit.conversation_id)
+        if summary is None:
+            continue
+        summary.transcriptions = None
+        results.append(ConversationSemanticSearchResult(conversation=summary, score=hit.score, first_utterance=hit.first_utterance, num_utterances=hit.num_utterances))
+    return ConversationSemanticSearchResponse(results=results)
 
 @router.post("/conversations/{conversation_id}/retry", response_model=ConversationRead)
-def read_conversation(
+async def read_conversation(
     conversation_id: int, 
-    background_tasks: BackgroundTasks,
     db: Session = Depends(AppState.get_db),
     app_state: AppState = Depends(AppState.authenticate_request)
 ):
     conversation = get_conversation(db, conversation_id)
     if not conversation:
         raise HTTPException(status_code=404, detail="Conversation not found")
-    background_tasks.add_task(process_conversation_background_task, conversation.conversation_uuid, app_state)
-
+    # Reprocessing runs on the server's event loop (where clients are notified) and yields to LLM
+    # requests for newly captured conversations
+    await app_state.broker.put_task(ProcessConversationTask(conversation_uuid=conversation.conversation_uuid, priority=LLMPriority.BACKGROUND))
 
     return conversation
 
@@ -45,10 +140,12 @@ async def end_conversation(
     if not conversation:
         raise HTTPException(status_code=404, detail="Conversation not found")
     capture_uuid = conversation.capture_segment_file.source_capture.capture_uuid
-    if capture_uuid not in app_state.capture_handlers:
+    capture_handler = app_state.capture_sessions.get_handler(capture_uuid)
+    if capture_handler is None:
+        if await app_state.forward_to_capture_owner(capture_uuid, CaptureSessionTask(capture_uuid=capture_uuid, action="endpoint")):
+            return conversation
         logger.error(f"Capture session not found: {capture_uuid}")
         raise HTTPException(status_code=500, detail="Capture session not found")
-    capture_handler = app_state.capture_handlers[capture_uuid]
 
     await capture_handler.on_endpoint()
     return conversation
@@ -62,7 +159,29 @@ def read_conversation(
     conversation = get_conversation(db, conversation_id)
     if not conversation:
         raise HTTPException(status_code=404, detail="Conversation not found")
-    return conversation
+    return Response(content=conversation_json_cache.get_json(conversation), media_type="application/json")
+
+@router.get("/conversations/{conversation_id}/transcript", response_model=List[TranscriptionDetailRead])
+def read_conversation_transcript(
+    conversation_id: int,
+    include_words: bool = True,
+    db: Session = Depends(AppState.get_db),
+    app_state: AppState = Depends(AppState.authenticate_request)
+):
+    transcriptions = get_conversation_transcriptions(db, conversation_id, include_words=include_words)
+    if not transcriptions and db.get(Conversation, conversation_id) is None:
+        raise HTTPException(status_code=404, detail="Conversation not found")
+
+    # Words are expanded from their packed form, if any, only here
+    return [
+        TranscriptionDetailRead(
+            **TranscriptionRead.from_orm(transcription).model_dump(exclude={ "utterances" }),
+            utterances=[
+                UtteranceDetailRead(**UtteranceRead.from_orm(utterance).model_dump(), words=get_word_reads(utterance) if include_words else [])
+                for utterance in transcription.utterances
+            ]
+        ) for transcription in transcriptions
+    ]
 
 @router.get("/conversations/", response_model=ConversationsResponse)
 def read_conversations(
@@ -73,16 +192,20 @@ def read_conversations(
 ):
     conversations = get_all_conversations(db, offset, limit)
 
-    return ConversationsResponse(conversations=conversations)
+    # Equivalent to ConversationsResponse, but reusing serialized conversations
+    content = "{\"conversations\":[" + ",".join([ conversation_json_cache.get_json(conversation) for conversation in conversations ]) + "]}"
+    return Response(content=content, media_type="application/json")
 
 @router.delete("/conversations/{conversation_id}")
-def delete_conversation_endpoint(
+async def delete_conversation_endpoint(
     conversation_id: int, 
-    db: Session = Depends(AppState.get_db),
     app_state: AppState = Depends(AppState.authenticate_request)
 ):
-    success = delete_conversation(db, conversation_id)
+    success = await app_state.database.run(delete_conversation, conversation_id)
     if not success:
         raise HTTPException(status_code=404, detail="Conversation not found")
+    if app_state.semantic_search_service:
+        await app_state.semantic_search_service.remove_conversation(conversation_id)
+    await app_state.notification_service.forget_conversation(conversation_id)
 
     return JSONResponse(content={"success": True}, status_code=200)
\ No newline at end of file
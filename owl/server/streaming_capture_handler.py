@@ -2,14 +2,16 @@ from __future__ import annotations
 import asyncio
 from datetime import datetime, timezone
 import logging
+import time
 import uuid
 from typing import TYPE_CHECKING
 
+from ..services import LLMPriority, llm_priority
 from ..services.stt.streaming.streaming_transcription_service_factory import StreamingTranscriptionServiceFactory
 from ..services.endpointing.streaming.streaming_endpointing_service import StreamingEndpointingService
 from ..files.wav_file import append_to_wav_file
+from ..files.audio_file import AudioDurationCounter
 from ..models.schemas import UtteranceRead, Capture, CaptureSegment
-from ..database.crud import create_utterance
 from .task import Task
 if TYPE_CHECKING:
     from .app_state import AppState
@@ -17,19 +19,51 @@ if TYPE_CHECKING:
 logger = logging.getLogger(__name__)
 
 class ProcessConversationTask(Task):
-    def __init__(self, conversation_uuid: str = None):
+    def __init__(self, conversation_uuid: str = None, priority: LLMPriority = LLMPriority.INTERACTIVE):
         self.conversation_uuid = conversation_uuid
+        self.priority = priority
 
     async def run(self, app_state: AppState):
-        await app_state.conversation_service.process_conversation_from_audio(
-            conversation_uuid=self.conversation_uuid,
-            voice_sample_filepath=app_state.config.user.voice_sample_filepath,
-            speaker_name=app_state.config.user.name
-        )
+        # Realtime utterances must be in the database before the conversation is read back
+        if not await app_state.utterance_buffer.flush(write_individually_on_failure=True):
+            logger.error(f"Some realtime utterances could not be written and are missing from conversation {self.conversation_uuid}")
+        with llm_priority(self.priority):
+            await app_state.conversation_service.process_conversation_from_audio(
+                conversation_uuid=self.conversation_uuid,
+                voice_sample_filepath=app_state.config.user.voice_sample_filepath,
+                speaker_name=app_state.config.user.name
+            )
 
 Task.register(ProcessConversationTask)
 
+class CaptureSessionTask(Task):
+    """
+    Ends the current conversation ("endpoint") or finishes the session ("finish") of a streaming
+    capture held by the worker running the task.
+    """
+
+    def __init__(self, capture_uuid: str, action: str):
+        assert action == "endpoint" or action == "finish"
+        self.capture_uuid = capture_uuid
+        self.action = action
+
+    async def run(self, app_state: AppState):
+        capture_handler = app_state.capture_sessions.get_handler(self.capture_uuid)
+        if capture_handler is None:
+            logger.error(f"Capture session not found: {self.capture_uuid}")
+            return
+        if self.action == "endpoint":
+            await capture_handler.on_endpoint()
+        else:
+            await app_state.capture_sessions.finish_handler(self.capture_uuid)
+
+Task.register(CaptureSessionTask)
+
 class StreamingCaptureHandler:
+    # Minimum interval between writes of the incrementally tracked durations to the database. They
+    # are also written whenever a segment ends.
+    _duration_persist_interval_seconds = 5
+
     def __init__(self, app_state: AppState, device_name: str, capture_uuid: str, file_extension: str = "aac"):
         self._app_state = app_state
         self._device_name = device_name
@@ -40,6 +74,9 @@ class StreamingCaptureHandler:
         self._transcript_id = None
         self._capture_file = None
         self._transcript = None
+        self._capture_duration: AudioDurationCounter | None = None
+        self._segment_duration: AudioDurationCounter | None = None
+        self._last_duration_persist_time = 0
         self._init_capture_session_lock = asyncio.Lock()
         self._start_new_segment_lock = asyncio.Lock()
         # infer from file extension
@@ -52,22 +89,28 @@ class StreamingCaptureHandler:
             endpoint_callback=lambda: asyncio.create_task(self.on_endpoint())
         )
 
+    @property
+    def device_name(self) -> str:
+        return self._device_name
+
     async def _init_capture_session(self):
         async with self._init_capture_session_lock:
-            self._capture_file = self._app_state.capture_service.get_capture_file(capture_uuid=self._capture_uuid)
+            self._capture_file = await self._app_state.capture_service.get_capture_file(capture_uuid=self._capture_uuid)
             if not self._capture_file:
                 logger.info(f"Resuming capture session for capture_uuid {self._capture_uuid}")
-                self._capture_file = self._app_state.capture_service.create_capture_file(
+                self._capture_file = await self._app_state.capture_service.create_capture_file(
                     capture_uuid=self._capture_uuid,
                     format=self._file_extension,
                     start_time=datetime.now(timezone.utc),
                     device_type=self._device_name
                 )
+            self._capture_duration = await self._create_duration_counter(self._capture_file.filepath)
 
-            conversation = self._app_state.conversation_service.get_capturing_conversation(self._capture_uuid)
+            conversation = await self._app_state.conversation_service.get_capturing_conversation(self._capture_uuid)
             if conversation:
                 logger.info(f"Resuming conversation for conversation_uuid {conversation.conversation_uuid}")
                 self._segment_file = conversation.capture_segment_file
+                self._segment_duration = await self._create_duration_counter(self._segment_file.filepath)
                 self._conversation_uuid = conversation.conversation_uuid
                 self._transcript_id = conversation.transcriptions[0].id
                 self._transcription_service.set_stream_format(self._stream_format)
@@ -78,13 +121,15 @@ class StreamingCaptureHandler:
     async def on_endpoint(self):
         logger.info(f"Endpoint detected for capture_uuid {self._capture_uuid}")
         if self._capture_file and self._segment_file:
-            self._process_conversation(self._capture_file, self._segment_file)
+            await self._persist_durations()
+            await self._process_conversation(self._capture_file, self._segment_file)
         await self._start_new_segment()
 
-    def _process_conversation(self, capture_file: Capture, segment_file: CaptureSegment):
+    async def _process_conversation(self, capture_file: Capture, segment_file: CaptureSegment):
         logger.info(f"Processing conversation for capture_uuid={capture_file.capture_uuid} (conversation_uuid={segment_file.conversation_uuid})")
         task = ProcessConversationTask(conversation_uuid=segment_file.conversation_uuid)
-        self._app_state.task_queue.put(task)
+        # Runs on this worker, where the conversation's realtime utterances are buffered
+        await self._app_state.broker.put_task(task, affinity_key=self._capture_uuid)
 
     async def handle_audio_data(self, binary_data):
         if not self._capture_file:
@@ -112,6 +157,11 @@ class StreamingCaptureHandler:
             if self._segment_file:
                 with open(self._segment_file.filepath, "ab") as file:
                     file.write(binary_data)
+        self._capture_duration.add(binary_data)
+        if self._segment_file:
+            self._segment_duration.add(binary_data)
+        if time.monotonic() - self._last_duration_persist_time >= self._duration_persist_interval_seconds:
+            await self._persist_durations()
         await self._transcription_service.send_audio(binary_data)
 
     async def handle_utterance(self, utterance):
@@ -119,9 +169,14 @@ class StreamingCaptureHandler:
         asyncio.create_task(self._endpointing_service.utterance_detected())
         if self._transcript_id:
             utterance.transcription_id = self._transcript_id
-        with next(self._app_state.database.get_db()) as db:
-            create_utterance(db, utterance)
-        await self._app_state.notification_service.emit_message("new_utterance",  {'conversation_uuid': self._conversation_uuid, 'utterance': UtteranceRead.from_orm(utterance).model_dump_json()})
+        # The insert is batched with other utterances. Clients are notified once it is done, as they
+        # identify utterances by their IDs.
+        conversation_uuid = self._conversation_uuid
+        async def notify(utterance):
+            payload = {'conversation_uuid': conversation_uuid, 'utterance': UtteranceRead.from_orm(utterance).model_dump_json()}
+            await self._app_state.notification_service.emit_message("new_utterance", payload, capture_uuid=self._capture_uuid, conversation_uuid=conversation_uuid, device_type=self._device_name)
+        self._app_state.utterance_buffer.add(utterance, on_written=notify)
+        self._app_state.conversation_service.add_realtime_utterance(conversation_uuid=conversation_uuid, utterance=utterance)
 
     async def _start_new_segment(self):
         async with self._start_new_segment_lock:
@@ -136,13 +191,37 @@ class StreamingCaptureHandler:
             self._transcript_id = conversation.transcriptions[0].id
 
             self._segment_file = conversation.capture_segment_file
+            self._segment_duration = await self._create_duration_counter(self._segment_file.filepath)
             self._transcription_service.set_stream_format(self._stream_format)
             self._transcription_service.set_callback(self.handle_utterance)
 
-    def finish_capture_session(self):
+    async def _create_duration_counter(self, filepath: str) -> AudioDurationCounter:
+        # Files only exist already when resuming a session, in which case we pick up from whatever
+        # was written previously
+        initial_duration = await asyncio.to_thread(self._app_state.capture_service.get_written_duration, filepath=filepath)
+        return AudioDurationCounter(format=self._file_extension, initial_duration=initial_duration)
+
+    async def _persist_durations(self):
+        self._last_duration_persist_time = time.monotonic()
+        if self._capture_file and self._capture_duration:
+            await self._app_state.capture_service.update_capture_duration(capture_uuid=self._capture_uuid, duration=self._capture_duration.duration)
+        if self._segment_file and self._segment_duration:
+            await self._app_state.capture_service.update_segment_duration(conversation_uuid=self._segment_file.conversation_uuid, duration=self._segment_duration.duration)
+
+    async def finish_capture_session(self):
         if self._segment_file:
-            self._process_conversation(self._capture_file, self._segment_file)
+            await self._persist_durations()
+            await self._process_conversation(self._capture_file, self._segment_file)
+
+        if self._endpointing_service:
+            self._endpointing_service.stop()
+        logger.info(f"Finishing capture: {self._capture_uuid}")
 
+    async def close(self):
+        """
+        Releases the session's resources (endpointing task, transcription connection). The handler
+        may not be used afterwards.
+        """
         if self._endpointing_service:
             self._endpointing_service.stop()
-        logger.info(f"Finishing capture: {self._capture_uuid}")
\ No newline at end of file
+        await self._transcription_service.close()
\ No newline at end of file
@@ -14,6 +14,10 @@ if TYPE_CHECKING:   # see: https://stackoverflow.com/questions/39740632/python-t
 
 
 class Task(ABC):
+    # Quick tasks that must not wait for long-running ones (e.g., conversation processing) set this
+    # to run as soon as they are dequeued, concurrently with others
+    run_immediately: bool = False
+
     @abstractmethod
     async def run(self, app_state: AppState):
         pass
\ No newline at end of file
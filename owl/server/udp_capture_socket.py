@@ -21,14 +21,10 @@ class UDPCaptureSocketApp(asyncio.DatagramProtocol):
         self._capture_uuid = None
         self._timeout_seconds = timeout_seconds
         self._timeout_handle = None
+        self._create_session_lock = asyncio.Lock()
 
     def connection_made(self, transport: asyncio.DatagramTransport) -> None:
         self._transport = transport
-        # Create a new capture session with id generated by the server since we don't have a UPD protocol for this
-        self._capture_uuid = uuid.uuid1().hex
-        self._app_state.capture_handlers[self._capture_uuid] = StreamingCaptureHandler(
-            self._app_state, "spresense", self._capture_uuid, "mp3"
-        )
 
     def datagram_received(self, data: bytes, addr):
         if self._timeout_handle:
@@ -39,11 +35,19 @@ class UDPCaptureSocketApp(asyncio.DatagramProtocol):
         asyncio.create_task(self.send_info_to_client(data))
 
     async def send_info_to_client(self, data: bytes):
-        await self._app_state.capture_handlers[self._capture_uuid].handle_audio_data(data)
+        async with self._create_session_lock:
+            capture_handler = self._app_state.capture_sessions.get_handler(self._capture_uuid) if self._capture_uuid else None
+            if capture_handler is None:
+                # Create a new capture session with id generated by the server since we don't have a
+                # UPD protocol for this. Audio arriving after a session has timed out starts a new one.
+                self._capture_uuid = uuid.uuid1().hex
+                await self._app_state.broker.claim(self._capture_uuid)
+                capture_handler = StreamingCaptureHandler(self._app_state, "spresense", self._capture_uuid, "mp3")
+                await self._app_state.capture_sessions.add_handler(self._capture_uuid, capture_handler)
+        await capture_handler.handle_audio_data(data)
 
     def connection_timed_out(self):
-        if self._capture_uuid not in self._app_state.capture_handlers:
+        if self._capture_uuid is None or self._app_state.capture_sessions.get_handler(self._capture_uuid) is None:
             logger.error(f"Capture session not found: {self._capture_uuid}")
             return
-        capture_handler = self._app_state.capture_handlers[self._capture_uuid]
-        capture_handler.finish_capture_session()
+        asyncio.create_task(self._app_state.capture_sessions.finish_handler(self._capture_uuid))
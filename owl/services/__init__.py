@@ -3,4 +3,6 @@ from .conversation.conversation_service import ConversationService
 from .endpointing.chunking.conversation_detection_service import ConversationDetectionService
 from .notification.notification_service import NotificationService
 from .llm.llm_service import LLMService
-from .web_search.bing_search_service import BingSearchService
\ No newline at end of file
+from .llm.llm_governor import LLMGovernor, LLMPriority, llm_priority
+from .web_search.bing_search_service import BingSearchService
+from .embedding.semantic_search_service import SemanticSearchService
@@ -9,12 +9,15 @@ from datetime import datetime
 import logging
 import os
 
+from sqlalchemy.exc import IntegrityError
+from sqlmodel import Session
+
 from ...database.database import Database
 from ...core.config import Configuration
 from ...devices import DeviceType
 from ...models.schemas import Capture
-from ...database.crud import create_capture_file_ref, get_capture_file_ref
-from ...files import CaptureDirectory
+from ...database.crud import create_capture_file_ref, get_capture_file_ref, update_capture_duration, add_capture_duration, update_capture_segment_duration
+from ...files import CaptureDirectory, get_audio_duration
 
 logger = logging.getLogger(__name__)
 
@@ -23,20 +26,20 @@ class CaptureService:
         self._config = config
         self._database = database
     
-    def create_capture_file(self, capture_uuid: str, format: str, start_time: datetime, device_type: DeviceType | str) -> Capture:
-        with next(self._database.get_db()) as db:
+    async def create_capture_file(self, capture_uuid: str, format: str, start_time: datetime, device_type: DeviceType | str) -> Capture:
+        # Parse device type
+        assert isinstance(device_type, DeviceType) or isinstance(device_type, str)
+        device: DeviceType = None
+        if isinstance(device_type, str):
+            device = DeviceType(device_type) if device_type in DeviceType else DeviceType.UNKNOWN
+        else:
+            device = device_type
+
+        def create(db: Session) -> Capture:
             # This method is only for creating new captures
             existing_capture_file_ref = get_capture_file_ref(db=db, capture_uuid=capture_uuid)
             assert existing_capture_file_ref is None
 
-            # Parse device type
-            assert isinstance(device_type, DeviceType) or isinstance(device_type, str)
-            device: DeviceType = None
-            if isinstance(device_type, str):
-                device = DeviceType(device_type) if device_type in DeviceType else DeviceType.UNKNOWN
-            else:
-                device = device_type
-
             # Create and enter into database
             new_capture_file = Capture(
                 capture_uuid=capture_uuid,
@@ -44,10 +47,51 @@ class CaptureService:
                 device_type=device.value,
                 start_time=start_time
             )
-            saved_capture_file = create_capture_file_ref(db, new_capture_file)
+            try:
+                return create_capture_file_ref(db, new_capture_file)
+            except IntegrityError:
+                # Created concurrently (e.g., by another upload of the first chunk)
+                db.rollback()
+                existing_capture_file_ref = get_capture_file_ref(db=db, capture_uuid=capture_uuid)
+                if existing_capture_file_ref is None:
+                    raise
+                return existing_capture_file_ref
+
+        return await self._database.run(create)
+
+    async def get_capture_file(self, capture_uuid: str) -> Capture | None:
+        return await self._database.run(get_capture_file_ref, capture_uuid=capture_uuid)
+
+    async def update_capture_duration(self, capture_uuid: str, duration: float):
+        await self._database.run(update_capture_duration, capture_uuid=capture_uuid, duration=duration)
+
+    async def add_capture_duration(self, capture_uuid: str, seconds: float):
+        await self._database.run(add_capture_duration, capture_uuid=capture_uuid, seconds=seconds)
+
+    async def update_segment_duration(self, conversation_uuid: str, duration: float):
+        await self._database.run(update_capture_segment_duration, conversation_uuid=conversation_uuid, duration=duration)
+
+    @staticmethod
+    def get_written_duration(filepath: str) -> float:
+        """
+        Duration of audio already written to a capture or segment file, used to seed incremental
+        duration tracking when a capture session is resumed. Computed from headers, so this does
+        not decode the file.
+
+        Parameters
+        ----------
+        filepath : str
+            Capture or segment file, which need not exist yet.
 
-            return saved_capture_file
-        
-    def get_capture_file(self, capture_uuid: str) -> Capture | None:
-        with next(self._database.get_db()) as db:
-            return get_capture_file_ref(db=db, capture_uuid=capture_uuid)
\ No newline at end of file
+        Returns
+        -------
+        float
+            Duration in seconds or 0 if the file does not exist.
+        """
+        if not os.path.exists(filepath):
+            return 0
+        try:
+            return get_audio_duration(filepath)
+        except Exception as e:
+            logger.error(f"Unable to determine duration of {filepath}: {e}")
+            return 0
@@ -1,30 +1,40 @@
+import asyncio
 import os
 import time
-from pydub import AudioSegment
 from datetime import datetime, timedelta
 import logging
+from typing import List, Tuple
+
+from sqlmodel import Session
 
 from ..stt.asynchronous.abstract_async_transcription_service import AbstractAsyncTranscriptionService
 from ..conversation.transcript_summarizer import TranscriptionSummarizer  
-from ...database.crud import create_transcription, create_conversation, find_most_common_location, create_capture_file_segment_file_ref, update_conversation_state, get_conversation_by_conversation_uuid, get_capturing_conversation_by_capture_uuid 
+from ..conversation.rolling_summarizer import RollingSummarizer
+from ...database.crud import create_transcription, create_conversation, find_most_common_location, create_capture_file_segment_file_ref, update_conversation_state, update_conversation_summary, get_conversation_by_conversation_uuid, get_capturing_conversation_by_capture_uuid, delete_conversation
 from ...database.database import Database
+from ...database.search import index_conversation
 from ...core.config import Configuration
-from ...models.schemas import Transcription, Conversation, ConversationState, Capture, CaptureSegment, TranscriptionRead, ConversationRead, SuggestedLink
-from ...files import CaptureDirectory
+from ...core.utils import TaskGraph
+from ...models.schemas import Transcription, Utterance, Conversation, ConversationState, Capture, CaptureSegment, TranscriptionRead, SuggestedLink
+from ...models.packed_words import pack_utterance_words
+from ...models.conversation_json_cache import conversation_json_cache
+from ...files import CaptureDirectory, get_audio_duration
 
 logger = logging.getLogger(__name__)
 
 class ConversationService:
-    def __init__(self, config: Configuration, database: Database, transcription_service: AbstractAsyncTranscriptionService, notification_service, bing_search_service=None):
+    def __init__(self, config: Configuration, database: Database, transcription_service: AbstractAsyncTranscriptionService, notification_service, bing_search_service=None, semantic_search_service=None):
         self._config = config
         self._database = database
         self._transcription_service = transcription_service
         self._notification_service = notification_service
         self._summarizer = TranscriptionSummarizer(config)
+        self._rolling_summarizer = RollingSummarizer(config) if config.rolling_summary else None
         self._bing_search_service = bing_search_service
+        self._semantic_search_service = semantic_search_service
 
     async def create_conversation(self, conversation_uuid: str, start_time: datetime, capture_file: Capture) -> Conversation:
-        with next(self._database.get_db()) as db:
+        def create(db: Session) -> Tuple[Conversation, str]:
             # Create segment file
             segment_file = CaptureSegment(
                 conversation_uuid=conversation_uuid,
@@ -53,134 +63,208 @@ class ConversationService:
                 transcriptions=[realtime_transcript]
             )
             saved_conversation = create_conversation(db=db, conversation=conversation)
- 
-            await self._notification_service.send_notification("New Conversation", "New conversation detected.", "new_conversation", payload=ConversationRead.from_orm(conversation).model_dump_json(indent=2))
-            return saved_conversation
-        
-    def get_conversation(self, conversation_uuid: str) -> Conversation | None:
-        with next(self._database.get_db()) as db:
-            return get_conversation_by_conversation_uuid(db, conversation_uuid)
-        
-    def get_capturing_conversation(self, capture_uuid: str) -> Conversation | None:
-        with next(self._database.get_db()) as db:
-            return get_capturing_conversation_by_capture_uuid(db, capture_uuid)
-        
+
+            # Serializing also loads the relationships that callers use
+            return saved_conversation, conversation_json_cache.get_json(saved_conversation)
+
+        saved_conversation, conversation_json = await self._database.run(create)
+        await self._notification_service.send_conversation_notification("New Conversation", "New conversation detected.", "new_conversation", conversation_json=conversation_json)
+        return saved_conversation
+
+    def add_realtime_utterance(self, conversation_uuid: str, utterance: Utterance):
+        """
+        Feeds a realtime utterance of a conversation that is being captured to the rolling
+        summarizer, if enabled.
+        """
+        if self._rolling_summarizer and conversation_uuid:
+            self._rolling_summarizer.add_utterance(conversation_uuid=conversation_uuid, utterance=utterance)
+
+    async def get_conversation(self, conversation_uuid: str) -> Conversation | None:
+        return await self._database.run(get_conversation_by_conversation_uuid, conversation_uuid)
+
+    async def get_capturing_conversation(self, capture_uuid: str) -> Conversation | None:
+        return await self._database.run(get_capturing_conversation_by_capture_uuid, capture_uuid)
+
     async def fail_processing_and_capturing_conversations(self):
-        with next(self._database.get_db()) as db:
+        def fail(db: Session) -> List[str]:
             conversations_to_update = db.query(Conversation).filter(Conversation.state.in_([ConversationState.CAPTURING, ConversationState.PROCESSING])).all()
             for conversation in conversations_to_update:
                 conversation.state = ConversationState.FAILED_PROCESSING
-                await self._notification_service.send_notification("Conversation Failure", "A conversation failed to process.", "update_conversation", payload=ConversationRead.from_orm(conversation).model_dump_json(indent=2))
             db.commit()
+            return [ conversation_json_cache.get_json(conversation) for conversation in conversations_to_update ]
+
+        for conversation_json in await self._database.run(fail):
+            await self._notification_service.send_conversation_notification("Conversation Failure", "A conversation failed to process.", "update_conversation", conversation_json=conversation_json)
 
     async def process_conversation_from_audio(self, conversation_uuid: str, voice_sample_filepath: str = None, speaker_name: str = None):
+        # All database access happens in discrete steps on database threads (see Database.run()).
+        # Objects loaded in those steps remain readable here, and the relationships that are needed
+        # are loaded by serializing them before each step returns.
+        conversation: Conversation | None = None
         try:
-            with next(self._database.get_db()) as db:
+            def begin_processing(db: Session) -> Tuple[Conversation, str]:
                 conversation = get_conversation_by_conversation_uuid(db, conversation_uuid)
-                update_conversation_state(db, conversation.id, ConversationState.PROCESSING)
                 conversation.state = ConversationState.PROCESSING
-                await self._notification_service.send_notification("Conversation Processing", "A conversation has begun processing.", "update_conversation", payload=ConversationRead.from_orm(conversation).model_dump_json(indent=2))
-
-                logger.info(f"Processing conversation...")
-                # Segment audio and duration
-                audio = AudioSegment.from_file(conversation.capture_segment_file.filepath)
-                audio_duration = len(audio) / 1000.0  # Duration in seconds
-
-                # Total capture audio duration
-                capture_audio = AudioSegment.from_file(conversation.capture_segment_file.source_capture.filepath)
-                capture_audio_duration = len(capture_audio) / 1000.0  # Duration in seconds
-
-                # Conversation start and end time
-                conversation_start_time = conversation.capture_segment_file.start_time
-                conversation_end_time = conversation_start_time + timedelta(seconds=audio_duration)
-
-                # Start transcription timer
-                start_time = time.time()
-
-                transcription = await self._transcription_service.transcribe_audio(conversation.capture_segment_file.filepath, voice_sample_filepath, speaker_name)
-                transcription.transcription_time = time.time() - start_time  # Transcription time
-                logger.info(f"Transcription complete in {transcription.transcription_time:.2f} seconds")
-                logger.info(f"Transcription: {transcription.utterances}")
-                if not transcription.utterances:
-                    logger.info("No utterances found in the transcription. Skipping conversation processing.")
-                    deleted_data = ConversationRead.from_orm(conversation)
-                    db.delete(conversation)
-                    db.commit()
-                    serialized_payload = deleted_data.json() 
-                    await self._notification_service.send_notification("Empty Conversation", "An empty conversation was deleted", "delete_conversation", payload=serialized_payload)
-                    return None, None  
+                db.commit()
+                return conversation, conversation_json_cache.get_json(conversation)
 
-                for utterance in transcription.utterances:
-                    utterance.spoken_at = conversation_start_time + timedelta(seconds=utterance.start)
+            conversation, conversation_json = await self._database.run(begin_processing)
+            await self._notification_service.send_conversation_notification("Conversation Processing", "A conversation has begun processing.", "update_conversation", conversation_json=conversation_json)
 
-                start_time = time.time()
-                conversation.summarization_model = self._config.llm.model
-                summary_text = await self._summarizer.summarize(transcription)
-                logger.info(f"Summarization complete in {time.time() - start_time:.2f} seconds")
-                logger.info(f"Summary generated: {summary_text}")
+            logger.info(f"Processing conversation...")
+            # Segment duration (seconds) is maintained by the ingestion path as audio is
+            # written. Only segments recorded before this was the case need to be measured.
+            audio_duration = conversation.capture_segment_file.duration
+            if audio_duration is None:
+                audio_duration = await asyncio.to_thread(get_audio_duration, conversation.capture_segment_file.filepath)
+
+            # Conversation start and end time
+            conversation_start_time = conversation.capture_segment_file.start_time
+            conversation_end_time = conversation_start_time + timedelta(seconds=audio_duration)
 
+            # Start transcription timer
+            start_time = time.time()
 
-                start_time = time.time()
-                short_summary_text = await self._summarizer.short_summarize(transcription)
-                logger.info(f"Short summarization complete in {time.time() - start_time:.2f} seconds")
-                logger.info(f"Short summary generated: {short_summary_text}")
+            transcription = await self._transcription_service.transcribe_audio(conversation.capture_segment_file.filepath, voice_sample_filepath, speaker_name)
+            transcription.transcription_time = time.time() - start_time  # Transcription time
+            logger.info(f"Transcription complete in {transcription.transcription_time:.2f} seconds")
+            logger.info(f"Transcription: {transcription.utterances}")
+            if not transcription.utterances:
+                logger.info("No utterances found in the transcription. Skipping conversation processing.")
+                if self._rolling_summarizer:
+                    self._rolling_summarizer.discard(conversation_uuid)
+                await self._database.run(delete_conversation, conversation.id)
+                await self._notification_service.forget_conversation(conversation.id)
+                await self._notification_service.send_notification("Empty Conversation", "An empty conversation was deleted", "delete_conversation", payload=conversation_json, **self._notification_service.get_conversation_routing(conversation_json))
+                return None, None
 
-                # Update durations
-                conversation.capture_segment_file.source_capture.duration = capture_audio_duration
-                conversation.capture_segment_file.duration = audio_duration
+            for utterance in transcription.utterances:
+                utterance.spoken_at = conversation_start_time + timedelta(seconds=utterance.start)
 
+            # Running summary maintained during capture, if any, so that only the tail of the
+            # transcript remains to be summarized
+            rolling_summary = await self._rolling_summarizer.finish(conversation_uuid) if self._rolling_summarizer else None
+
+            if self._config.database.pack_words:
+                for utterance in transcription.utterances:
+                    pack_utterance_words(utterance)
+
+            def save_transcription(db: Session) -> TranscriptionRead:
+                transcription.conversation_id = conversation.id     # link transcription to conversation
                 saved_transcription = create_transcription(db, transcription)
+                return TranscriptionRead.from_orm(saved_transcription)
+
+            transcription_data = await self._database.run(save_transcription)
+            capture_directory = CaptureDirectory(config=self._config)
 
-                # Create and save conversation
-                most_common_location = find_most_common_location(db, conversation_start_time, conversation_end_time, conversation.capture_segment_file.source_capture.capture_uuid)
-                if most_common_location:
-                    logger.info(f"Identified conversation primary location: {most_common_location}")
+            # Post-transcription stages run concurrently where their dependencies allow: the
+            # summaries, location lookup, and transcription export are independent, and link
+            # suggestions depend on the summary
+            async def find_location():
+                location = await self._database.run(find_most_common_location, conversation_start_time, conversation_end_time, conversation.capture_segment_file.source_capture.capture_uuid)
+                if location:
+                    logger.info(f"Identified conversation primary location: {location}")
+                return location
 
-                suggested_links = []
+            async def export_transcription():
+                transcription_json = transcription_data.model_dump_json(indent=2)
+                transcription_json_filepath = capture_directory.get_transcription_filepath(segment_file=conversation.capture_segment_file)
+                await asyncio.to_thread(self._write_file, transcription_json_filepath, transcription_json)
+
+            async def stream_summary():
+                # Clients render the summary progressively from deltas. The complete summary is
+                # persisted as soon as it is available.
+                index = 0
+                async def send_delta(delta: str):
+                    nonlocal index
+                    await self._notification_service.emit_message("conversation_summary_delta", { "conversation_uuid": conversation_uuid, "index": index, "delta": delta }, conversation_uuid=conversation_uuid)
+                    index += 1
+                summary = await self._summarizer.summarize(transcription, on_delta=send_delta, rolling_summary=rolling_summary)
+                await self._database.run(update_conversation_summary, conversation_uuid, summary)
+                await self._notification_service.emit_message("conversation_summary_delta", { "conversation_uuid": conversation_uuid, "index": index, "delta": "", "done": True }, conversation_uuid=conversation_uuid)
+                return summary
+
+            async def find_suggested_links(search_query: str):
+                logger.info(f"Searching for suggested links: {search_query}")
+                bing_results = await self._bing_search_service.search(search_query)
+                return [ SuggestedLink(url=str(result.url)) for result in bing_results.webPages.value ]
+
+            graph = TaskGraph()
+            graph.add("location", find_location)
+            graph.add("transcription_export", export_transcription)
+            if self._config.llm.structured_output:
+                # Single request for summaries and search query
+                graph.add("summaries", lambda: self._summarizer.structured_summarize(transcription, include_search_query=self._bing_search_service is not None, rolling_summary=rolling_summary))
                 if self._bing_search_service:
-                    query = await self._summarizer.get_query_from_summary(summary_text)
-                    logger.info(f"Searching for suggested links: {query}")
-                    bing_results = await self._bing_search_service.search(query)
-                    for result in bing_results.webPages.value:
-                        suggested_links.append(SuggestedLink(url=str(result.url)))
+                    graph.add("suggested_links", lambda summaries: find_suggested_links(summaries.search_query), depends_on=[ "summaries" ])
+            else:
+                if self._config.llm.stream_summaries:
+                    graph.add("summary", stream_summary)
+                else:
+                    graph.add("summary", lambda: self._summarizer.summarize(transcription, rolling_summary=rolling_summary))
+                graph.add("short_summary", lambda: self._summarizer.short_summarize(transcription, rolling_summary=rolling_summary))
+                if self._bing_search_service:
+                    graph.add("search_query", lambda summary: self._summarizer.get_query_from_summary(summary), depends_on=[ "summary" ])
+                    graph.add("suggested_links", find_suggested_links, depends_on=[ "search_query" ])
+            results = await graph.run()
+
+            if "summaries" in results:
+                summary_text = results["summaries"].summary
+                short_summary_text = results["summaries"].short_summary
+            else:
+                summary_text = results["summary"]
+                short_summary_text = results["short_summary"]
+            most_common_location = results["location"]
+            suggested_links = results.get("suggested_links", [])
+            logger.info(f"Summary generated: {summary_text}")
+            logger.info(f"Short summary generated: {short_summary_text}")
 
+            processing_timings = { "transcription": transcription.transcription_time, **graph.timings }
+            logger.info("Stage timings: " + ", ".join([ f"{stage}={seconds:.2f}s" for stage, seconds in processing_timings.items() ]))
+
+            def complete_processing(db: Session) -> Tuple[Conversation, str]:
+                conversation = get_conversation_by_conversation_uuid(db, conversation_uuid)
+                conversation.summarization_model = self._config.llm.model
                 conversation.end_time = conversation_end_time
                 conversation.summary = summary_text
                 conversation.short_summary = short_summary_text
                 conversation.start_time = conversation_start_time
-                conversation.transcriptions.append(saved_transcription)
                 conversation.primary_location_id = most_common_location.id if most_common_location else None
                 conversation.suggested_links = suggested_links
-        
-                # Link transcription to conversation
-                saved_transcription.conversation_id = conversation.id
+                conversation.processing_timings = processing_timings
+                conversation.capture_segment_file.duration = audio_duration  # a no-op unless it had to be measured above
                 conversation.state = ConversationState.COMPLETED
+                index_conversation(db, conversation, transcript=" ".join([ utterance.text for utterance in transcription.utterances if utterance.text ]))
+                db.commit()
+                return conversation, conversation_json_cache.get_json(conversation)
 
-                # Save files for easy debugging and inspection
-                transcription_data = TranscriptionRead.from_orm(saved_transcription)
-                conversation_data = ConversationRead.from_orm(conversation)
+            conversation, conversation_json = await self._database.run(complete_processing)
+
+            # Save conversation for easy debugging and inspection (the transcription has
+            # already been saved above)
+            conversation_json_filepath = capture_directory.get_conversation_filepath(segment_file=conversation.capture_segment_file)
+            await asyncio.to_thread(self._write_file, conversation_json_filepath, conversation_json)
+
+            summary_snippet = summary_text[:100] + (summary_text[100:] and '...')
+            await self._notification_service.send_conversation_notification("New Conversation Summary", summary_snippet, "update_conversation", conversation_json=conversation_json)
+
+            # Semantic search is an extra and does not fail processing
+            if self._semantic_search_service:
+                try:
+                    await self._semantic_search_service.index_conversation(conversation_id=conversation.id, summary=summary_text, utterances=transcription.utterances)
+                except Exception as e:
+                    logger.error(f"Failed to index conversation embeddings: {e}")
 
-                transcription_json = transcription_data.model_dump_json(indent=2)
-                conversation_json = conversation_data.model_dump_json(indent=2)
-                
-                transcription_json_filepath = CaptureDirectory(config=self._config).get_transcription_filepath(segment_file=conversation.capture_segment_file)
-                with open(transcription_json_filepath, 'w') as file:
-                    file.write(transcription_json)
-
-                conversation_json_filepath = CaptureDirectory(config=self._config).get_conversation_filepath(segment_file=conversation.capture_segment_file)
-                with open(conversation_json_filepath, 'w') as file:
-                    file.write(conversation_json)
-                    
-                summary_snippet = summary_text[:100] + (summary_text[100:] and '...')
-                await self._notification_service.send_notification("New Conversation Summary", summary_snippet, "update_conversation", payload=conversation_json)
-                
-                db.commit()
-            
         except Exception as e:
             logger.error(f"Error processing conversation: {e}")
-            if conversation_uuid is not None and conversation:
-                update_conversation_state(db, conversation.id, ConversationState.FAILED_PROCESSING)
-            raise e  
-        finally:
-            db.commit() 
+            if self._rolling_summarizer:
+                self._rolling_summarizer.discard(conversation_uuid)
+            if conversation is not None:
+                await self._database.run(update_conversation_state, conversation.id, ConversationState.FAILED_PROCESSING)
+            raise e
         return transcription, conversation
+
+    @staticmethod
+    def _write_file(filepath: str, contents: str):
+        with open(filepath, "w") as file:
+            file.write(contents)
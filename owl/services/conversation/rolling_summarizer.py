@@ -0,0 +1,124 @@
+#
+# rolling_summarizer.py
+#
+# Maintains a running summary of each conversation that is being captured, from the realtime
+# (streaming) utterances. Utterances are folded into the summary in batches, with each update seeing
+# only the previous summary and the new batch, so that the context remains bounded no matter how
+# long the conversation is.
+#
+# When the conversation ends, the final summarization only has to fold in the tail of the final
+# transcript: the utterances spoken after the last update.
+#
+
+import asyncio
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+import logging
+import time
+from typing import Dict, List
+
+from ...models.schemas import Utterance
+from ...services.llm.llm_service import LLMService
+from ...services.llm.llm_governor import LLMPriority
+from ...core.config import Configuration
+from ...prompts import rolling_summarization_system_message
+
+logger = logging.getLogger(__name__)
+
+def _as_utc(timestamp: datetime) -> datetime:
+    # Naive timestamps (e.g., as read back from SQLite) are UTC
+    return timestamp.replace(tzinfo=timezone.utc) if timestamp.tzinfo is None else timestamp.astimezone(timezone.utc)
+
+@dataclass
+class RollingSummary:
+    summary: str
+    covered_until: datetime     # utterances spoken after this are not yet reflected in the summary (UTC)
+
+    def get_tail(self, utterances: List[Utterance]) -> List[Utterance]:
+        """
+        Returns the utterances (which must have spoken_at set) not yet covered by the summary.
+        """
+        return [ utterance for utterance in utterances if utterance.spoken_at is None or _as_utc(utterance.spoken_at) > self.covered_until ]
+
+@dataclass
+class _ConversationState:
+    summary: str = ""
+    covered_until: datetime | None = None
+    pending: List[Utterance] = field(default_factory=list)
+    last_update_time: float = field(default_factory=time.time)
+    task: asyncio.Task | None = None
+
+class RollingSummarizer:
+    def __init__(self, config: Configuration):
+        self._config = config
+        self._rolling_config = config.rolling_summary
+        self._llm_service = LLMService(config.llm)
+        self._states: Dict[str, _ConversationState] = {}
+
+    def add_utterance(self, conversation_uuid: str, utterance: Utterance):
+        """
+        Adds a realtime utterance. Does not block: updates of the running summary happen in the
+        background once a batch is ready.
+        """
+        if not utterance.text or utterance.spoken_at is None:
+            return
+        state = self._states.setdefault(conversation_uuid, _ConversationState())
+        state.pending.append(utterance)
+        batch_ready = len(state.pending) >= self._rolling_config.batch_utterances or time.time() - state.last_update_time >= self._rolling_config.batch_seconds
+        if batch_ready and (state.task is None or state.task.done()):
+            state.task = asyncio.create_task(self._update(conversation_uuid=conversation_uuid, state=state))
+
+    async def finish(self, conversation_uuid: str) -> RollingSummary | None:
+        """
+        Stops tracking a conversation and returns its running summary, waiting for any update in
+        progress. Pending utterances are not folded in, as they are part of the tail that the
+        final summarization covers.
+
+        Returns
+        -------
+        RollingSummary | None
+            Running summary or None if no summary was produced.
+        """
+        state = self._states.pop(conversation_uuid, None)
+        if state is None:
+            return None
+        if state.task is not None:
+            try:
+                await state.task
+            except Exception as e:
+                logger.error(f"Rolling summary update failed for conversation_uuid={conversation_uuid}: {e}")
+        if not state.summary or state.covered_until is None:
+            return None
+        return RollingSummary(summary=state.summary, covered_until=state.covered_until)
+
+    def discard(self, conversation_uuid: str):
+        state = self._states.pop(conversation_uuid, None)
+        if state is not None and state.task is not None:
+            state.task.cancel()
+
+    async def _update(self, conversation_uuid: str, state: _ConversationState):
+        while state.pending:
+            batch = state.pending[:self._rolling_config.batch_utterances]
+            system_message = rolling_summarization_system_message(config=self._config, max_summary_words=self._rolling_config.max_summary_words)
+            lines = [ f"{utterance.speaker or 'Unknown'}: {utterance.text}" for utterance in batch ]
+            user_message = f"Running summary:\n{state.summary}\n\nTranscript since:\n" + "\n".join(lines)
+
+            # Running summaries are not needed until the conversation ends, so they yield to
+            # summarization of conversations that have ended
+            start_time = time.time()
+            response = await self._llm_service.async_llm_completion(
+                messages=[
+                    {"content": system_message, "role": "system"},
+                    {"content": user_message, "role": "user"}
+                ],
+                priority=LLMPriority.BACKGROUND
+            )
+            state.summary = response.choices[0].message.content
+            state.covered_until = _as_utc(batch[-1].spoken_at)
+            state.last_update_time = time.time()
+            del state.pending[:len(batch)]
+            logger.info(f"Updated rolling summary for conversation_uuid={conversation_uuid} with {len(batch)} utterances in {time.time() - start_time:.2f} seconds")
+
+            # Only continue with a partial batch if it is due
+            if len(state.pending) < self._rolling_config.batch_utterances and time.time() - state.last_update_time < self._rolling_config.batch_seconds:
+                break
@@ -1,33 +1,84 @@
+import asyncio
+from collections import OrderedDict
+import hashlib
+import json
+import logging
+from typing import Awaitable, Callable, List, Optional
+
+from pydantic import BaseModel, ValidationError, field_validator
+
 from ...models.schemas import Transcription
+from .rolling_summarizer import RollingSummary
 from ...services.llm.llm_service import LLMService
 from ...core.config import Configuration
-from ...prompts import summarization_system_message, short_summarization_system_message, suggest_links_system_message
+from ...prompts import summarization_system_message, short_summarization_system_message, structured_summarization_system_message, partial_summarization_system_message, suggest_links_system_message
+
+logger = logging.getLogger(__name__)
+
+class StructuredSummary(BaseModel):
+    summary: str
+    short_summary: str
+    search_query: Optional[str] = None
+
+    @field_validator("summary", "short_summary")
+    @classmethod
+    def not_empty(cls, value: str) -> str:
+        if not value.strip():
+            raise ValueError("must not be empty")
+        return value.strip()
 
 class TranscriptionSummarizer:
     def __init__(self, config: Configuration):
         self._config = config
         self._llm_service = LLMService(config.llm)
+        self._window_tokens = config.llm.summarization_window_tokens
+        self._window_semaphore = asyncio.Semaphore(max(1, config.llm.summarization_max_parallel_windows))
+        self._condensed_transcripts: OrderedDict[str, asyncio.Task] = OrderedDict()  # recent condensed transcripts, shared by concurrent summarization requests
+
+    async def summarize(self, transcription: Transcription, on_delta: Callable[[str], Awaitable[None]] | None = None, rolling_summary: RollingSummary | None = None) -> str:
+        """
+        Summarizes a transcription.
 
-    async def summarize(self, transcription: Transcription) -> str:
+        Parameters
+        ----------
+        transcription : Transcription
+            Transcription to summarize.
+
+        on_delta : Callable[[str], Awaitable[None]] | None
+            If given, the summary is streamed and this is awaited with each piece of text as it is
+            generated.
+
+        rolling_summary : RollingSummary | None
+            Running summary of the conversation, if one was maintained while it was captured. Only
+            the utterances it does not cover are then summarized along with it.
+
+        Returns
+        -------
+        str
+            Complete summary.
+        """
         system_message = summarization_system_message(config=self._config)
 
-        utterances = [f"{utterance.speaker}: {utterance.text}" for utterance in transcription.utterances]
-        user_message = "Transcript:\n" + "\n".join(utterances)
+        user_message = await self._get_transcript_message(transcription=transcription, rolling_summary=rolling_summary)
+        messages = [
+            {"content": system_message, "role": "system"},
+            {"content": user_message, "role": "user"}
+        ]
 
-        response = await self._llm_service.async_llm_completion(
-            messages=[
-                {"content": system_message, "role": "system"},
-                {"content": user_message, "role": "user"}
-            ]
-        )
-        
+        if on_delta is not None:
+            content = []
+            async for delta in self._llm_service.async_llm_completion_stream(messages=messages):
+                content.append(delta)
+                await on_delta(delta)
+            return "".join(content)
+
+        response = await self._llm_service.async_llm_completion(messages=messages)
         return response.choices[0].message.content
-    
-    async def short_summarize(self, transcription: Transcription) -> str:
+
+    async def short_summarize(self, transcription: Transcription, rolling_summary: RollingSummary | None = None) -> str:
         system_message = short_summarization_system_message(config=self._config)
 
-        utterances = [f"{utterance.speaker}: {utterance.text}" for utterance in transcription.utterances]
-        user_message = "Transcript:\n" + "\n".join(utterances)
+        user_message = await self._get_transcript_message(transcription=transcription, rolling_summary=rolling_summary)
 
         response = await self._llm_service.async_llm_completion(
             messages=[
@@ -35,9 +86,9 @@ class TranscriptionSummarizer:
                 {"content": user_message, "role": "user"}
             ]
         )
-        
+
         return response.choices[0].message.content
-    
+
     async def get_query_from_summary(self, summary: str) -> str:
         system_message = suggest_links_system_message(config=self._config)
 
@@ -47,5 +98,155 @@ class TranscriptionSummarizer:
                 {"content": summary, "role": "user"}
             ]
         )
-        
-        return response.choices[0].message.content
\ No newline at end of file
+
+        return response.choices[0].message.content
+
+    async def structured_summarize(self, transcription: Transcription, include_search_query: bool, rolling_summary: RollingSummary | None = None) -> StructuredSummary:
+        """
+        Produces the summary, short summary, and (optionally) search query with a single request,
+        so that the transcript is only processed once. If the response cannot be parsed and
+        validated, falls back to separate requests.
+
+        Parameters
+        ----------
+        transcription : Transcription
+            Transcription to summarize.
+
+        include_search_query : bool
+            Whether to also produce a search query for suggested links.
+
+        rolling_summary : RollingSummary | None
+            Running summary of the conversation, if one was maintained while it was captured.
+
+        Returns
+        -------
+        StructuredSummary
+            Summaries and, if requested, search query.
+        """
+        system_message = structured_summarization_system_message(config=self._config, include_search_query=include_search_query)
+
+        user_message = await self._get_transcript_message(transcription=transcription, rolling_summary=rolling_summary)
+
+        response = await self._llm_service.async_llm_completion(
+            messages=[
+                {"content": system_message, "role": "system"},
+                {"content": user_message, "role": "user"}
+            ],
+            response_format={ "type": "json_object" }
+        )
+
+        try:
+            result = self._parse_structured_summary(response.choices[0].message.content)
+            if include_search_query and not result.search_query:
+                raise ValueError("Missing search query")
+            return result
+        except (ValueError, ValidationError) as e:
+            logger.warning(f"Malformed structured summary response, falling back to separate requests: {e}")
+            return await self._summarize_separately(transcription=transcription, include_search_query=include_search_query, rolling_summary=rolling_summary)
+
+    async def _get_transcript_message(self, transcription: Transcription, rolling_summary: RollingSummary | None = None) -> str:
+        if rolling_summary is not None:
+            # Summary of the earlier part of the conversation plus the transcript of the rest
+            tail = rolling_summary.get_tail(transcription.utterances)
+            lines = [f"{utterance.speaker}: {utterance.text}" for utterance in tail]
+            logger.info(f"Summarizing from rolling summary and {len(tail)} of {len(transcription.utterances)} utterances")
+            return f"Summary of the earlier part of the transcript:\n{rolling_summary.summary}\n\nTranscript of the remainder:\n" + await self._get_condensed_transcript(lines)
+
+        return "Transcript:\n" + await self._get_condensed_transcript([f"{utterance.speaker}: {utterance.text}" for utterance in transcription.utterances])
+
+    async def _get_condensed_transcript(self, lines: List[str]) -> str:
+        # Transcripts that do not fit in a single window are condensed to partial summaries first
+        transcript = "\n".join(lines)
+        if self._window_tokens is None:
+            return transcript
+        line_tokens = await self._count_line_tokens(lines)
+        if self._get_joined_tokens(line_tokens) <= self._window_tokens:
+            return transcript
+
+        # Summarize and short summarize run concurrently on the same transcript, so the condensed
+        # transcript is shared between them
+        key = hashlib.sha256(transcript.encode("utf-8")).hexdigest()
+        task = self._condensed_transcripts.get(key)
+        if task is None or (task.done() and task.exception() is not None):
+            task = asyncio.create_task(self._condense(lines, line_tokens))
+            self._condensed_transcripts[key] = task
+            while len(self._condensed_transcripts) > 4:
+                self._condensed_transcripts.popitem(last=False)
+        partial_summaries = await asyncio.shield(task)
+        return "(Summaries of consecutive parts, in order)\n\n" + "\n\n".join(partial_summaries)
+
+    async def _condense(self, lines: List[str], line_tokens: List[int]) -> List[str]:
+        """
+        Map-reduce: summarizes utterance-aligned windows of the transcript concurrently and, if the
+        partial summaries still do not fit in a single window, repeats the process on them.
+        """
+        level = 0
+        while True:
+            windows = self._split_into_windows(lines, line_tokens)
+            no_progress = level > 0 and len(windows) == len(lines)  # each partial summary alone fills a window; cannot reduce further
+            logger.info(f"Summarizing {len(lines)} {'utterances' if level == 0 else 'partial summaries'} in {len(windows)} windows")
+            partial_summaries = await asyncio.gather(*[ self._summarize_window(window=window, index=i, count=len(windows)) for i, window in enumerate(windows) ])
+            lines = [ f"Part {i + 1}:\n{summary}" for i, summary in enumerate(partial_summaries) ]
+            level += 1
+            if len(windows) == 1 or no_progress:
+                return lines
+            line_tokens = await self._count_line_tokens(lines)
+            if self._get_joined_tokens(line_tokens, separator_tokens=2) <= self._window_tokens:
+                return lines
+
+    async def _count_line_tokens(self, lines: List[str]) -> List[int]:
+        # Each line is tokenized once, and off the event loop, as transcripts of long captures take
+        # a while to tokenize. Token counts of joined lines are then approximated by summing.
+        return await asyncio.to_thread(lambda: [ self._llm_service.count_tokens(line) for line in lines ])
+
+    @staticmethod
+    def _get_joined_tokens(line_tokens: List[int], separator_tokens: int = 1) -> int:
+        return sum(line_tokens) + separator_tokens * max(0, len(line_tokens) - 1)
+
+    def _split_into_windows(self, lines: List[str], line_tokens: List[int]) -> List[List[str]]:
+        # Windows end at line (utterance) boundaries. A single line that exceeds the window size
+        # gets a window of its own.
+        windows = []
+        window = []
+        window_tokens = 0
+        for line, num_tokens in zip(lines, line_tokens):
+            if window and window_tokens + num_tokens > self._window_tokens:
+                windows.append(window)
+                window = []
+                window_tokens = 0
+            window.append(line)
+            window_tokens += num_tokens + 1
+        if window:
+            windows.append(window)
+        return windows
+
+    async def _summarize_window(self, window: List[str], index: int, count: int) -> str:
+        system_message = partial_summarization_system_message(config=self._config)
+        user_message = f"Part {index + 1} of {count}:\n" + "\n".join(window)
+        async with self._window_semaphore:
+            response = await self._llm_service.async_llm_completion(
+                messages=[
+                    {"content": system_message, "role": "system"},
+                    {"content": user_message, "role": "user"}
+                ]
+            )
+        return response.choices[0].message.content
+
+    @staticmethod
+    def _parse_structured_summary(content: str | None) -> StructuredSummary:
+        # Models sometimes wrap the object in a Markdown code block or add commentary around it, so
+        # only the outermost braces are parsed
+        content = content or ""
+        start = content.find("{")
+        end = content.rfind("}")
+        if start < 0 or end < start:
+            raise ValueError("Response does not contain a JSON object")
+        return StructuredSummary.model_validate(json.loads(content[start:end + 1]))  # JSONDecodeError is a ValueError
+
+    async def _summarize_separately(self, transcription: Transcription, include_search_query: bool, rolling_summary: RollingSummary | None) -> StructuredSummary:
+        async def summarize_and_query():
+            summary = await self.summarize(transcription, rolling_summary=rolling_summary)
+            search_query = await self.get_query_from_summary(summary) if include_search_query else None
+            return summary, search_query
+        (summary, search_query), short_summary = await asyncio.gather(summarize_and_query(), self.short_summarize(transcription, rolling_summary=rolling_summary))
+        return StructuredSummary.model_construct(summary=summary, short_summary=short_summary, search_query=search_query)
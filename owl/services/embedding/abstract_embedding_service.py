@@ -0,0 +1,13 @@
+from abc import ABC, abstractmethod
+from typing import List
+
+import numpy as np
+
+class AbstractEmbeddingService(ABC):
+
+    @abstractmethod
+    async def embed(self, texts: List[str]) -> np.ndarray:
+        """
+        Returns a (len(texts), dimensions) float32 array of unit-length embeddings.
+        """
+        pass
@@ -0,0 +1,24 @@
+from .abstract_embedding_service import AbstractEmbeddingService
+from ...core.config import EmbeddingConfiguration
+import logging
+
+logger = logging.getLogger(__name__)
+
+class EmbeddingServiceFactory:
+    _instances = {}
+
+    @staticmethod
+    def get_service(config: EmbeddingConfiguration) -> AbstractEmbeddingService:
+        key = (config.provider, config.model)
+        if key not in EmbeddingServiceFactory._instances:
+            logger.info(f"Creating new {config.provider} embedding service for model {config.model}")
+            if config.provider == "local":
+                from .local_embedding_service import LocalEmbeddingService
+                EmbeddingServiceFactory._instances[key] = LocalEmbeddingService(config)
+            elif config.provider == "litellm":
+                from .litellm_embedding_service import LiteLLMEmbeddingService
+                EmbeddingServiceFactory._instances[key] = LiteLLMEmbeddingService(config)
+            else:
+                raise ValueError(f"Unknown embedding service provider: {config.provider}")
+
+        return EmbeddingServiceFactory._instances[key]
@@ -0,0 +1,30 @@
+#
+# litellm_embedding_service.py
+#
+# Computes embeddings with any embedding model supported by litellm (e.g., Ollama or OpenAI).
+#
+
+from typing import List
+
+from litellm import aembedding
+import numpy as np
+
+from .abstract_embedding_service import AbstractEmbeddingService
+from ...core.config import EmbeddingConfiguration
+
+class LiteLLMEmbeddingService(AbstractEmbeddingService):
+    def __init__(self, config: EmbeddingConfiguration):
+        self._config = config
+
+    async def embed(self, texts: List[str]) -> np.ndarray:
+        embeddings = []
+        for i in range(0, len(texts), self._config.batch_size):
+            params = { "model": self._config.model, "input": texts[i:i + self._config.batch_size] }
+            if self._config.api_base_url:
+                params["api_base"] = self._config.api_base_url
+            if self._config.api_key:
+                params["api_key"] = self._config.api_key
+            response = await aembedding(**params)
+            embeddings += [ item["embedding"] for item in response.data ]
+        embeddings = np.array(embeddings, dtype=np.float32).reshape(len(texts), -1)
+        return embeddings / np.maximum(np.linalg.norm(embeddings, axis=1, keepdims=True), 1e-9)
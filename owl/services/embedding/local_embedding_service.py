@@ -0,0 +1,46 @@
+#
+# local_embedding_service.py
+#
+# Computes embeddings with a Hugging Face sentence embedding model (e.g., the sentence-transformers
+# MiniLM models) on the CPU. Embeddings are the mean of the token embeddings.
+#
+
+import asyncio
+import logging
+import threading
+from typing import List
+
+import numpy as np
+import torch
+from transformers import AutoModel, AutoTokenizer
+
+from .abstract_embedding_service import AbstractEmbeddingService
+from ...core.config import EmbeddingConfiguration
+
+logger = logging.getLogger(__name__)
+
+class LocalEmbeddingService(AbstractEmbeddingService):
+    def __init__(self, config: EmbeddingConfiguration):
+        self._config = config
+        self._tokenizer = None
+        self._model = None
+        self._lock = threading.Lock()   # model is loaded on first use and not used concurrently
+
+    async def embed(self, texts: List[str]) -> np.ndarray:
+        return await asyncio.to_thread(self._embed, texts)
+
+    def _embed(self, texts: List[str]) -> np.ndarray:
+        with self._lock:
+            if self._model is None:
+                logger.info(f"Loading embedding model: {self._config.model}")
+                self._tokenizer = AutoTokenizer.from_pretrained(self._config.model)
+                self._model = AutoModel.from_pretrained(self._config.model).eval()
+            embeddings = []
+            for i in range(0, len(texts), self._config.batch_size):
+                inputs = self._tokenizer(texts[i:i + self._config.batch_size], padding=True, truncation=True, return_tensors="pt")
+                with torch.no_grad():
+                    token_embeddings = self._model(**inputs).last_hidden_state
+                mask = inputs["attention_mask"].unsqueeze(-1).to(token_embeddings.dtype)
+                batch_embeddings = (token_embeddings * mask).sum(dim=1) / mask.sum(dim=1).clamp(min=1e-9)
+                embeddings.append(torch.nn.functional.normalize(batch_embeddings, dim=1).numpy())
+        return np.concatenate(embeddings).astype(np.float32)
@@ -0,0 +1,83 @@
+#
+# semantic_search_service.py
+#
+# Finds conversations by meaning. When a conversation completes, its summary and overlapping windows
+# of its transcript are embedded and added to an on-disk vector index. Queries are embedded with the
+# same model and matched against the index.
+#
+
+import asyncio
+import logging
+import time
+from typing import List
+
+from .embedding_service_factory import EmbeddingServiceFactory
+from .vector_index import VectorIndex, VectorIndexHit
+from ...core.config import EmbeddingConfiguration
+from ...models.schemas import Utterance
+
+logger = logging.getLogger(__name__)
+
+class SemanticSearchService:
+    def __init__(self, config: EmbeddingConfiguration):
+        self._config = config
+        self._embedding_service = EmbeddingServiceFactory.get_service(config)
+        self._index: VectorIndex | None = None
+        self._index_lock = asyncio.Lock()
+
+    async def index_conversation(self, conversation_id: int, summary: str | None, utterances: List[Utterance]):
+        """
+        Embeds and indexes a conversation, replacing anything previously indexed for it.
+        """
+        start_time = time.perf_counter()
+        entries = []
+        texts = []
+        if summary:
+            entries.append((-1, 0))
+            texts.append(summary)
+        for first, num in self._get_windows(num_utterances=len(utterances)):
+            text = "\n".join([ f"{utterance.speaker or 'Unknown'}: {utterance.text}" for utterance in utterances[first:first + num] if utterance.text ])
+            if text:
+                entries.append((first, num))
+                texts.append(text)
+        if not texts:
+            return
+        vectors = await self._embedding_service.embed(texts)
+        index = await self._get_index(dimensions=vectors.shape[1])
+        await asyncio.to_thread(index.add, conversation_id, entries, vectors)
+        logger.info(f"Indexed {len(texts)} embeddings for conversation_id={conversation_id} in {time.perf_counter() - start_time:.2f} seconds")
+
+    async def remove_conversation(self, conversation_id: int):
+        """
+        Removes a conversation from the index, so that its vectors cannot match a later
+        conversation that reuses its ID.
+        """
+        index = self._index
+        if index is None:
+            dimensions = await asyncio.to_thread(VectorIndex.get_existing_dimensions, self._config.index_dir, self._config.model)
+            if dimensions is None:
+                return  # nothing has been indexed with this model
+            index = await self._get_index(dimensions=dimensions)
+        await asyncio.to_thread(index.remove, conversation_id)
+
+    async def search(self, query: str, limit: int = 10) -> List[VectorIndexHit]:
+        vector = (await self._embedding_service.embed([ query ]))[0]
+        index = await self._get_index(dimensions=len(vector))
+        return await asyncio.to_thread(index.search, vector, limit)
+
+    async def _get_index(self, dimensions: int) -> VectorIndex:
+        # The index is opened once the embedding size is known
+        async with self._index_lock:
+            if self._index is None:
+                self._index = await asyncio.to_thread(VectorIndex, self._config.index_dir, dimensions, self._config.model)
+            return self._index
+
+    def _get_windows(self, num_utterances: int):
+        size = max(1, self._config.window_utterances)
+        stride = max(1, self._config.window_stride)
+        first = 0
+        while first < num_utterances:
+            yield first, min(size, num_utterances - first)
+            if first + size >= num_utterances:
+                break
+            first += stride
@@ -0,0 +1,173 @@
+#
+# vector_index.py
+#
+# Compact on-disk index of unit-length embedding vectors, searched by brute force (a single matrix-
+# vector product, which takes milliseconds for hundreds of thousands of vectors). Vectors and their
+# entries (which conversation and which utterances they embed) are stored in memory-mapped arrays
+# that grow by doubling, and the number of vectors in use is recorded in a small header file.
+#
+# Entries are never removed from the arrays. Re-indexing or removing a conversation marks its
+# entries deleted and they are skipped by searches.
+#
+
+from dataclasses import dataclass
+import json
+import logging
+import os
+import threading
+from typing import List, Tuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+
+_entry_dtype = np.dtype([ ("conversation_id", "<i8"), ("first_utterance", "<i4"), ("num_utterances", "<i4"), ("deleted", "u1") ])
+
+@dataclass
+class VectorIndexHit:
+    conversation_id: int
+    first_utterance: int    # -1 for the summary
+    num_utterances: int
+    score: float            # cosine similarity
+
+class VectorIndex:
+    def __init__(self, directory: str, dimensions: int, model: str, initial_capacity: int = 1024):
+        """
+        Opens the index in the given directory, creating it if it does not exist. An existing index
+        built with a different model is discarded.
+        """
+        self._directory = directory
+        self._header_filepath = os.path.join(directory, "index.json")
+        self._vectors_filepath = os.path.join(directory, "vectors.f32")
+        self._entries_filepath = os.path.join(directory, "entries.bin")
+        self._dimensions = dimensions
+        self._model = model
+        self._lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+
+        header = None
+        if os.path.exists(self._header_filepath):
+            with open(self._header_filepath, "r") as fp:
+                header = json.load(fp)
+            if header["dimensions"] != dimensions or header["model"] != model:
+                logger.warning(f"Discarding vector index built with model {header['model']} ({header['dimensions']} dimensions)")
+                header = None
+        if header is None:
+            self._count = 0
+            self._capacity = 0
+            self._resize(initial_capacity)
+            self._write_header()
+        else:
+            self._count = header["count"]
+            self._capacity = header["capacity"]
+            self._open()
+
+    @property
+    def count(self) -> int:
+        return self._count
+
+    @staticmethod
+    def get_existing_dimensions(directory: str, model: str) -> int | None:
+        """
+        Returns the dimensions of the index in the given directory if it exists and was built with
+        the given model, otherwise None.
+        """
+        header_filepath = os.path.join(directory, "index.json")
+        if not os.path.exists(header_filepath):
+            return None
+        with open(header_filepath, "r") as fp:
+            header = json.load(fp)
+        return header["dimensions"] if header["model"] == model else None
+
+    def add(self, conversation_id: int, entries: List[Tuple[int, int]], vectors: np.ndarray):
+        """
+        Replaces the entries of a conversation.
+
+        Parameters
+        ----------
+        conversation_id : int
+            Conversation the vectors belong to.
+
+        entries : List[Tuple[int, int]]
+            (first_utterance, num_utterances) embedded by each vector. Use (-1, 0) for the summary.
+
+        vectors : np.ndarray
+            Unit-length vectors, (len(entries), dimensions).
+        """
+        assert vectors.shape == (len(entries), self._dimensions)
+        with self._lock:
+            self._mark_deleted(conversation_id)
+            if self._count + len(entries) > self._capacity:
+                self._resize(max(2 * self._capacity, self._count + len(entries)))
+            end = self._count + len(entries)
+            self._vectors[self._count:end] = vectors
+            self._entries["conversation_id"][self._count:end] = conversation_id
+            self._entries["first_utterance"][self._count:end] = [ first for first, _ in entries ]
+            self._entries["num_utterances"][self._count:end] = [ num for _, num in entries ]
+            self._entries["deleted"][self._count:end] = 0
+            self._count = end
+            self._vectors.flush()
+            self._entries.flush()
+            self._write_header()
+
+    def remove(self, conversation_id: int):
+        with self._lock:
+            self._mark_deleted(conversation_id)
+            self._entries.flush()
+
+    def search(self, vector: np.ndarray, limit: int = 10) -> List[VectorIndexHit]:
+        """
+        Returns the best matching entry of each of the (up to) `limit` most similar conversations,
+        best first.
+        """
+        with self._lock:
+            if self._count == 0:
+                return []
+            scores = self._vectors[:self._count] @ vector.astype(np.float32)
+            entries = np.array(self._entries[:self._count])
+        scores[entries["deleted"] != 0] = -np.inf
+
+        # Conversations have several entries, so take enough candidates for `limit` distinct ones
+        # in most cases
+        num_candidates = min(len(scores), limit * 16)
+        candidates = np.argpartition(-scores, num_candidates - 1)[:num_candidates]
+        candidates = candidates[np.argsort(-scores[candidates])]
+        hits = []
+        seen_conversation_ids = set()
+        for i in candidates:
+            if not np.isfinite(scores[i]) or len(hits) == limit:
+                break
+            conversation_id = int(entries["conversation_id"][i])
+            if conversation_id in seen_conversation_ids:
+                continue
+            seen_conversation_ids.add(conversation_id)
+            hits.append(VectorIndexHit(conversation_id=conversation_id, first_utterance=int(entries["first_utterance"][i]), num_utterances=int(entries["num_utterances"][i]), score=float(scores[i])))
+        return hits
+
+    def _mark_deleted(self, conversation_id: int):
+        self._entries["deleted"][:self._count][self._entries["conversation_id"][:self._count] == conversation_id] = 1
+
+    def _open(self):
+        self._vectors = np.memmap(self._vectors_filepath, dtype=np.float32, mode="r+", shape=(self._capacity, self._dimensions))
+        self._entries = np.memmap(self._entries_filepath, dtype=_entry_dtype, mode="r+", shape=(self._capacity,))
+
+    def _resize(self, capacity: int):
+        # Files are extended (or created) and then re-mapped
+        if self._capacity > 0:
+            self._vectors.flush()
+            self._entries.flush()
+            del self._vectors
+            del self._entries
+        mode = "r+b" if self._capacity > 0 else "w+b"
+        for filepath, item_size in [ (self._vectors_filepath, 4 * self._dimensions), (self._entries_filepath, _entry_dtype.itemsize) ]:
+            with open(filepath, mode) as fp:
+                fp.truncate(capacity * item_size)
+        self._capacity = capacity
+        self._open()
+
+    def _write_header(self):
+        temp_filepath = self._header_filepath + ".tmp"
+        with open(temp_filepath, "w") as fp:
+            json.dump({ "dimensions": self._dimensions, "model": self._model, "count": self._count, "capacity": self._capacity }, fp)
+        os.replace(temp_filepath, self._header_filepath)
@@ -7,6 +7,7 @@
 # extraction.
 #
 
+import asyncio
 from dataclasses import dataclass
 from datetime import datetime, timedelta
 from io import BytesIO
@@ -20,7 +21,7 @@ from pydub import AudioSegment
 
 from .conversation_endpoint_detector import ConversationEndpointDetector, DetectedConversation
 from ....core.config import Configuration
-from ....core.utils import AsyncMultiprocessingQueue
+from ....core.utils import AsyncMultiprocessingQueue, get_process_memory_bytes
 
 
 logger = logging.getLogger(__name__)
@@ -114,10 +115,28 @@ class ConversationDetectionService:
         )
         self._process = Process(target=ConversationDetectionService._run, args=process_args)
         self._process.start()
+        self._closed = False
 
     def __del__(self):
-        self._request_queue.underlying_queue().put(TerminateProcessCommand())
-        self._process.join()
+        if not self._closed:
+            self._request_queue.underlying_queue().put(TerminateProcessCommand())
+            self._process.join()
+
+    async def close(self):
+        """
+        Terminates the subprocess. No other methods may be called afterwards.
+        """
+        if self._closed:
+            return
+        self._closed = True
+        await self._request_queue.put(TerminateProcessCommand())
+        await asyncio.to_thread(self._process.join)
+
+    def get_memory_bytes(self) -> int | None:
+        """
+        Returns the resident memory of the subprocess, which holds the detection state, if known.
+        """
+        return get_process_memory_bytes(pid=self._process.pid) if not self._closed else 0
 
     async def detect_conversations(self, audio_data: bytes | None, format: str, capture_finished: bool) -> ConversationDetectionResult:
         """
@@ -0,0 +1,107 @@
+#
+# llm_cache.py
+#
+# Persistent, content-addressed cache of LLM responses stored in a local SQLite database. Entries
+# are keyed by a hash of everything that determines the response (model, messages, and request
+# parameters) so that identical requests, such as those made when reprocessing a conversation, are
+# answered locally. Entries expire after a time-to-live and the least recently used entries are
+# evicted when the cache grows beyond a maximum size.
+#
+
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from typing import Any, Dict
+
+
+logger = logging.getLogger(__name__)
+
+class LLMCache:
+    def __init__(self, filepath: str, ttl_seconds: float | None = None, max_entries: int | None = None):
+        """
+        Parameters
+        ----------
+        filepath : str
+            SQLite database file. Created if it does not exist.
+
+        ttl_seconds : float | None
+            Entries older than this are ignored and eventually deleted. Never expire if None.
+
+        max_entries : int | None
+            Least recently used entries are evicted beyond this many. Unbounded if None.
+        """
+        self._ttl_seconds = ttl_seconds
+        self._max_entries = max_entries
+        self._lock = threading.Lock()
+        directory = os.path.dirname(filepath)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._connection = sqlite3.connect(filepath, check_same_thread=False)
+        with self._lock, self._connection:
+            self._connection.execute("""
+                CREATE TABLE IF NOT EXISTS llm_cache (
+                    key TEXT PRIMARY KEY,
+                    model TEXT,
+                    response TEXT NOT NULL,
+                    created_at REAL NOT NULL,
+                    last_accessed REAL NOT NULL
+                )
+            """)
+            self._connection.execute("CREATE INDEX IF NOT EXISTS llm_cache_last_accessed ON llm_cache (last_accessed)")
+
+    @staticmethod
+    def key(params: Dict[str, Any]) -> str:
+        """
+        Computes the cache key for a request.
+
+        Parameters
+        ----------
+        params : Dict[str, Any]
+            Request parameters, including model and messages. Credentials must not be included.
+
+        Returns
+        -------
+        str
+            SHA-256 hex digest of the canonically serialized parameters.
+        """
+        serialized = json.dumps(params, sort_keys=True, separators=(",", ":"), default=str)
+        return hashlib.sha256(serialized.encode("utf-8")).hexdigest()
+
+    def get(self, key: str) -> Dict[str, Any] | None:
+        now = time.time()
+        with self._lock, self._connection:
+            row = self._connection.execute("SELECT response, created_at FROM llm_cache WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                return None
+            response, created_at = row
+            if self._ttl_seconds is not None and now - created_at > self._ttl_seconds:
+                self._connection.execute("DELETE FROM llm_cache WHERE key = ?", (key,))
+                return None
+            self._connection.execute("UPDATE llm_cache SET last_accessed = ? WHERE key = ?", (now, key))
+        return json.loads(response)
+
+    def put(self, key: str, model: str, response: Dict[str, Any]):
+        now = time.time()
+        with self._lock, self._connection:
+            self._connection.execute(
+                "INSERT OR REPLACE INTO llm_cache (key, model, response, created_at, last_accessed) VALUES (?, ?, ?, ?, ?)",
+                (key, model, json.dumps(response, default=str), now, now)
+            )
+            self._evict(now=now)
+
+    def clear(self):
+        with self._lock, self._connection:
+            self._connection.execute("DELETE FROM llm_cache")
+
+    def _evict(self, now: float):
+        if self._ttl_seconds is not None:
+            self._connection.execute("DELETE FROM llm_cache WHERE created_at < ?", (now - self._ttl_seconds,))
+        if self._max_entries is not None:
+            self._connection.execute(
+                "DELETE FROM llm_cache WHERE key IN (SELECT key FROM llm_cache ORDER BY last_accessed DESC LIMIT -1 OFFSET ?)",
+                (self._max_entries,)
+            )
@@ -0,0 +1,195 @@
+#
+# llm_governor.py
+#
+# Bounds the number of concurrent requests made to each LLM. All LLMService instances share one
+# governor per model so that, e.g., several conversations being processed at once cannot overload
+# a single local model server. Requests beyond the limit wait in a priority queue: interactive
+# requests (processing of conversations that were just captured) are always admitted before
+# background requests (reprocessing), and requests of equal priority are admitted in order.
+#
+# Requests may come from different threads and event loops (e.g., command line tools that use
+# asyncio.run()), so the governor is synchronized with a thread lock and wakes waiters on their own
+# loops.
+#
+# Priority is normally taken from the llm_priority() context, which propagates to tasks created
+# within it, so that it does not have to be passed through every layer between the caller and the
+# LLM service.
+#
+
+import asyncio
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from enum import IntEnum
+import heapq
+import itertools
+import logging
+import threading
+import time
+from typing import Any, Dict, List
+
+
+logger = logging.getLogger(__name__)
+
+class LLMPriority(IntEnum):
+    INTERACTIVE = 0
+    BACKGROUND = 1
+
+_current_priority: ContextVar[LLMPriority] = ContextVar("llm_priority", default=LLMPriority.INTERACTIVE)
+
+@contextmanager
+def llm_priority(priority: LLMPriority):
+    """
+    Sets the priority of LLM requests made within this context, including from tasks it creates.
+    """
+    token = _current_priority.set(priority)
+    try:
+        yield
+    finally:
+        _current_priority.reset(token)
+
+def current_llm_priority() -> LLMPriority:
+    return _current_priority.get()
+
+@dataclass(order=True)
+class _Waiter:
+    priority: int
+    sequence: int
+    loop: asyncio.AbstractEventLoop = field(compare=False)
+    future: asyncio.Future = field(compare=False)
+    enqueued_at: float = field(compare=False)
+
+@dataclass
+class _PriorityStats:
+    requests: int = 0
+    total_wait_seconds: float = 0
+    max_wait_seconds: float = 0
+
+class LLMGovernor:
+    _governors: Dict[str, 'LLMGovernor'] = {}
+    _governors_lock = threading.Lock()
+
+    @classmethod
+    def for_model(cls, model: str, max_concurrent_requests: int) -> 'LLMGovernor':
+        """
+        Returns the governor shared by all users of a model, creating it if needed. The limit is
+        updated if it differs from that of the existing governor.
+        """
+        with cls._governors_lock:
+            governor = cls._governors.get(model)
+            if governor is None:
+                governor = LLMGovernor(model=model, max_concurrent_requests=max_concurrent_requests)
+                cls._governors[model] = governor
+            governor._max_concurrent_requests = max(1, max_concurrent_requests)
+            return governor
+
+    @classmethod
+    def all_stats(cls) -> List[Dict[str, Any]]:
+        with cls._governors_lock:
+            return [ governor.stats() for governor in cls._governors.values() ]
+
+    def __init__(self, model: str, max_concurrent_requests: int):
+        self._model = model
+        self._max_concurrent_requests = max(1, max_concurrent_requests)
+        self._active = 0
+        self._waiters: List[_Waiter] = []
+        self._sequence = itertools.count()
+        self._lock = threading.Lock()
+        self._stats = { priority: _PriorityStats() for priority in LLMPriority }
+
+    async def acquire(self, priority: LLMPriority | None = None):
+        """
+        Waits for a request slot. Must be followed by release(), which is best done by using
+        `async with governor.slot(...)` instead.
+
+        Parameters
+        ----------
+        priority : LLMPriority | None
+            Priority of the request. Defaults to that of the current llm_priority() context.
+        """
+        priority = current_llm_priority() if priority is None else priority
+        start_time = time.perf_counter()
+        with self._lock:
+            if self._active < self._max_concurrent_requests and not self._waiters:
+                self._active += 1
+                waiter = None
+            else:
+                loop = asyncio.get_running_loop()
+                waiter = _Waiter(priority=priority, sequence=next(self._sequence), loop=loop, future=loop.create_future(), enqueued_at=start_time)
+                heapq.heappush(self._waiters, waiter)
+
+        if waiter is not None:
+            try:
+                await waiter.future
+            except asyncio.CancelledError:
+                with self._lock:
+                    queued = waiter in self._waiters
+                    if queued:
+                        self._waiters.remove(waiter)
+                        heapq.heapify(self._waiters)
+                if not queued and not waiter.future.cancelled():
+                    # Slot was handed over just before we were cancelled, pass it on. (If the future
+                    # was cancelled first, _grant() passes it on.)
+                    self._release()
+                raise
+
+        wait_seconds = time.perf_counter() - start_time
+        with self._lock:
+            stats = self._stats[priority]
+            stats.requests += 1
+            stats.total_wait_seconds += wait_seconds
+            stats.max_wait_seconds = max(stats.max_wait_seconds, wait_seconds)
+        if wait_seconds >= 1:
+            logger.info(f"LLM request for {self._model} ({priority.name.lower()}) waited {wait_seconds:.2f} seconds for a slot")
+
+    def release(self):
+        self._release()
+
+    def slot(self, priority: LLMPriority | None = None) -> '_Slot':
+        return _Slot(governor=self, priority=priority)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "model": self._model,
+                "max_concurrent_requests": self._max_concurrent_requests,
+                "active_requests": self._active,
+                "queued_requests": { priority.name.lower(): sum(1 for waiter in self._waiters if waiter.priority == priority) for priority in LLMPriority },
+                "wait": {
+                    priority.name.lower(): {
+                        "requests": stats.requests,
+                        "mean_wait_seconds": stats.total_wait_seconds / stats.requests if stats.requests else 0,
+                        "max_wait_seconds": stats.max_wait_seconds
+                    } for priority, stats in self._stats.items()
+                }
+            }
+
+    def _release(self):
+        with self._lock:
+            while self._waiters and self._active <= self._max_concurrent_requests:
+                waiter = heapq.heappop(self._waiters)
+                if waiter.future.cancelled():
+                    continue
+                # Slot passes directly to the waiter (active count unchanged)
+                waiter.loop.call_soon_threadsafe(self._grant, waiter)
+                return
+            self._active -= 1
+
+    def _grant(self, waiter: _Waiter):
+        if waiter.future.done():
+            # Cancelled after being selected
+            self._release()
+        else:
+            waiter.future.set_result(None)
+
+class _Slot:
+    def __init__(self, governor: LLMGovernor, priority: LLMPriority | None):
+        self._governor = governor
+        self._priority = priority
+
+    async def __aenter__(self):
+        await self._governor.acquire(priority=self._priority)
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        self._governor.release()
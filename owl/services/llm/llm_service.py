@@ -3,16 +3,29 @@
 #
 # LLM class: LLM abstraction layer. Performs LLM requests using a particular local or remote model.
 #
-from litellm import completion, acompletion
+import asyncio
+from typing import AsyncIterator
+from litellm import completion, acompletion, token_counter, ModelResponse
+from litellm.exceptions import APIConnectionError, RateLimitError, ServiceUnavailableError, Timeout
 from ...core.config import LLMConfiguration
+from .llm_cache import LLMCache
+from .llm_governor import LLMGovernor, LLMPriority
 import logging
 
 logger = logging.getLogger(__name__)
 
+# Transient failures worth retrying
+_retryable_exceptions = (asyncio.TimeoutError, APIConnectionError, RateLimitError, ServiceUnavailableError, Timeout)
+
 class LLMService:
     def __init__(self, config: LLMConfiguration):
         self._config = config
         self._model = config.model
+        self._cache = LLMCache(filepath=config.cache_filepath, ttl_seconds=config.cache_ttl_seconds, max_entries=config.cache_max_entries) if config.cache_filepath else None
+        self._governor = LLMGovernor.for_model(
+            model=config.model,
+            max_concurrent_requests=config.max_concurrent_requests_by_model.get(config.model, config.max_concurrent_requests)
+        )
 
     def llm_completion(self, messages, stream=False):
         logger.info(f"LLM completion request for model {self._model}...")
@@ -24,22 +37,133 @@ class LLMService:
 
         if self._config.api_base_url:
             llm_params["api_base"] = self._config.api_base_url
+
+        # Streamed responses are not cached
+        cache_key = self._cache.key(llm_params) if self._cache and not stream else None
+        if cache_key:
+            cached_response = self._cache.get(cache_key)
+            if cached_response is not None:
+                logger.info(f"LLM response found in cache: {cache_key}")
+                return ModelResponse(**cached_response)
+
         if self._config.api_key:
             llm_params["api_key"] = self._config.api_key
 
-        return completion(**llm_params)
+        response = completion(**llm_params)
+        if cache_key:
+            self._cache.put(cache_key, model=self._model, response=self._serialize_response(response))
+        return response
 
-    async def async_llm_completion(self, messages):
+    async def async_llm_completion(self, messages, response_format=None, priority: LLMPriority | None = None):
         logger.info(f"LLM completion request for model {self._model}...")
         llm_params = {
             "model": self._model,
             "messages": messages
         }
 
+        if response_format:
+            # e.g., { "type": "json_object" }. Dropped for providers that do not support it, in
+            # which case the prompt alone must ask for the format.
+            llm_params["response_format"] = response_format
+            llm_params["drop_params"] = True
+
         if self._config.api_base_url:
             llm_params["api_base"] = self._config.api_base_url
+
+        # Cache key must be computed before credentials are added
+        cache_key = self._cache.key(llm_params) if self._cache else None
+        if cache_key:
+            cached_response = await asyncio.to_thread(self._cache.get, cache_key)
+            if cached_response is not None:
+                logger.info(f"LLM response found in cache: {cache_key}")
+                return ModelResponse(**cached_response)
+
         if self._config.api_key:
             llm_params["api_key"] = self._config.api_key
 
-        return await acompletion(**llm_params)
+        async with self._governor.slot(priority=priority):
+            response = await self._with_retries(lambda: acompletion(**llm_params))
+        if cache_key:
+            await asyncio.to_thread(self._cache.put, cache_key, self._model, self._serialize_response(response))
+        return response
+
+    async def async_llm_completion_stream(self, messages, priority: LLMPriority | None = None) -> AsyncIterator[str]:
+        """
+        Streams a completion.
+
+        Parameters
+        ----------
+        messages : List[Dict[str, str]]
+            Messages in the usual format.
+
+        Returns
+        -------
+        AsyncIterator[str]
+            Content deltas, in order, as they are generated. A cached response is produced as a
+            single delta. Complete responses are added to the cache.
+        """
+        logger.info(f"LLM streaming completion request for model {self._model}...")
+        llm_params = {
+            "model": self._model,
+            "messages": messages
+        }
+
+        if self._config.api_base_url:
+            llm_params["api_base"] = self._config.api_base_url
+
+        # Keyed identically to non-streamed requests, so either may be answered from the cache
+        cache_key = self._cache.key(llm_params) if self._cache else None
+        if cache_key:
+            cached_response = await asyncio.to_thread(self._cache.get, cache_key)
+            if cached_response is not None:
+                logger.info(f"LLM response found in cache: {cache_key}")
+                yield ModelResponse(**cached_response).choices[0].message.content
+                return
+
+        if self._config.api_key:
+            llm_params["api_key"] = self._config.api_key
+
+        # The request slot is held for the duration of the stream. Only starting the stream is
+        # retried, because deltas that have been produced cannot be taken back.
+        content = []
+        async with self._governor.slot(priority=priority):
+            stream = await self._with_retries(lambda: acompletion(**llm_params, stream=True))
+            async for chunk in stream:
+                delta = chunk.choices[0].delta.content
+                if delta:
+                    content.append(delta)
+                    yield delta
+
+        if cache_key:
+            response = {
+                "model": self._model,
+                "choices": [ { "index": 0, "finish_reason": "stop", "message": { "role": "assistant", "content": "".join(content) } } ]
+            }
+            await asyncio.to_thread(self._cache.put, cache_key, self._model, response)
+
+    def governor_stats(self):
+        return self._governor.stats()
+
+    async def _with_retries(self, request):
+        # Retries transient failures (including timeouts) with exponential backoff
+        attempt = 0
+        while True:
+            try:
+                return await asyncio.wait_for(request(), timeout=self._config.request_timeout_seconds)
+            except _retryable_exceptions as e:
+                if attempt >= self._config.max_retries:
+                    raise
+                delay = self._config.retry_backoff_seconds * (2 ** attempt)
+                attempt += 1
+                logger.warning(f"LLM request for model {self._model} failed ({type(e).__name__}: {e}), retrying in {delay:.1f} seconds (attempt {attempt} of {self._config.max_retries})")
+                await asyncio.sleep(delay)
+
+    def count_tokens(self, text: str) -> int:
+        """
+        Counts tokens in text using the model's tokenizer, if known, otherwise an approximation.
+        """
+        return token_counter(model=self._model, text=text)
 
+    @staticmethod
+    def _serialize_response(response: ModelResponse):
+        return response.model_dump() if hasattr(response, "model_dump") else response.json()
@@ -0,0 +1,99 @@
+#
+# conversation_delta_tracker.py
+#
+# Computes compact conversation change notifications ("deltas") for clients. For each conversation,
+# a fingerprint of every top-level field of the last notified state is kept, along with a version
+# number that is incremented with each delta. A delta carries only the fields that changed since.
+#
+# Client protocol (conversation_delta event, sent only to clients that subscribe with
+# "deltas": true, which then no longer receive entire conversations):
+#
+#   { "id": 1, "conversation_uuid": "...", "epoch": "...", "version": 3, "complete": false,
+#     "changes": { "state": "COMPLETED", "summary": "..." }, "stale": [ "transcriptions" ] }
+#
+#   - If complete is true, changes contains every field and replaces the client's copy.
+#   - Otherwise, the delta applies only on top of the previous version of the same epoch. A client
+#     that missed a version (or does not have the conversation) must fetch it with
+#     GET /conversations/{id}.
+#   - Fields listed in stale changed but were too large to include. Clients that need them fetch
+#     them on demand (e.g., GET /conversations/{id}/transcript).
+#
+# Versions are not persisted. The epoch identifies the server process that numbered them, and the
+# first delta of each conversation after a restart is complete (unless it has stale fields). With
+# several workers, a single one numbers all deltas (see NotificationService), and its epoch changes
+# when another takes over.
+#
+
+from collections import OrderedDict
+from dataclasses import dataclass, field
+import hashlib
+import json
+from typing import Any, Dict, List
+import uuid
+
+@dataclass
+class _TrackedConversation:
+    version: int = 0
+    fingerprints: Dict[str, str] = field(default_factory=dict)
+
+class ConversationDeltaTracker:
+    def __init__(self, max_field_bytes: int = 4096, max_conversations: int = 1000):
+        """
+        Parameters
+        ----------
+        max_field_bytes : int
+            Changed fields larger than this (serialized) are listed as stale rather than included.
+
+        max_conversations : int
+            Number of conversations tracked. Deltas of conversations that are no longer tracked are
+            complete.
+        """
+        self._max_field_bytes = max_field_bytes
+        self._max_conversations = max_conversations
+        self._conversations: OrderedDict[int, _TrackedConversation] = OrderedDict()
+        self._epoch = uuid.uuid4().hex[:8]
+
+    def get_delta(self, conversation_json: str) -> Dict[str, Any] | None:
+        """
+        Records the conversation's new state and returns the delta from the previous one, or None if
+        nothing changed.
+        """
+        conversation = json.loads(conversation_json)
+        conversation_id = conversation["id"]
+        serialized_fields = { name: json.dumps(value, sort_keys=True, separators=(",", ":")) for name, value in conversation.items() }
+        fingerprints = { name: hashlib.sha1(serialized.encode("utf-8")).hexdigest() for name, serialized in serialized_fields.items() }
+
+        tracked = self._conversations.pop(conversation_id, None)
+        complete = tracked is None
+        if complete:
+            tracked = _TrackedConversation()
+            changed_fields = list(conversation.keys())
+        else:
+            changed_fields = [ name for name, fingerprint in fingerprints.items() if tracked.fingerprints.get(name) != fingerprint ]
+        self._conversations[conversation_id] = tracked
+        while len(self._conversations) > self._max_conversations:
+            self._conversations.popitem(last=False)
+        if not changed_fields:
+            return None
+
+        changes = {}
+        stale: List[str] = []
+        for name in changed_fields:
+            if len(serialized_fields[name]) > self._max_field_bytes:
+                stale.append(name)
+            else:
+                changes[name] = conversation[name]
+        tracked.version += 1
+        tracked.fingerprints = fingerprints
+        return {
+            "id": conversation_id,
+            "conversation_uuid": conversation["conversation_uuid"],
+            "epoch": self._epoch,
+            "version": tracked.version,
+            "complete": complete and not stale,
+            "changes": changes,
+            "stale": stale
+        }
+
+    def forget(self, conversation_id: int):
+        self._conversations.pop(conversation_id, None)
@@ -1,18 +1,104 @@
+from __future__ import annotations
 from litellm import completion, acompletion
+from ...broker import AbstractBroker
 from ...core.config import NotificationConfiguration
+from .conversation_delta_tracker import ConversationDeltaTracker
+import json
 import logging
 
 logger = logging.getLogger(__name__)
 
+class ConversationNotificationTask:
+    """
+    Sends a conversation notification ("send") or forgets a conversation ("forget") on the worker
+    that numbers conversation deltas. Runs as a server task (see owl/server/task.py).
+    """
+
+    run_immediately = True  # not held up by conversation processing on that worker
+
+    def __init__(self, action: str, args: tuple):
+        assert action == "send" or action == "forget"
+        self.action = action
+        self.args = args
+
+    async def run(self, app_state):
+        if self.action == "send":
+            await app_state.notification_service._send_conversation_notification(*self.args)
+        else:
+            app_state.notification_service._forget_conversation(*self.args)
+
 class NotificationService:
-    def __init__(self, config: NotificationConfiguration):
+    # Conversation deltas must be numbered by a single worker, which owns this broker key. Other
+    # workers forward conversation notifications to it.
+    DELTA_OWNER_KEY = "conversation_deltas"
+
+    def __init__(self, config: NotificationConfiguration, broker: AbstractBroker | None = None):
         self._config = config
+        self._broker = broker
+        self._delta_tracker = ConversationDeltaTracker(max_field_bytes=config.delta_max_field_bytes)
         self.socket_app = None
 
-    async def send_notification(self, title, body, type, payload=None):
+    async def send_notification(self, title, body, type, payload=None, **routing):
         logger.info(f"Sending notification: {title} {body} {type} {payload}")
         if self.socket_app:
-            await self.socket_app.emit_message(type, payload)
+            await self.socket_app.emit_message(type, payload, **routing)
+
+    async def send_conversation_notification(self, title, body, type, conversation_json: str):
+        """
+        Notifies clients of a new or updated conversation: those that opted into deltas with a
+        conversation_delta event (see ConversationDeltaTracker), and all others with the entire
+        conversation as event `type`. Sent by the worker that numbers deltas.
+        """
+        if not await self._forward_to_delta_owner(ConversationNotificationTask("send", (title, body, type, conversation_json))):
+            await self._send_conversation_notification(title, body, type, conversation_json)
+
+    async def forget_conversation(self, conversation_id: int):
+        if not await self._forward_to_delta_owner(ConversationNotificationTask("forget", (conversation_id,))):
+            self._forget_conversation(conversation_id)
+
+    async def _send_conversation_notification(self, title, body, type, conversation_json: str):
+        logger.info(f"Sending conversation notification: {title} {body} {type}")
+        delta = self._delta_tracker.get_delta(conversation_json)
+        if not self.socket_app:
+            return
+        routing = self.get_conversation_routing(conversation_json)
+        if delta is not None:
+            await self.socket_app.emit_message("conversation_delta", delta, deltas=True, **routing)
+        await self.socket_app.emit_message(type, conversation_json, deltas=False, **routing)
+
+    def _forget_conversation(self, conversation_id: int):
+        self._delta_tracker.forget(conversation_id)
+
+    async def _forward_to_delta_owner(self, task: ConversationNotificationTask) -> bool:
+        """
+        Dispatches a task to the worker that numbers deltas, if not this one (in which case it
+        returns False).
+        """
+        if self._broker is None:
+            return False
+        owner = await self._broker.claim(NotificationService.DELTA_OWNER_KEY)
+        if owner == self._broker.worker_id:
+            return False
+        await self._broker.put_task(task, affinity_key=NotificationService.DELTA_OWNER_KEY)
+        return True
+
+    async def emit_message(self, type: str, payload=None, capture_uuid: str | None = None, conversation_uuid: str | None = None, device_type: str | None = None):
+        """
+        Sends a message to clients subscribed to the given capture, conversation, or device (and to
+        clients subscribed to everything).
+        """
+        if self.socket_app:
+            await self.socket_app.emit_message(type, payload, capture_uuid=capture_uuid, conversation_uuid=conversation_uuid, device_type=device_type)
 
-    async def emit_message(self, type: str, payload=None):
-        await self.socket_app.emit_message(type, payload)
\ No newline at end of file
+    @staticmethod
+    def get_conversation_routing(conversation_json: str):
+        """
+        Returns the emit_message() routing arguments of a conversation serialized as ConversationRead.
+        """
+        conversation = json.loads(conversation_json)
+        source_capture = (conversation.get("capture_segment_file") or {}).get("source_capture") or {}
+        return {
+            "capture_uuid": source_capture.get("capture_uuid"),
+            "conversation_uuid": conversation.get("conversation_uuid"),
+            "device_type": conversation.get("device_type") or source_capture.get("device_type")
+        }
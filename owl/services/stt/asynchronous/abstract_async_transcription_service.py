@@ -1,9 +1,22 @@
 from abc import ABC, abstractmethod
+from typing import Optional
+from pydantic import BaseModel
 from ....models.schemas import Transcription
 
+class TranscriptionStages(BaseModel):
+    """
+    Per-request control of optional transcription stages. A value of None lets the provider decide
+    whether to run the stage (e.g., using cheap heuristics such as audio duration) and True or False
+    forces it on or off.
+    """
+    align: Optional[bool] = None
+    diarize: Optional[bool] = None
+    verify: Optional[bool] = None
+    max_speakers: Optional[int] = None  # hint: diarization is skipped automatically when this is 1
+
 class AbstractAsyncTranscriptionService(ABC):
-    
+
     @abstractmethod
-    async def transcribe_audio(self, main_audio_filepath, voice_sample_filepath=None, speaker_name=None) -> Transcription:
+    async def transcribe_audio(self, main_audio_filepath, voice_sample_filepath=None, speaker_name=None, stages: TranscriptionStages | None = None) -> Transcription:
         pass
 
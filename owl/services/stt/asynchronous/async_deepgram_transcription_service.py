@@ -6,7 +6,7 @@ from deepgram import (
 import httpx
 import logging
 
-from .abstract_async_transcription_service import AbstractAsyncTranscriptionService
+from .abstract_async_transcription_service import AbstractAsyncTranscriptionService, TranscriptionStages
 from ....models.schemas import Transcription, Utterance, Word
 
 logger = logging.getLogger(__name__)
@@ -16,15 +16,16 @@ class AsyncDeepgramTranscriptionService(AbstractAsyncTranscriptionService):
         self._config = config
         self._deepgram_client = DeepgramClient(api_key=config.api_key)
 
-    async def transcribe_audio(self, main_audio_filepath, voice_sample_filepath=None, speaker_name=None) -> Transcription:
+    async def transcribe_audio(self, main_audio_filepath, voice_sample_filepath=None, speaker_name=None, stages: TranscriptionStages | None = None) -> Transcription:
         with open(main_audio_filepath, 'rb') as audio:
             audio_data = audio.read()
-        logger.info(f"Transcribing audio file: {main_audio_filepath}")    
-        response = await self._transcribe_with_deepgram(audio_data)
+        logger.info(f"Transcribing audio file: {main_audio_filepath}")
+        diarize = stages is None or (stages.diarize is not False and stages.max_speakers != 1)
+        response = await self._transcribe_with_deepgram(audio_data, diarize=diarize)
 
         return self._convert_to_transcription_model(response, main_audio_filepath)
 
-    async def _transcribe_with_deepgram(self, audio: bytes) -> dict:
+    async def _transcribe_with_deepgram(self, audio: bytes, diarize: bool = True) -> dict:
         payload: FileSource = {
             "buffer": audio,
         }
@@ -34,7 +35,7 @@ class AsyncDeepgramTranscriptionService(AbstractAsyncTranscriptionService):
             smart_format=True,
             utterances=True,
             punctuate=True,
-            diarize=True,
+            diarize=diarize,
         )
 
         # Default timeout of 10 seconds to connect, 10 minutes for upload/download. We can also try
@@ -1,18 +1,28 @@
 from fastapi import FastAPI, HTTPException
 import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from enum import Enum
+import threading
+import time
 import uvicorn
-from typing import Optional, List
-import av
-from pydub import AudioSegment
+from typing import Optional, List, Dict
+import numpy as np
+import torch
 import whisperx
+from faster_whisper import WhisperModel
 from speechbrain.pretrained import SpeakerRecognition
 import logging
 import os
 from multiprocessing import Process
-from tempfile import NamedTemporaryFile
 from pydantic import BaseModel
 from typing import Optional
-from .....core.config import AsyncWhisperConfiguration
+from .....core.config import Configuration, AsyncWhisperConfiguration, VADConfiguration
+from ....vad.vad import VoiceActivityDetector
+from ....vad.time_segment import TimeSegment
+from ..abstract_async_transcription_service import TranscriptionStages
+from .model_registry import ModelRegistry
+from .....files.audio_file import DecodedAudioCache
 
 # Whisper server models
 class WhisperWord(BaseModel):
@@ -33,27 +43,98 @@ class TranscriptionRequest(BaseModel):
     main_audio_file_path: str
     speaker_name: Optional[str] = None
     voice_sample_filepath: Optional[str] = None
+    stages: TranscriptionStages = TranscriptionStages()
+
+class WarmupRequest(BaseModel):
+    models: List[str] = []  # all models if empty
 
 class TranscriptionResponse(BaseModel):
     utterances: List[WhisperUtterance] = []
+    stage_timings: Dict[str, float] = {}    # seconds spent in each stage that ran
+    skipped_stages: Dict[str, str] = {}     # reason each skipped stage was skipped
 
 logger = logging.getLogger(__name__)
 
+class TranscriptionStage(Enum):
+    """
+    Transcription pipeline stages, in execution order.
+    """
+    TRANSCRIBE = "transcribe"
+    ALIGN = "align"
+    DIARIZE = "diarize"
+    VERIFY = "verify"
+
+@dataclass
+class TranscriptionContext:
+    """
+    State threaded through the transcription stages for a single request.
+    """
+    audio: np.ndarray
+    duration: float
+    main_audio_filepath: str
+    voice_sample_filepath: str | None = None
+    speaker_name: str | None = None
+    max_speakers: int | None = None
+    speech_segments: List[TimeSegment] | None = None
+    segments: List[dict] = field(default_factory=list)
+    aligned: bool = False
+    will_align: bool = True
+    will_diarize: bool = True
+    pending_diarization: asyncio.Future | None = None
+    stage_timings: Dict[str, float] = field(default_factory=dict)
+    skipped_stages: Dict[str, str] = field(default_factory=dict)
+
 class AsyncWhisperTranscriptionServer:
-    def __init__(self, config: AsyncWhisperConfiguration):
+    def __init__(self, config: AsyncWhisperConfiguration, vad_config: VADConfiguration | None = None):
         self._config = config
         self.app = FastAPI()
-        self._transcription_model, self._diarize_model, self._verification_model, self._alignment_model, self._alignment_metadata = self._load_models()
+        self._models = self._register_models()
+
+        # VAD is used by the stage skip heuristics and to split long-form audio
+        self._vad = None
+        if vad_config is not None:
+            self._vad = VoiceActivityDetector(config=Configuration.model_construct(vad=vad_config))
+            self._vad_lock = threading.Lock()   # VAD is stateful and may be shared by concurrent requests
+
+        # Long-form mode: audio is split on silences and pieces are transcribed by a pool of
+        # workers. Each worker thread gets its own whisperx pipeline wrapping a single shared
+        # CTranslate2 model, which is capable of running num_workers transcriptions concurrently.
+        self._long_form_enabled = config.long_form_min_duration_seconds is not None and self._vad is not None
+        if config.long_form_min_duration_seconds is not None and self._vad is None:
+            logger.warning("Long-form transcription requires VAD configuration and will be disabled")
+        if self._long_form_enabled:
+            self._worker_state = threading.local()
+
+        # Voice samples are the same for every request, so their decoded waveforms are cached
+        self._voice_sample_cache = DecodedAudioCache()
+        self._executor = ThreadPoolExecutor(max_workers=self._config.long_form_workers + 1)   # extra worker so diarization overlaps transcription
+
+        self._stage_handlers = {
+            TranscriptionStage.TRANSCRIBE: self._run_transcribe_stage,
+            TranscriptionStage.ALIGN: self._run_align_stage,
+            TranscriptionStage.DIARIZE: self._run_diarize_stage,
+            TranscriptionStage.VERIFY: self._run_verify_stage
+        }
         self._setup_routes()
 
-    def _load_models(self):
+    def _register_models(self) -> ModelRegistry:
+        """
+        Registers model loaders. Only the primary transcription model is loaded up front, so that
+        the server can serve transcriptions as soon as possible. The remaining models are loaded on
+        first use or when warmed up and may be evicted when idle or to stay within the memory
+        budget.
+        """
         logger.info(f"Transcription model: {self._config.model} | Device: {self._config.device} | Compute type: {self._config.compute_type} | Batch size: {self._config.batch_size} | Verification model source: {self._config.verification_model_source} | Verification model savedir: {self._config.verification_model_savedir} | Verification threshold: {self._config.verification_threshold} | HF token: {self._config.hf_token}")
-        transcription_model = whisperx.load_model(self._config.model, self._config.device, compute_type=self._config.compute_type)
-
-        diarize_model = whisperx.DiarizationPipeline(model_name='pyannote/speaker-diarization@2.1', use_auth_token=self._config.hf_token, device=self._config.device)
-        verification_model = SpeakerRecognition.from_hparams(source=self._config.verification_model_source, savedir=self._config.verification_model_savedir, run_opts={"device": self._config.device})
-        alignment_model, alignment_metadata = whisperx.load_align_model(language_code="en", device=self._config.device)
-        return transcription_model, diarize_model, verification_model, alignment_model, alignment_metadata
+        memory_budget_bytes = int(self._config.model_memory_budget_mb * 1024 * 1024) if self._config.model_memory_budget_mb is not None else None
+        models = ModelRegistry(device=self._config.device, memory_budget_bytes=memory_budget_bytes, idle_timeout_seconds=self._config.model_idle_timeout_seconds)
+        models.register(name="transcription", evictable=False, loader=lambda: whisperx.load_model(self._config.model, self._config.device, compute_type=self._config.compute_type))
+        models.register(name="alignment", loader=lambda: whisperx.load_align_model(language_code="en", device=self._config.device))
+        models.register(name="diarization", loader=lambda: whisperx.DiarizationPipeline(model_name='pyannote/speaker-diarization@2.1', use_auth_token=self._config.hf_token, device=self._config.device))
+        models.register(name="verification", loader=lambda: SpeakerRecognition.from_hparams(source=self._config.verification_model_source, savedir=self._config.verification_model_savedir, run_opts={"device": self._config.device}))
+        if self._config.long_form_min_duration_seconds is not None:
+            models.register(name="long_form_transcription", loader=lambda: WhisperModel(self._config.model, device=self._config.device, compute_type=self._config.compute_type, num_workers=self._config.long_form_workers))
+        models.get("transcription")
+        return models
 
     def _setup_routes(self):
         # Main endpoint takes a file path and returns a transcription response
@@ -68,58 +149,83 @@ class AsyncWhisperTranscriptionServer:
         @self.app.post("/transcribe/", response_model=TranscriptionResponse)
         async def transcribe(request: TranscriptionRequest):
             try:
-                transcription_result = await self._transcribe_audio(request.main_audio_file_path, request.voice_sample_filepath, request.speaker_name)
+                transcription_result = await self._transcribe_audio(request.main_audio_file_path, request.voice_sample_filepath, request.speaker_name, request.stages)
                 return transcription_result
             except Exception as e:
                 raise HTTPException(status_code=500, detail=str(e))
 
-    async def _transcribe_audio(self, main_audio_filepath, voice_sample_filepath=None, speaker_name=None):
+        # Loads models ahead of time so that the first request using them does not pay for loading.
+        #
+        # Example usage:
+        # curl -X POST http://127.0.0.1:8010/warmup/ \
+        #      -H "Content-Type: application/json" \
+        #      -d '{ "models": [ "alignment", "diarization" ] }'
+
+        @self.app.post("/warmup/")
+        async def warmup(request: WarmupRequest):
+            names = request.models if len(request.models) > 0 else self._models.names()
+            unknown_names = [ name for name in names if name not in self._models.names() ]
+            if len(unknown_names) > 0:
+                raise HTTPException(status_code=400, detail=f"Unknown models: {unknown_names}")
+            await self._warm_up(names)
+            return { "models": self._models.stats() }
+
+        @self.app.get("/health/")
+        async def health():
+            return { "ready": self._models.is_loaded("transcription"), "models": self._models.stats() }
+
+        @self.app.on_event("startup")
+        async def startup_event():
+            if len(self._config.preload_models) > 0:
+                asyncio.create_task(self._warm_up(self._config.preload_models))
+            if self._config.model_idle_timeout_seconds is not None:
+                asyncio.create_task(self._evict_idle_models())
+
+    async def _warm_up(self, names: List[str]):
+        loop = asyncio.get_running_loop()
+        for name in names:
+            await loop.run_in_executor(self._executor, self._models.get, name)
+
+    async def _evict_idle_models(self):
+        loop = asyncio.get_running_loop()
+        interval = min(60, self._config.model_idle_timeout_seconds)
+        while True:
+            await asyncio.sleep(interval)
+            await loop.run_in_executor(self._executor, self._models.evict_idle)
+
+    async def _transcribe_audio(self, main_audio_filepath, voice_sample_filepath=None, speaker_name=None, stages: TranscriptionStages | None = None):
         if not os.path.exists(main_audio_filepath):
             raise FileNotFoundError("Main audio file not found")
+        if voice_sample_filepath and not os.path.exists(voice_sample_filepath):
+            raise FileNotFoundError("Voice sample file not found")
         logger.info(f"Transcribing audio file: {main_audio_filepath}")
 
-        # Transcription
         audio = whisperx.load_audio(main_audio_filepath)
-        result = self._transcription_model.transcribe(audio, batch_size=self._config.batch_size)
-        initial_transcription = result["segments"]
-        logger.info(f"Initial transcription complete. Total segments: {len(initial_transcription)}")
+        context = TranscriptionContext(
+            audio=audio,
+            duration=len(audio) / whisperx.audio.SAMPLE_RATE,
+            main_audio_filepath=main_audio_filepath,
+            voice_sample_filepath=voice_sample_filepath,
+            speaker_name=speaker_name
+        )
+        plan = await self._plan_stages(context=context, stages=stages if stages is not None else TranscriptionStages())
 
-        # Align whisper output
-        result = whisperx.align(initial_transcription, self._alignment_model, self._alignment_metadata, audio, device=self._config.device, return_char_alignments=False)
-        logger.info(f"Transcription alignment complete.")
+        # Run the stage graph: transcribe -> align -> diarize -> verify. Each stage depends only on
+        # the ones before it, so stages are simply executed in order.
+        for stage in TranscriptionStage:
+            skip_reason = plan[stage]
+            if skip_reason is not None:
+                logger.info(f"Skipping {stage.value} stage: {skip_reason}")
+                context.skipped_stages[stage.value] = skip_reason
+                continue
+            start_time = time.time()
+            await self._stage_handlers[stage](context)
+            context.stage_timings.setdefault(stage.value, time.time() - start_time)
+            logger.info(f"Stage {stage.value} complete in {context.stage_timings[stage.value]:.2f} seconds")
+        logger.info(f"Transcription complete. Total segments: {len(context.segments)}")
 
-        # Speaker diarization
-        try:
-            diarize_segments = self._diarize_model(audio)
-            logger.info(f"Speaker diarization complete. Total segments: {len(diarize_segments)}")
-            result = whisperx.assign_word_speakers(diarize_segments, result)
-        except Exception as e:
-            logger.info(f"Error occurred during assigning word speakers: {str(e)}")
-        logger.info(f"Speaker assignment complete.")
-        final_transcription_data = result["segments"]
-        logger.info(f"Transcription complete. Total segments: {len(final_transcription_data)}")
-
-        # Speaker verification (if voice sample file path provided) and adjust speaker labels
-        if voice_sample_filepath:
-            if not os.path.exists(voice_sample_filepath):
-                raise FileNotFoundError("Voice sample file not found")
-            temp_voice_sample_filepath = voice_sample_filepath
-            if not voice_sample_filepath.endswith('.wav'):
-                temp_voice_sample_filepath = self._convert_to_wav(voice_sample_filepath)
-            full_audio = AudioSegment.from_file(main_audio_filepath)
-            for segment in final_transcription_data:
-                # Extract the segment directly from the full audio loaded in memory
-                start_ms = segment.get("start") * 1000  
-                end_ms = segment.get("end") * 1000  
-                segment_audio = full_audio[start_ms:end_ms]
-        
-                with NamedTemporaryFile(suffix=".wav", delete=True) as temp_segment:
-                    segment_audio.export(temp_segment.name, format='wav')
-                    score, _ = self._compare_with_voice_sample(temp_voice_sample_filepath, temp_segment.name)
-                    if score > self._config.verification_threshold:
-                        segment["speaker"] = speaker_name 
         utterances = []
-        for segment in final_transcription_data:
+        for segment in context.segments:
             words_list = []
             for word in segment.get("words", []):
                 word_obj = WhisperWord(
@@ -140,38 +246,213 @@ class AsyncWhisperTranscriptionServer:
                 speaker=speaker_label
             )
             utterances.append(utterance)
-        final_transcription = TranscriptionResponse(utterances=utterances)
+        final_transcription = TranscriptionResponse(utterances=utterances, stage_timings=context.stage_timings, skipped_stages=context.skipped_stages)
 
         logger.info(f"Returning transcription data as JSON: {final_transcription} {final_transcription.json()}")
         return final_transcription
-       
-    def _convert_to_wav(self, input_filepath):
-        temp_wav_file = NamedTemporaryFile(suffix='.wav', delete=False)
-        output_filepath = temp_wav_file.name
-        temp_wav_file.close()
-
-        input_container = av.open(input_filepath)
-        output_container = av.open(output_filepath, 'w')
-        stream = input_container.streams.audio[0]
-        output_stream = output_container.add_stream('pcm_s16le', rate=stream.rate)
-        for frame in input_container.decode(stream):
-            output_container.mux(output_stream.encode(frame))
-        output_container.close()
-        input_container.close()
-
-        return output_filepath
-
-    def _compare_with_voice_sample(self, voice_sample_path, filepath):
-        score, prediction = self._verification_model.verify_files(voice_sample_path, filepath)
-        return score, prediction
-    
+
+    async def _plan_stages(self, context: TranscriptionContext, stages: TranscriptionStages) -> Dict[TranscriptionStage, str | None]:
+        """
+        Decides which stages will run. Explicit per-request settings always win, otherwise cheap
+        heuristics are applied. Returns a map of stage to the reason it will be skipped (or None if
+        it will run).
+        """
+        plan: Dict[TranscriptionStage, str | None] = { stage: None for stage in TranscriptionStage }
+
+        if stages.align is False:
+            plan[TranscriptionStage.ALIGN] = "disabled by request"
+
+        if stages.diarize is False:
+            plan[TranscriptionStage.DIARIZE] = "disabled by request"
+        elif stages.diarize is None:
+            if stages.max_speakers == 1:
+                plan[TranscriptionStage.DIARIZE] = "single speaker expected"
+            elif context.duration < self._config.diarization_min_duration_seconds:
+                plan[TranscriptionStage.DIARIZE] = f"audio shorter than {self._config.diarization_min_duration_seconds} seconds"
+            elif self._config.diarization_min_speech_segments > 0 and self._vad is not None:
+                speech_segments = await self._get_speech_segments(context)
+                if len(speech_segments) < self._config.diarization_min_speech_segments:
+                    plan[TranscriptionStage.DIARIZE] = f"only {len(speech_segments)} speech segments detected"
+        context.max_speakers = stages.max_speakers
+
+        if stages.verify is False:
+            plan[TranscriptionStage.VERIFY] = "disabled by request"
+        elif not context.voice_sample_filepath or not context.speaker_name:
+            plan[TranscriptionStage.VERIFY] = "no voice sample provided"
+
+        context.will_align = plan[TranscriptionStage.ALIGN] is None
+        context.will_diarize = plan[TranscriptionStage.DIARIZE] is None
+        return plan
+
+    async def _run_transcribe_stage(self, context: TranscriptionContext):
+        loop = asyncio.get_running_loop()
+        if self._long_form_enabled and context.duration >= self._config.long_form_min_duration_seconds:
+            await self._transcribe_long_form(context)
+        else:
+            result = await loop.run_in_executor(self._executor, self._transcribe, context.audio)
+            context.segments = result["segments"]
+            logger.info(f"Initial transcription complete. Total segments: {len(context.segments)}")
+
+    async def _run_align_stage(self, context: TranscriptionContext):
+        if context.aligned:
+            # Long-form mode aligns each piece as part of the transcribe stage
+            context.stage_timings[TranscriptionStage.ALIGN.value] = 0
+            return
+        if len(context.segments) == 0:
+            return
+        loop = asyncio.get_running_loop()
+        result = await loop.run_in_executor(self._executor, self._align, context.segments, context.audio)
+        context.segments = result["segments"]
+        context.aligned = True
+
+    async def _run_diarize_stage(self, context: TranscriptionContext):
+        try:
+            if context.pending_diarization is not None:
+                # Started in parallel with long-form transcription, report time actually spent
+                diarize_segments, seconds = await context.pending_diarization
+                context.stage_timings[TranscriptionStage.DIARIZE.value] = seconds
+            else:
+                loop = asyncio.get_running_loop()
+                diarize_segments, _ = await loop.run_in_executor(self._executor, self._diarize, context.audio, context.max_speakers)
+            logger.info(f"Speaker diarization complete. Total segments: {len(diarize_segments)}")
+            result = whisperx.assign_word_speakers(diarize_segments, { "segments": context.segments })
+            context.segments = result["segments"]
+        except Exception as e:
+            logger.info(f"Error occurred during assigning word speakers: {str(e)}")
+        logger.info(f"Speaker assignment complete.")
+
+    async def _run_verify_stage(self, context: TranscriptionContext):
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(self._executor, self._verify, context)
+
+    def _verify(self, context: TranscriptionContext):
+        # Speaker verification against the voice sample, adjusting speaker labels. Segments are
+        # sliced from the waveform already decoded for transcription, and the voice sample embedding
+        # is computed once per request rather than once per segment.
+        verification_model = self._models.get("verification")
+        voice_sample = self._voice_sample_cache.get(context.voice_sample_filepath, decode=self._load_voice_sample)
+        voice_sample_embedding = verification_model.encode_batch(voice_sample.unsqueeze(0), normalize=False)
+        sample_rate = whisperx.audio.SAMPLE_RATE
+        for segment in context.segments:
+            start_sample = int(segment.get("start") * sample_rate)
+            end_sample = int(segment.get("end") * sample_rate)
+            segment_audio = torch.from_numpy(context.audio[start_sample:end_sample])
+            if segment_audio.numel() == 0:
+                continue
+            segment_embedding = verification_model.encode_batch(segment_audio.unsqueeze(0), normalize=False)
+            score = verification_model.similarity(voice_sample_embedding, segment_embedding).item()
+            if score > self._config.verification_threshold:
+                segment["speaker"] = context.speaker_name
+
+    def _load_voice_sample(self, voice_sample_filepath: str) -> torch.Tensor:
+        # Decoded to 16 KHz mono float samples, the same as audio passed to transcription
+        return torch.from_numpy(whisperx.load_audio(voice_sample_filepath))
+
+    async def _get_speech_segments(self, context: TranscriptionContext) -> List[TimeSegment]:
+        # VAD is run at most once per request and shared by skip heuristics and long-form splitting
+        if context.speech_segments is None:
+            loop = asyncio.get_running_loop()
+            context.speech_segments = await loop.run_in_executor(self._executor, self._detect_speech, context.audio)
+        return context.speech_segments
+
+    def _detect_speech(self, audio) -> List[TimeSegment]:
+        with self._vad_lock:
+            return self._vad.get_speech_timestamps(torch.from_numpy(audio), sampling_rate=whisperx.audio.SAMPLE_RATE)
+
+    def _transcribe(self, audio):
+        return self._models.get("transcription").transcribe(audio, batch_size=self._config.batch_size)
+
+    def _align(self, segments, audio):
+        alignment_model, alignment_metadata = self._models.get("alignment")
+        return whisperx.align(segments, alignment_model, alignment_metadata, audio, device=self._config.device, return_char_alignments=False)
+
+    def _diarize(self, audio, max_speakers: int | None = None):
+        start_time = time.time()
+        diarize_segments = self._models.get("diarization")(audio, max_speakers=max_speakers)
+        return diarize_segments, time.time() - start_time
+
+    async def _transcribe_long_form(self, context: TranscriptionContext):
+        """
+        Transcribes long audio by splitting it on VAD silences into pieces that are transcribed (and
+        aligned, unless disabled) in parallel. Diarization, if it is going to run, is started over
+        the entire waveform concurrently with the pieces so that speaker labels are consistent
+        across piece boundaries. Speakers are assigned by the diarize stage once the pieces have
+        been stitched back together.
+        """
+        loop = asyncio.get_running_loop()
+        speech_segments = await self._get_speech_segments(context)
+        pieces = self._split_on_silences(speech_segments=speech_segments, num_samples=len(context.audio))
+        logger.info(f"Long-form transcription: split {context.duration:.1f} seconds of audio into {len(pieces)} pieces")
+
+        if context.will_diarize:
+            context.pending_diarization = loop.run_in_executor(self._executor, self._diarize, context.audio, context.max_speakers)
+        align = context.will_align
+        piece_futures = [ loop.run_in_executor(self._executor, self._transcribe_piece, context.audio[piece.start:piece.end], align) for piece in pieces ]
+        piece_results = await asyncio.gather(*piece_futures)
+        context.segments = self._stitch_pieces(pieces=pieces, piece_results=piece_results)["segments"]
+        context.aligned = align
+        logger.info(f"Long-form transcription complete. Total segments: {len(context.segments)}")
+
+    def _split_on_silences(self, speech_segments: List[TimeSegment], num_samples: int) -> List[TimeSegment]:
+        """
+        Groups VAD speech segments into pieces no longer than the configured piece length (unless a
+        single speech segment is longer), cutting in the middle of the silences between them.
+        Returned pieces are contiguous, cover the entire waveform, and are in units of samples.
+        """
+        max_piece_samples = int(self._config.long_form_piece_seconds * whisperx.audio.SAMPLE_RATE)
+        pieces = []
+        piece_start = 0
+        last_speech_end = 0
+        for speech in speech_segments:
+            if speech.end - piece_start > max_piece_samples and last_speech_end > piece_start:
+                cut = (last_speech_end + speech.start) // 2
+                pieces.append(TimeSegment(start=piece_start, end=cut))
+                piece_start = cut
+            last_speech_end = speech.end
+        pieces.append(TimeSegment(start=piece_start, end=num_samples))
+        return pieces
+
+    def _transcribe_piece(self, audio_piece, align: bool):
+        # Runs on a worker thread. Pipelines are rebuilt if the shared model was evicted and reloaded.
+        shared_model = self._models.get("long_form_transcription")
+        pipeline = getattr(self._worker_state, "pipeline", None)
+        if pipeline is None or getattr(self._worker_state, "shared_model", None) is not shared_model:
+            pipeline = whisperx.load_model(self._config.model, self._config.device, compute_type=self._config.compute_type, model=shared_model)
+            self._worker_state.pipeline = pipeline
+            self._worker_state.shared_model = shared_model
+        result = pipeline.transcribe(audio_piece, batch_size=self._config.batch_size)
+        if not align or len(result["segments"]) == 0:
+            return { "segments": result["segments"] }
+        return self._align(result["segments"], audio_piece)
+
+    @staticmethod
+    def _stitch_pieces(pieces: List[TimeSegment], piece_results: List[dict]) -> dict:
+        """
+        Concatenates aligned piece transcriptions, offsetting segment and word timestamps from the
+        start of each piece to the start of the whole waveform.
+        """
+        sample_rate = whisperx.audio.SAMPLE_RATE
+        segments = []
+        for piece, piece_result in zip(pieces, piece_results):
+            offset = piece.start / sample_rate
+            for segment in piece_result["segments"]:
+                for key in ("start", "end"):
+                    if segment.get(key) is not None:
+                        segment[key] += offset
+                for word in segment.get("words", []):
+                    for key in ("start", "end"):
+                        if word.get(key) is not None:
+                            word[key] += offset
+                segments.append(segment)
+        return { "segments": segments }
+
     def start(self):
         uvicorn.run(self.app, host=self._config.host, port=self._config.port, log_level="info")
 
-def start_async_transcription_server_process(config: AsyncWhisperConfiguration):
-    asyncio.run(AsyncWhisperTranscriptionServer(config=config).start())
+def start_async_transcription_server_process(config: AsyncWhisperConfiguration, vad_config: VADConfiguration | None = None):
+    asyncio.run(AsyncWhisperTranscriptionServer(config=config, vad_config=vad_config).start())
 
-def start_async_transcription_server(config: AsyncWhisperConfiguration):
-    process = Process(target=start_async_transcription_server_process, args=(config,))
+def start_async_transcription_server(config: AsyncWhisperConfiguration, vad_config: VADConfiguration | None = None):
+    process = Process(target=start_async_transcription_server_process, args=(config, vad_config))
     process.start()
     return process
\ No newline at end of file
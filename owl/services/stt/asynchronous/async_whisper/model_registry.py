@@ -0,0 +1,166 @@
+#
+# model_registry.py
+#
+# Lazily loaded models for the async transcription server. Models are loaded on first use (or when
+# explicitly warmed up), and evictable models are released when they have been idle for too long or
+# when the estimated memory used by all loaded models exceeds a budget.
+#
+# Memory use of each model is estimated by measuring the change in process memory (or allocated
+# CUDA memory) while it loads. This is approximate but sufficient to keep the server within a
+# budget.
+#
+
+from dataclasses import dataclass, field
+import gc
+import logging
+import os
+import threading
+import time
+from typing import Any, Callable, Dict, List
+
+import torch
+
+
+logger = logging.getLogger(__name__)
+
+def _memory_in_use(device: str) -> int:
+    """
+    Returns
+    -------
+    int
+        Bytes of CUDA memory allocated by this process if `device` is a CUDA device, otherwise the
+        resident set size of this process. Returns 0 if neither can be determined.
+    """
+    if device.startswith("cuda") and torch.cuda.is_available():
+        return torch.cuda.memory_allocated()
+    try:
+        import psutil
+        return psutil.Process().memory_info().rss
+    except ImportError:
+        pass
+    try:
+        with open("/proc/self/statm") as fp:
+            return int(fp.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, AttributeError):
+        return 0
+
+@dataclass
+class _ModelSlot:
+    name: str
+    loader: Callable[[], Any]
+    evictable: bool
+    model: Any = None
+    loaded: bool = False
+    memory_bytes: int = 0
+    load_seconds: float = 0
+    loaded_at: float = 0
+    last_used: float = 0
+    lock: threading.Lock = field(default_factory=threading.Lock)
+
+class ModelRegistry:
+    """
+    Thread-safe registry of lazily loaded models. Models are retrieved with get(), which loads them
+    on first use. Callers should not hold on to models beyond a single request so that evicted
+    models can actually be freed once in-flight requests using them complete.
+    """
+
+    def __init__(self, device: str, memory_budget_bytes: int | None = None, idle_timeout_seconds: float | None = None):
+        """
+        Parameters
+        ----------
+        device : str
+            Device models are loaded onto. Determines how memory use is measured.
+
+        memory_budget_bytes : int | None
+            If set, least recently used evictable models are released after a load pushes the total
+            estimated memory use of loaded models above this.
+
+        idle_timeout_seconds : float | None
+            If set, evict_idle() releases evictable models not used for at least this long.
+        """
+        self._device = device
+        self._memory_budget_bytes = memory_budget_bytes
+        self._idle_timeout_seconds = idle_timeout_seconds
+        self._slots: Dict[str, _ModelSlot] = {}
+        self._registry_lock = threading.Lock()
+
+    def register(self, name: str, loader: Callable[[], Any], evictable: bool = True):
+        self._slots[name] = _ModelSlot(name=name, loader=loader, evictable=evictable)
+
+    def names(self) -> List[str]:
+        return list(self._slots.keys())
+
+    def is_loaded(self, name: str) -> bool:
+        return self._slots[name].loaded
+
+    def get(self, name: str) -> Any:
+        """
+        Returns the named model, loading it first if necessary. Blocks while loading, so this should
+        be called from a worker thread rather than an event loop.
+        """
+        slot = self._slots[name]
+        with slot.lock:
+            if not slot.loaded:
+                self._load(slot)
+            slot.last_used = time.time()
+            model = slot.model
+        if self._memory_budget_bytes is not None:
+            self._enforce_budget(keep=name)
+        return model
+
+    def evict_idle(self):
+        """
+        Releases evictable models that have not been used within the idle timeout.
+        """
+        if self._idle_timeout_seconds is None:
+            return
+        now = time.time()
+        for slot in list(self._slots.values()):
+            if slot.evictable and slot.loaded and now - slot.last_used >= self._idle_timeout_seconds:
+                self._evict(slot, reason=f"idle for {now - slot.last_used:.0f} seconds")
+
+    def stats(self) -> List[Dict[str, Any]]:
+        return [
+            {
+                "name": slot.name,
+                "loaded": slot.loaded,
+                "evictable": slot.evictable,
+                "memory_mb": slot.memory_bytes / (1024 * 1024),
+                "load_seconds": slot.load_seconds,
+                "idle_seconds": time.time() - slot.last_used if slot.loaded else None
+            } for slot in self._slots.values()
+        ]
+
+    def _load(self, slot: _ModelSlot):
+        logger.info(f"Loading model: {slot.name}")
+        memory_before = _memory_in_use(self._device)
+        start_time = time.time()
+        slot.model = slot.loader()
+        slot.load_seconds = time.time() - start_time
+        slot.memory_bytes = max(0, _memory_in_use(self._device) - memory_before)
+        slot.loaded = True
+        slot.loaded_at = time.time()
+        logger.info(f"Loaded model {slot.name} in {slot.load_seconds:.2f} seconds (~{slot.memory_bytes / (1024 * 1024):.0f} MB)")
+
+    def _evict(self, slot: _ModelSlot, reason: str):
+        with slot.lock:
+            if not slot.loaded:
+                return
+            slot.model = None
+            slot.loaded = False
+            slot.memory_bytes = 0
+        gc.collect()
+        if self._device.startswith("cuda") and torch.cuda.is_available():
+            torch.cuda.empty_cache()
+        logger.info(f"Evicted model {slot.name}: {reason}")
+
+    def _enforce_budget(self, keep: str):
+        with self._registry_lock:
+            loaded = [ slot for slot in self._slots.values() if slot.loaded ]
+            total_bytes = sum(slot.memory_bytes for slot in loaded)
+            candidates = sorted([ slot for slot in loaded if slot.evictable and slot.name != keep ], key=lambda slot: slot.last_used)
+            for slot in candidates:
+                if total_bytes <= self._memory_budget_bytes:
+                    break
+                total_bytes -= slot.memory_bytes
+                self._evict(slot, reason="memory budget exceeded")
@@ -1,5 +1,5 @@
 import httpx
-from .abstract_async_transcription_service import AbstractAsyncTranscriptionService
+from .abstract_async_transcription_service import AbstractAsyncTranscriptionService, TranscriptionStages
 from ....models.schemas import Transcription, Utterance, Word
 from .async_whisper.async_whisper_transcription_server import TranscriptionResponse
 import logging
@@ -11,12 +11,14 @@ class AsyncWhisperTranscriptionService(AbstractAsyncTranscriptionService):
         self._config = config
         self.http_client = httpx.AsyncClient(timeout=None) 
 
-    async def transcribe_audio(self, main_audio_filepath, voice_sample_filepath=None, speaker_name=None):
+    async def transcribe_audio(self, main_audio_filepath, voice_sample_filepath=None, speaker_name=None, stages: TranscriptionStages | None = None):
         payload = {
             "main_audio_file_path": main_audio_filepath,
             "speaker_name": speaker_name,
             "voice_sample_filepath": voice_sample_filepath
         }
+        if stages is not None:
+            payload["stages"] = stages.model_dump()
         
         url = f"http://{self._config.host}:{self._config.port}/transcribe/"
         
@@ -29,6 +31,7 @@ class AsyncWhisperTranscriptionService(AbstractAsyncTranscriptionService):
             transcript_response = TranscriptionResponse.model_validate_json(response_string)
             utterances = []
             logger.info(f"Transcription response: {transcript_response}")
+            logger.info(f"Transcription stage timings: {transcript_response.stage_timings} | Skipped stages: {transcript_response.skipped_stages}")
             for whisper_utterance in transcript_response.utterances:
                 utterance = Utterance(
                     start=whisper_utterance.start,
@@ -13,4 +13,11 @@ class AbstractStreamingTranscriptionService(ABC):
     @abstractmethod
     def set_stream_format(self, stream_format):
         pass
+
+    async def close(self):
+        """
+        Releases resources held for the capture session using this service. Services shared by all
+        sessions keep theirs.
+        """
+        pass
     
\ No newline at end of file
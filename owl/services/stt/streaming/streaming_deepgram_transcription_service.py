@@ -87,6 +87,13 @@ class StreamingDeepgramTranscriptionService(AbstractStreamingTranscriptionServic
             self.is_receiving = False
             logger.info("Deepgram transcription stopped.")
 
+    async def close(self):
+        # Each capture session has its own connection
+        try:
+            await self.stop_transcription()
+        except Exception as e:
+            logger.error(f"Error closing Deepgram connection: {e}")
+
     async def send_audio(self, audio_chunk):
         await self._ensure_connection()
         if self.websocket:
@@ -24,3 +24,10 @@ class StreamingTranscriptionServiceFactory:
                 raise ValueError(f"Unknown transcription service type: {service_type}")
 
         return StreamingTranscriptionServiceFactory._instances[service_type]
+
+    @staticmethod
+    def get_shared_services():
+        """
+        Returns the services shared by all capture sessions (as opposed to created for each one).
+        """
+        return list(StreamingTranscriptionServiceFactory._instances.values())
@@ -0,0 +1,94 @@
+import asyncio
+from dataclasses import dataclass
+import fnmatch
+import time
+from owl.core.config import BrokerConfiguration
+from owl.broker import RedisBroker
+
+class LocalRedis:
+    """
+    Local stand-in for the subset of the async Redis client used by RedisBroker, shared by brokers
+    as if they were workers in different processes.
+    """
+
+    def __init__(self):
+        self._values = {}
+        self._expiry = {}
+        self._lists = {}
+
+    async def set(self, key, value, nx=False, ex=None):
+        if nx and await self.exists(key):
+            return None
+        self._values[key] = value.encode("utf-8") if isinstance(value, str) else value
+        self._expiry[key] = time.monotonic() + ex if ex else None
+        return True
+
+    async def get(self, key):
+        return self._values.get(key) if await self.exists(key) else None
+
+    async def exists(self, key):
+        expiry = self._expiry.get(key)
+        if expiry is not None and expiry <= time.monotonic():
+            self._values.pop(key, None)
+            self._expiry.pop(key, None)
+        return int(key in self._values)
+
+    async def expire(self, key, seconds):
+        if await self.exists(key):
+            self._expiry[key] = time.monotonic() + seconds
+
+    async def delete(self, key):
+        self._values.pop(key, None)
+        self._expiry.pop(key, None)
+
+    async def keys(self, pattern):
+        return [ key.encode("utf-8") for key in list(self._values.keys()) if await self.exists(key) and fnmatch.fnmatch(key, pattern) ]
+
+    async def rpush(self, key, value):
+        self._lists.setdefault(key, []).append(value)
+
+    async def blpop(self, keys, timeout=0):
+        deadline = time.monotonic() + timeout
+        while True:
+            for key in keys:
+                if self._lists.get(key):
+                    return (key.encode("utf-8"), self._lists[key].pop(0))
+            if time.monotonic() >= deadline:
+                return None
+            await asyncio.sleep(0.01)
+
+@dataclass
+class NoteTask:
+    note: str
+
+def test_tasks_run_on_owner_of_affinity_key():
+    async def run():
+        redis = LocalRedis()
+        config = BrokerConfiguration(provider="redis")
+        worker1 = RedisBroker(config, client=redis)
+        worker2 = RedisBroker(config, client=redis)
+        await worker1.start()
+        await worker2.start()
+        assert worker1.is_primary() and not worker2.is_primary()
+        assert not await worker1.is_only_worker()
+
+        # Capture owned by worker 1 receives its tasks, even when put by worker 2
+        assert await worker1.claim("capture-1") == worker1.worker_id
+        assert await worker2.claim("capture-1") == worker1.worker_id
+        await worker2.put_task(NoteTask("chunk"), affinity_key="capture-1")
+        assert await worker1.get_task() == NoteTask("chunk")
+
+        # Tasks without affinity go to any worker
+        await worker1.put_task(NoteTask("any"))
+        assert await worker2.get_task() == NoteTask("any")
+
+        # Once worker 1 stops, worker 2 takes over its capture and primary role
+        await worker1.stop()
+        assert await worker2.get_owner("capture-1") is None
+        assert await worker2.claim("capture-1") == worker2.worker_id
+        await worker2._heartbeat()
+        assert worker2.is_primary()
+        assert await worker2.is_only_worker()
+        await worker2.stop()
+
+    asyncio.run(run())
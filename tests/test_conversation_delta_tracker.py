@@ -0,0 +1,46 @@
+import json
+from owl.services.notification.conversation_delta_tracker import ConversationDeltaTracker
+
+def conversation_json(id, **fields):
+    return json.dumps({ "id": id, "conversation_uuid": f"uuid-{id}", "state": "CAPTURING", "summary": None, **fields })
+
+def test_versions_and_changed_fields():
+    tracker = ConversationDeltaTracker()
+    first = tracker.get_delta(conversation_json(1))
+    assert first["version"] == 1 and first["complete"]
+    assert first["changes"] == { "id": 1, "conversation_uuid": "uuid-1", "state": "CAPTURING", "summary": None }
+    assert first["stale"] == []
+
+    # Unchanged states produce no delta and do not consume versions
+    assert tracker.get_delta(conversation_json(1)) is None
+    second = tracker.get_delta(conversation_json(1, state="COMPLETED", summary="Coffee"))
+    assert second["version"] == 2 and not second["complete"]
+    assert second["changes"] == { "state": "COMPLETED", "summary": "Coffee" }
+    assert second["epoch"] == first["epoch"]
+
+    # Conversations are numbered independently
+    assert tracker.get_delta(conversation_json(2))["version"] == 1
+
+    # Forgotten conversations start over with a complete delta
+    tracker.forget(1)
+    third = tracker.get_delta(conversation_json(1, state="COMPLETED", summary="Coffee"))
+    assert third["version"] == 1 and third["complete"]
+
+def test_large_fields_are_stale():
+    tracker = ConversationDeltaTracker(max_field_bytes=16)
+    first = tracker.get_delta(conversation_json(1, transcriptions=[ "a long transcript" ]))
+    assert first["stale"] == [ "transcriptions" ] and "transcriptions" not in first["changes"]
+
+    # A delta with stale fields is not a complete replacement
+    assert not first["complete"]
+    second = tracker.get_delta(conversation_json(1, transcriptions=[ "a longer transcript" ], state="COMPLETED"))
+    assert second["changes"] == { "state": "COMPLETED" } and second["stale"] == [ "transcriptions" ]
+
+def test_least_recently_notified_conversations_are_forgotten():
+    tracker = ConversationDeltaTracker(max_conversations=2)
+    tracker.get_delta(conversation_json(1))
+    tracker.get_delta(conversation_json(2))
+    tracker.get_delta(conversation_json(1, state="PROCESSING"))   # 2 is now least recent
+    tracker.get_delta(conversation_json(3))
+    assert tracker.get_delta(conversation_json(1, state="COMPLETED"))["version"] == 3
+    assert tracker.get_delta(conversation_json(2))["complete"]
@@ -0,0 +1,45 @@
+import os
+from sqlalchemy import event
+from owl.core.config import DatabaseConfiguration
+from owl.database.database import Database
+from owl.database.benchmark import seed_database
+from owl.database.crud import get_all_conversations
+from owl.models.schemas import ConversationsResponse
+
+def test_get_all_conversations_fetches_bounded_rows(tmp_path, monkeypatch):
+    # Migrations are found relative to the repository root
+    monkeypatch.chdir(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+    database = Database(DatabaseConfiguration(url=f"sqlite:///{tmp_path / 'test.sqlite3'}"))
+    database.init_db()
+    utterances_per_conversation = 5
+    with database.session_factory() as db:
+        seed_database(db=db, days=10, conversations_per_day=10, utterances_per_conversation=utterances_per_conversation, words_per_utterance=20, locations_per_day=0)
+
+    # Count statements and the rows the database returns for them
+    statements = []
+    rows_fetched = 0
+    def count_row(cursor, row):
+        nonlocal rows_fetched
+        rows_fetched += 1
+        return row
+    event.listen(database.engine, "connect", lambda dbapi_connection, connection_record: setattr(dbapi_connection, "row_factory", count_row))
+    event.listen(database.engine, "before_cursor_execute", lambda conn, cursor, statement, parameters, context, executemany: statements.append(statement))
+    database.engine.dispose()   # new connections pick up the row factory
+
+    page_size = 25
+    with database.session_factory() as db:
+        conversations = get_all_conversations(db, offset=50, limit=page_size)
+        response = ConversationsResponse(conversations=conversations)
+        response.model_dump_json()
+
+    assert len(response.conversations) == page_size
+    assert all(len(conversation.transcriptions[0].utterances) == utterances_per_conversation for conversation in response.conversations)
+
+    # One statement for the page and one per relationship, regardless of page size: conversations,
+    # transcriptions, utterances, suggested links, and segments (joined with their captures).
+    # Primary locations need no statement because none are set.
+    assert len(statements) == 5
+
+    # A row per conversation, transcription, utterance, and segment, and none for words
+    assert rows_fetched == page_size * (3 + utterances_per_conversation)
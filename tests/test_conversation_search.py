@@ -0,0 +1,51 @@
+from datetime import datetime
+import os
+from owl.core.config import DatabaseConfiguration
+from owl.database.database import Database
+from owl.database.search import HIGHLIGHT_START, HIGHLIGHT_END, index_conversation, remove_conversation, search_conversations, to_match_expression
+from owl.models.schemas import Conversation
+
+def test_to_match_expression_quotes_terms_and_prefixes_last():
+    assert to_match_expression("coffee beans") == "\"coffee\" \"beans\"*"
+    assert to_match_expression("  bean ") == "\"bean\"*"
+
+    # FTS5 syntax is not interpreted
+    assert to_match_expression("NOT coffee OR \"tea\" -milk summary:beans*") == "\"NOT\" \"coffee\" \"OR\" \"tea\" \"milk\" \"summary\" \"beans\"*"
+    assert to_match_expression("\"\" * ()") == ""
+    assert to_match_expression("") == ""
+
+def test_index_search_and_remove_conversations(tmp_path, monkeypatch):
+    # Migrations are found relative to the repository root
+    monkeypatch.chdir(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+    database = Database(DatabaseConfiguration(url=f"sqlite:///{tmp_path / 'test.sqlite3'}"))
+    database.init_db()
+    with database.session_factory() as db:
+        coffee = Conversation(start_time=datetime.now(), conversation_uuid="coffee", device_type="test", summary="Planning a trip to buy coffee beans", short_summary="Coffee trip")
+        garden = Conversation(start_time=datetime.now(), conversation_uuid="garden", device_type="test", summary="Watering the garden", short_summary="Garden")
+        db.add_all([ coffee, garden ])
+        db.commit()
+        index_conversation(db, coffee, transcript="We should get beans from the roaster downtown.")
+        index_conversation(db, garden, transcript="The tomatoes need water, and maybe some coffee grounds.")
+        db.commit()
+
+        # All terms must match, the last as a prefix
+        hits = search_conversations(db, "coffee bea")
+        assert [ hit.conversation_id for hit in hits ] == [ coffee.id ]
+        assert f"{HIGHLIGHT_START}beans{HIGHLIGHT_END}" in hits[0].snippet
+
+        # Matches in summaries rank above matches in transcripts
+        assert [ hit.conversation_id for hit in search_conversations(db, "coffee") ] == [ coffee.id, garden.id ]
+        assert search_conversations(db, "NOT") == []
+        assert search_conversations(db, "***") == []
+
+        # Re-indexing replaces the document
+        garden.summary = "Weeding the garden"
+        index_conversation(db, garden, transcript="The tomatoes need water.")
+        db.commit()
+        assert [ hit.conversation_id for hit in search_conversations(db, "coffee") ] == [ coffee.id ]
+
+        remove_conversation(db, coffee.id)
+        db.commit()
+        assert search_conversations(db, "coffee") == []
+        assert [ hit.conversation_id for hit in search_conversations(db, "tomato") ] == [ garden.id ]
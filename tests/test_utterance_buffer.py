@@ -0,0 +1,48 @@
+import asyncio
+import os
+from sqlalchemy import event
+from sqlmodel import select
+from owl.core.config import DatabaseConfiguration
+from owl.database.database import Database
+from owl.database.utterance_buffer import UtteranceWriteBuffer
+from owl.models.schemas import Transcription, Utterance
+
+def test_bad_utterance_is_dropped_without_blocking_others(tmp_path, monkeypatch):
+    # Migrations are found relative to the repository root
+    monkeypatch.chdir(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+    database = Database(DatabaseConfiguration(url=f"sqlite:///{tmp_path / 'test.sqlite3'}"))
+    database.init_db()
+    event.listen(database.engine, "connect", lambda dbapi_connection, connection_record: dbapi_connection.execute("PRAGMA foreign_keys=ON"))
+    database.engine.dispose()   # new connections enforce foreign keys
+    with database.session_factory(expire_on_commit=False) as db:
+        transcription = Transcription(realtime=True, model="test", transcription_time=0)
+        db.add(transcription)
+        db.commit()
+
+    async def run():
+        buffer = UtteranceWriteBuffer(database=database, max_batch_size=100, max_delay_seconds=60, max_batch_attempts=2)
+        written = []
+        async def on_written(utterance: Utterance):
+            written.append(utterance.text)
+        buffer.add(Utterance(text="first", transcription_id=transcription.id), on_written=on_written)
+        buffer.add(Utterance(text="orphan", transcription_id=transcription.id + 1), on_written=on_written)
+        buffer.add(Utterance(text="second", transcription_id=transcription.id), on_written=on_written)
+
+        # The batch is put back and retried until it has failed max_batch_attempts times
+        assert not await buffer.flush()
+        assert written == []
+        assert not await buffer.flush()
+        assert written == [ "first", "second" ]
+        assert await buffer.flush()
+
+        # Callers that cannot wait for retries write individually right away
+        buffer.add(Utterance(text="orphan", transcription_id=transcription.id + 1), on_written=on_written)
+        buffer.add(Utterance(text="third", transcription_id=transcription.id), on_written=on_written)
+        assert not await buffer.flush(write_individually_on_failure=True)
+        assert written == [ "first", "second", "third" ]
+
+    asyncio.run(run())
+
+    with database.session_factory() as db:
+        assert sorted(db.scalars(select(Utterance.text)).all()) == [ "first", "second", "third" ]
@@ -0,0 +1,54 @@
+import json
+import numpy as np
+from owl.services.embedding.vector_index import VectorIndex
+
+def unit_vectors(*directions):
+    vectors = np.array(directions, dtype=np.float32)
+    return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+def test_index_grows_and_reopens_from_header(tmp_path):
+    index = VectorIndex(str(tmp_path), dimensions=3, model="test", initial_capacity=2)
+    index.add(1, [ (-1, 0), (0, 4), (4, 4) ], unit_vectors([ 1, 0, 0 ], [ 1, 1, 0 ], [ 0, 1, 0 ]))
+    index.add(2, [ (-1, 0) ], unit_vectors([ 0, 0, 1 ]))
+    assert index.count == 4
+    with open(tmp_path / "index.json", "r") as fp:
+        assert json.load(fp)["capacity"] >= 4
+
+    reopened = VectorIndex(str(tmp_path), dimensions=3, model="test")
+    assert reopened.count == 4
+    hits = reopened.search(unit_vectors([ 0, 0, 1 ])[0], limit=1)
+    assert [ (hit.conversation_id, hit.first_utterance, hit.num_utterances) for hit in hits ] == [ (2, -1, 0) ]
+    assert abs(hits[0].score - 1) < 1e-6
+    assert VectorIndex.get_existing_dimensions(str(tmp_path), model="test") == 3
+
+    # An index built with another model is discarded
+    assert VectorIndex.get_existing_dimensions(str(tmp_path), model="other") is None
+    assert VectorIndex(str(tmp_path), dimensions=3, model="other").count == 0
+
+def test_search_returns_best_entry_of_each_conversation(tmp_path):
+    index = VectorIndex(str(tmp_path), dimensions=2, model="test")
+    index.add(1, [ (0, 4), (4, 4) ], unit_vectors([ 1, 0.1 ], [ 1, 0 ]))
+    index.add(2, [ (0, 4) ], unit_vectors([ 1, 0.5 ]))
+    index.add(3, [ (0, 4) ], unit_vectors([ 0, 1 ]))
+    hits = index.search(unit_vectors([ 1, 0 ])[0], limit=2)
+    assert [ (hit.conversation_id, hit.first_utterance) for hit in hits ] == [ (1, 4), (2, 0) ]
+    assert len(index.search(unit_vectors([ 1, 0 ])[0], limit=10)) == 3
+    assert VectorIndex(str(tmp_path / "empty"), dimensions=2, model="test").search(unit_vectors([ 1, 0 ])[0]) == []
+
+def test_re_adding_and_removing_tombstone_entries(tmp_path):
+    index = VectorIndex(str(tmp_path), dimensions=2, model="test")
+    index.add(1, [ (0, 4) ], unit_vectors([ 1, 0 ]))
+    index.add(2, [ (0, 4) ], unit_vectors([ 0, 1 ]))
+
+    # Re-adding replaces the conversation's entries, which remain in the arrays but are skipped
+    index.add(1, [ (2, 4) ], unit_vectors([ 0, 1 ]))
+    assert index.count == 3
+    hits = index.search(unit_vectors([ 1, 0 ])[0])
+    assert sorted([ (hit.conversation_id, hit.first_utterance) for hit in hits ]) == [ (1, 2), (2, 0) ]
+    assert all(hit.score < 0.5 for hit in hits)
+
+    # Removal persists
+    index.remove(1)
+    assert [ hit.conversation_id for hit in index.search(unit_vectors([ 0, 1 ])[0]) ] == [ 2 ]
+    reopened = VectorIndex(str(tmp_path), dimensions=2, model="test")
+    assert [ hit.conversation_id for hit in reopened.search(unit_vectors([ 0, 1 ])[0]) ] == [ 2 ]